@@ -0,0 +1,72 @@
+// 讀取 Python 預先算好的評分檔 (stock_analysis/artifact.py 匯出，python -m stock_analysis export)
+// 每個陣列為整數差分編碼：第一個元素為絕對值，其後為與前一個有效值的差，null 代表缺值；
+// 數值 = 累加值 / scale。格式不相容時 Python 端會調高 version。
+export const ARTIFACT_SCHEMA = 'stock_analysis.scores';
+export const ARTIFACT_VERSION = 1;
+
+const DAY_MS = 24 * 60 * 60 * 1000;
+
+const decodeDeltas = (data, scale = 1) => {
+  const out = new Float64Array(data.length);
+  let acc = 0;
+  for (let i = 0; i < data.length; i++) {
+    if (data[i] === null) {
+      out[i] = NaN;
+    } else {
+      acc += data[i];
+      out[i] = acc / scale;
+    }
+  }
+  return out;
+};
+
+// 解碼成 { ticker, profile, generated, dates: Date[], columns: { 欄位: Float64Array } }
+export const decodeArtifact = (doc) => {
+  if (doc?.schema !== ARTIFACT_SCHEMA) throw new Error('不是評分檔');
+  if (doc.version !== ARTIFACT_VERSION) throw new Error(`不支援的評分檔版本: ${doc.version}`);
+  const dates = Array.from(decodeDeltas(doc.dates), (day) => new Date(day * DAY_MS));
+  const columns = {};
+  for (const [name, col] of Object.entries(doc.columns)) {
+    columns[name] = decodeDeltas(col.data, col.scale);
+  }
+  return { ticker: doc.ticker, profile: doc.profile, generated: doc.generated, dates, columns };
+};
+
+// 評分檔欄位 -> processMarketData 回傳物件的欄位名稱（數值依 Python 管線計算）
+const FIELD_MAP = {
+  Close: 'price', High: 'high', Low: 'low', Open: 'open', Volume: 'volume',
+  MA20: 'ma20', MA60: 'ma60', RSI: 'rsiVal', Slope_60: 'slopeVal',
+  BB_Upper: 'upper', BB_Mid: 'mid', BB_pctB: 'pctB', BB_BandWidth: 'bandWidth',
+  MACD_OSC: 'macd', ADX: 'adx', PDI: 'pdi', MDI: 'mdi', K: 'k', D: 'd',
+  VolMA5: 'volMA5', ATR: 'atr',
+};
+
+// 轉成與 fetchStockData + processMarketData 相同形狀的陣列，另附 buyScore / sellScore 與各分項 (scores)
+export const toMarketData = ({ dates, columns }) => {
+  let lastM = -1;
+  return dates.map((d, i) => {
+    const isNewMonth = d.getUTCMonth() !== lastM;
+    if (isNewMonth) lastM = d.getUTCMonth();
+    const row = {
+      fullDate: new Date(d.getUTCFullYear(), d.getUTCMonth(), d.getUTCDate()).toLocaleDateString(),
+      displayDate: isNewMonth ? (d.getUTCMonth() === 0 ? `${d.getUTCFullYear()}年` : `${d.getUTCMonth() + 1}月`) : '',
+      isNewMonth,
+      scores: {},
+    };
+    for (const [name, values] of Object.entries(columns)) {
+      const v = Number.isNaN(values[i]) ? null : values[i];
+      if (FIELD_MAP[name]) row[FIELD_MAP[name]] = v;
+      else if (name.startsWith('Buy_') || name.startsWith('Sell_')) row.scores[name] = v;
+    }
+    row.buyScore = row.scores.Buy_Score ?? null;
+    row.sellScore = row.scores.Sell_Score ?? null;
+    return row;
+  });
+};
+
+// 從部署目錄載入評分檔（例如 public/data/6669.TW.json），不存在時回傳 null 以改用即時抓取
+export const loadScoreArtifact = async (ticker, baseUrl = import.meta.env.BASE_URL) => {
+  const response = await fetch(`${baseUrl}data/${ticker}.json`);
+  if (!response.ok) return null;
+  return toMarketData(decodeArtifact(await response.json()));
+};
@@ -0,0 +1,158 @@
+"""股票買賣點分析：Python 指標與評分引擎"""
+from .artifact import ARTIFACT_VERSION, read_artifact, write_artifact
+from .backtest import BacktestResult, action_levels, action_triggers, backtest, backtest_arrays, backtest_stats
+from .batch import BatchResult, read_universe, run_universe, score_ticker
+from .chunked import CHUNK_SIZE, ChunkedScorer, iter_parquet, iter_profile_chunks, run_profile_chunked
+from .data import OHLCV_COLUMNS, OHLCVStore, clean_ohlcv, download_yahoo, load_ohlcv, slice_dates
+from .divergence import (
+    DIVERGENCE_LAG,
+    DIVERGENCE_LENGTH,
+    DIVERGENCE_OSCILLATORS,
+    divergence_features,
+    divergence_flags,
+    lagged_extreme,
+)
+from .fetcher import AsyncFetcher, Endpoint, FetchError, SymbolNotFound, fetch_many, parse_chart, update_universe_cache
+from .forward import FORWARD_HORIZONS, ForwardResult, forward_analysis, forward_returns, group_stats
+from .fibo import FIBO_LEVELS, FIBO_LEVELS_3231, fibo_levels
+from .indicators import atr, directional_movement, dmi, smooth_dmi, true_range
+from .instrument import Recorder, recording
+from .kernels import available_backends, get_backend, set_backend
+from .pipeline import (
+    COMPACT_RTOL,
+    INDICATOR_STAGES,
+    compact_columns,
+    compact_frame,
+    compute_indicators,
+    fibo_columns,
+    profile_frame,
+    resolve_stages,
+    run_profile,
+    score_profiles,
+)
+from .plotting import lttb_indices, plot_scores, render_charts
+from .profiles import PROFILES, StrategyProfile, get_profile, register_profile
+from .rolling import (
+    ROLLING_BLOCK,
+    FenwickTree,
+    RollingMeanState,
+    RollingVarState,
+    expanding_percentile_rank,
+    expanding_percentile_rank_arrays,
+    rolling_linregress,
+    rolling_linregress_arrays,
+    rolling_percentile_rank,
+    rolling_percentile_rank_arrays,
+)
+from .scoring import (
+    BUY_COMPONENTS,
+    SELL_COMPONENTS,
+    buy_score_3231,
+    buy_score_6669,
+    linear_map,
+    sell_score_3231,
+    sell_score_6669,
+)
+from .store import EVENT_THRESHOLDS, ScoreStore, crossing_events
+from .streaming import StreamingScorer, update_universe
+from .sweep import grid_search, parameter_grid, tuned_profile
+
+__all__ = [
+    'AsyncFetcher',
+    'ARTIFACT_VERSION',
+    'BacktestResult',
+    'BatchResult',
+    'BUY_COMPONENTS',
+    'CHUNK_SIZE',
+    'COMPACT_RTOL',
+    'ChunkedScorer',
+    'DIVERGENCE_LAG',
+    'DIVERGENCE_LENGTH',
+    'DIVERGENCE_OSCILLATORS',
+    'Endpoint',
+    'EVENT_THRESHOLDS',
+    'FetchError',
+    'FIBO_LEVELS',
+    'FIBO_LEVELS_3231',
+    'FORWARD_HORIZONS',
+    'FenwickTree',
+    'ForwardResult',
+    'INDICATOR_STAGES',
+    'OHLCVStore',
+    'OHLCV_COLUMNS',
+    'PROFILES',
+    'Recorder',
+    'ROLLING_BLOCK',
+    'RollingMeanState',
+    'RollingVarState',
+    'SELL_COMPONENTS',
+    'ScoreStore',
+    'StrategyProfile',
+    'StreamingScorer',
+    'SymbolNotFound',
+    'action_levels',
+    'action_triggers',
+    'atr',
+    'available_backends',
+    'backtest',
+    'backtest_arrays',
+    'backtest_stats',
+    'buy_score_3231',
+    'buy_score_6669',
+    'clean_ohlcv',
+    'compact_columns',
+    'compact_frame',
+    'compute_indicators',
+    'crossing_events',
+    'directional_movement',
+    'divergence_features',
+    'divergence_flags',
+    'download_yahoo',
+    'fetch_many',
+    'dmi',
+    'expanding_percentile_rank',
+    'expanding_percentile_rank_arrays',
+    'fibo_columns',
+    'fibo_levels',
+    'forward_analysis',
+    'forward_returns',
+    'get_backend',
+    'get_profile',
+    'grid_search',
+    'group_stats',
+    'iter_parquet',
+    'iter_profile_chunks',
+    'lagged_extreme',
+    'parameter_grid',
+    'parse_chart',
+    'plot_scores',
+    'linear_map',
+    'lttb_indices',
+    'load_ohlcv',
+    'profile_frame',
+    'register_profile',
+    'render_charts',
+    'read_artifact',
+    'read_universe',
+    'recording',
+    'resolve_stages',
+    'rolling_linregress',
+    'rolling_linregress_arrays',
+    'rolling_percentile_rank',
+    'rolling_percentile_rank_arrays',
+    'run_profile',
+    'run_profile_chunked',
+    'run_universe',
+    'score_profiles',
+    'score_ticker',
+    'set_backend',
+    'sell_score_3231',
+    'sell_score_6669',
+    'slice_dates',
+    'smooth_dmi',
+    'true_range',
+    'tuned_profile',
+    'update_universe_cache',
+    'update_universe',
+    'write_artifact',
+]
@@ -0,0 +1,109 @@
+"""kernels 的 Numba 後端：與 NumPy 後端相同的遞迴，以 JIT 編譯的迴圈執行（由 kernels 延遲載入）"""
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True)
+def wilder_smooth(x, period):
+    n = x.shape[0]
+    out = np.empty(n)
+    if n == 0:
+        return out
+    out[0] = x[0]
+    for i in range(1, n):
+        out[i] = (out[i - 1] * (period - 1) + x[i]) / period
+    return out
+
+
+@njit(cache=True)
+def ema(x, alpha):
+    n = x.shape[0]
+    out = np.empty(n)
+    if n == 0:
+        return out
+    keep = 1 - alpha
+    out[0] = x[0]
+    for i in range(1, n):
+        out[i] = alpha * x[i] + keep * out[i - 1]
+    return out
+
+
+@njit(cache=True)
+def kd(high, low, close, period, init):
+    n = close.shape[0]
+    k = np.full(n, init)
+    d = np.full(n, init)
+    k_val = init
+    d_val = init
+    for i in range(period - 1, n):
+        window_high = high[i - period + 1]
+        window_low = low[i - period + 1]
+        for j in range(i - period + 2, i + 1):
+            window_high = max(window_high, high[j])
+            window_low = min(window_low, low[j])
+        span = window_high - window_low
+        rsv = 50.0 if span == 0 else (close[i] - window_low) / span * 100
+        k_val = 1 / 3 * rsv + 2 / 3 * k_val
+        d_val = 1 / 3 * k_val + 2 / 3 * d_val
+        k[i] = k_val
+        d[i] = d_val
+    return k, d
+
+
+@njit(cache=True)
+def fibo_scan(close, window, swing, min_lead, fallback_lookback):
+    """單調佇列維護視窗最高（同值取最前面）與最低價，波段低點逐段掃描"""
+    n = close.shape[0]
+    m = n - window + 1
+    max_price = np.empty(m)
+    window_min = np.empty(m)
+    min_price = np.empty(m)
+    max_queue = np.empty(n, dtype=np.int64)
+    min_queue = np.empty(n, dtype=np.int64)
+    max_head = max_tail = 0
+    min_head = min_tail = 0
+    for i in range(n):
+        value = close[i]
+        while max_tail > max_head and close[max_queue[max_tail - 1]] < value:
+            max_tail -= 1
+        max_queue[max_tail] = i
+        max_tail += 1
+        while min_tail > min_head and close[min_queue[min_tail - 1]] >= value:
+            min_tail -= 1
+        min_queue[min_tail] = i
+        min_tail += 1
+        if i < window - 1:
+            continue
+
+        lo = i - window + 1
+        while max_queue[max_head] < lo:
+            max_head += 1
+        while min_queue[min_head] < lo:
+            min_head += 1
+        out = i - window + 1
+        max_pos = max_queue[max_head]
+        max_price[out] = close[max_pos]
+        window_min[out] = close[min_queue[min_head]]
+        if not swing:
+            min_price[out] = window_min[out]
+        elif max_pos - lo >= min_lead:
+            low = close[lo]
+            for j in range(lo + 1, max_pos + 1):
+                low = min(low, close[j])
+            min_price[out] = low
+        elif window > fallback_lookback:
+            low = close[i - fallback_lookback + 1]
+            for j in range(i - fallback_lookback + 2, i + 1):
+                low = min(low, close[j])
+            min_price[out] = low
+        else:
+            min_price[out] = window_min[out]
+    return max_price, window_min, min_price
+
+
+KERNELS = {
+    'wilder_smooth': wilder_smooth,
+    'ema': ema,
+    'kd': kd,
+    'fibo_scan': fibo_scan,
+}
@@ -0,0 +1,136 @@
+"""前端評分檔：把 run_profile 的結果匯出成精簡 JSON，供 src/App.jsx 直接載入，不必在瀏覽器重算指標
+
+格式（ARTIFACT_SCHEMA，版本 ARTIFACT_VERSION）：
+    {"schema": ..., "version": 1, "ticker": "6669.TW", "profile": "6669", "generated": ISO 時間,
+     "rows": n, "dates": [...], "columns": {"Close": {"scale": 10000, "data": [...]}, ...}}
+
+每個陣列都是整數差分編碼：第一個元素為絕對值，其後為與前一個有效值的差；
+null 代表 NaN（不影響累加）。dates 以 1970-01-01 起算的日數編碼；
+數值欄位先乘上 scale 四捨五入成整數，解碼為 累加值 / scale，
+絕對誤差 <= 0.5 / scale。欄位集合與 pipeline.compact_frame 相同。
+格式不相容的修改必須調高 ARTIFACT_VERSION；前端解碼見 src/scoreArtifact.js。
+
+檔案約為 CSV 的 1/3（gzip 後再小約 3 倍），另寫 index.json 索引。前端以 scoreArtifact.js 的
+loadScoreArtifact(ticker) 取得與 processMarketData 同形狀的資料與評分。部署流程在 Repository
+variable EXPORT_SCORES=true 時自動匯出（EXPORT_TICKERS 指定代號，見 .github/workflows/deploy.yml）。
+"""
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .divergence import divergence_flag_names
+from .pipeline import compact_frame
+
+ARTIFACT_SCHEMA = 'stock_analysis.scores'
+ARTIFACT_VERSION = 1
+MANIFEST_NAME = 'index.json'
+
+# 欄位 -> 小數位數；未列出的欄位用 DEFAULT_DECIMALS
+DEFAULT_DECIMALS = 4
+COLUMN_DECIMALS = {
+    'Volume': 0,
+    'VolMA5': 0,
+    'VolMA20': 0,
+    'Slope_60': 6,
+    'BB_pctB': 6,
+    'BB_BandWidth': 6,
+    'Fibo_Valid': 0,
+    **{name: 0 for name in divergence_flag_names()},
+}
+
+
+def _delta_encode(ints, valid):
+    """整數陣列 -> 差分清單（NaN 為 None，差分以前一個有效值為基準）"""
+    out = [None] * len(ints)
+    prev = 0
+    for i in np.flatnonzero(valid).tolist():
+        value = int(ints[i])
+        out[i] = value - prev
+        prev = value
+    return out
+
+
+def _delta_decode(data):
+    values = np.empty(len(data))
+    acc = 0
+    for i, step in enumerate(data):
+        if step is None:
+            values[i] = np.nan
+        else:
+            acc += step
+            values[i] = acc
+    return values
+
+
+def encode_artifact(df, profile, ticker, compact=True):
+    """run_profile 的輸出 -> 可 json.dump 的 dict（compact=True 時只匯出 compact_frame 保留的欄位）"""
+    frame = df[compact_frame(df, profile).columns] if compact else df
+    days = frame.index.values.astype('datetime64[D]').astype(np.int64)
+    columns = {}
+    for name in frame.columns:
+        decimals = COLUMN_DECIMALS.get(name, DEFAULT_DECIMALS)
+        scale = 10 ** decimals
+        values = frame[name].to_numpy(dtype=float)
+        valid = np.isfinite(values)
+        ints = np.zeros(len(values), dtype=np.int64)
+        ints[valid] = np.round(values[valid] * scale)
+        columns[name] = {'scale': scale, 'data': _delta_encode(ints, valid)}
+    return {
+        'schema': ARTIFACT_SCHEMA,
+        'version': ARTIFACT_VERSION,
+        'ticker': ticker,
+        'profile': profile.name,
+        'generated': datetime.now().isoformat(timespec='seconds'),
+        'rows': len(frame),
+        'dates': _delta_encode(days, np.ones(len(days), dtype=bool)),
+        'columns': columns,
+    }
+
+
+def decode_artifact(doc):
+    """encode_artifact 的反向：回傳以日期為 index 的 DataFrame（旗標欄位為 bool）"""
+    if doc.get('schema') != ARTIFACT_SCHEMA:
+        raise ValueError(f"不是評分檔: schema={doc.get('schema')}")
+    if doc.get('version') != ARTIFACT_VERSION:
+        raise ValueError(f"不支援的評分檔版本: {doc.get('version')}（目前 {ARTIFACT_VERSION}）")
+    days = _delta_decode(doc['dates']).astype(np.int64)
+    index = pd.DatetimeIndex(days.astype('datetime64[D]'), name='Date')
+    data = {name: _delta_decode(col['data']) / col['scale'] for name, col in doc['columns'].items()}
+    frame = pd.DataFrame(data, index=index)
+    flags = [c for c in frame.columns if c == 'Fibo_Valid' or c in divergence_flag_names()]
+    return frame.astype({c: bool for c in flags})
+
+
+def artifact_name(ticker):
+    return f"{ticker.replace('/', '_')}.json"
+
+
+def write_artifact(df, profile, ticker, directory, compact=True):
+    """寫出單檔評分檔，回傳路徑"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, artifact_name(ticker))
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(encode_artifact(df, profile, ticker, compact), f, separators=(',', ':'))
+    return path
+
+
+def read_artifact(path):
+    with open(path, encoding='utf-8') as f:
+        return decode_artifact(json.load(f))
+
+
+def write_manifest(directory, entries):
+    """寫出目錄索引 index.json：{schema, version, generated, tickers: {代號: {file, profile, rows, last_date}}}"""
+    manifest = {
+        'schema': ARTIFACT_SCHEMA,
+        'version': ARTIFACT_VERSION,
+        'generated': datetime.now().isoformat(timespec='seconds'),
+        'tickers': entries,
+    }
+    path = os.path.join(directory, MANIFEST_NAME)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return path
@@ -0,0 +1,200 @@
+"""回測引擎：依策略的買賣建議門檻，把 Buy_Score / Sell_Score 轉為部位變化
+
+規則（門檻見 StrategyProfile.buy_actions / sell_actions）：
+- 分數「進入」較強的一級時才動作（由下往上突破門檻），連續多日停留同一級不重複加碼或減碼
+- 買進：投入目前現金的指定比例；賣出：賣出目前持股的指定比例（1.0 為清倉）
+- 同一天買賣訊號同時出現時以賣出優先
+- 訊號於當日收盤產生，預設在下一交易日開盤成交 (fill='open')；fill='close' 則以當日收盤成交
+- 預設計入手續費 0.1425%（DEFAULT_FEE，買賣皆收）與證交稅 0.3%（DEFAULT_TAX，賣出時收）
+
+門檻判斷與觸發點全部以陣列運算完成，只有成交筆數需要逐筆更新現金與持股，
+其餘每日持股、權益與回撤再以陣列展開，20 年日 K 約數毫秒。
+"""
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+# 台股手續費 0.1425%（買賣皆收）、證交稅 0.3%（賣出收）
+DEFAULT_FEE = 0.001425
+DEFAULT_TAX = 0.003
+TRADING_DAYS = 252
+
+
+@dataclass
+class BacktestResult:
+    """回測結果
+
+    equity: 每日 Close / Cash / Shares / Position（持股市值佔權益比例）/ Equity / Drawdown
+    trades: 成交明細 Date / Side / Tier / Score / Fraction / Price / Shares / Value / Cost / Cash / Holding
+    stats:  績效摘要 (總報酬、年化報酬、最大回撤、周轉率、成交次數等)
+    """
+    equity: pd.DataFrame
+    trades: pd.DataFrame
+    stats: dict = field(default_factory=dict)
+
+
+def action_levels(scores, actions):
+    """分數所在的動作等級：超過第 k 高門檻為 len(actions) - k，未達任何門檻為 0（NaN 視為 0）"""
+    scores = np.asarray(scores, dtype=float)
+    conditions = [scores > threshold for threshold, _ in actions]
+    return np.select(conditions, np.arange(len(actions), 0, -1), 0)
+
+
+def action_triggers(scores, actions):
+    """進入較強等級的那一天回傳該等級的比例，其餘為 0"""
+    level = action_levels(scores, actions)
+    prev = np.concatenate([[0], level[:-1]])
+    fractions = np.array([0.0] + [fraction for _, fraction in reversed(actions)])
+    return np.where(level > prev, fractions[level], 0.0), level
+
+
+def _tier_labels(tiers, actions, level):
+    """等級 -> 對應 buy_tiers / sell_tiers 的名稱（找不到時以門檻表示）"""
+    names = dict(tiers)
+    labels = [''] + [names.get(threshold, f'>{threshold}') for threshold, _ in reversed(actions)]
+    return [labels[i] for i in level]
+
+
+def _simulate(close, price, buy_score, sell_score, buy_actions, sell_actions, delay, initial_cash, fee, tax):
+    """部位狀態機：回傳 (成交 K 棒位置, 每筆成交明細, 每日現金, 每日持股)
+
+    成交明細為 (side, level, score, fraction, price, shares, value, cost, cash, holding)。
+    """
+    n = len(close)
+    buy_frac, buy_level = action_triggers(buy_score, buy_actions)
+    sell_frac, sell_level = action_triggers(sell_score, sell_actions)
+    buy_frac = np.where(sell_frac > 0, 0.0, buy_frac)  # 賣出優先
+
+    signal_bars = np.flatnonzero((buy_frac > 0) | (sell_frac > 0))
+    signal_bars = signal_bars[signal_bars + delay < n]
+
+    # 逐筆成交更新現金與持股（只走訪有訊號的 K 棒，先轉成 Python 純量避免逐筆索引 numpy）
+    cash, shares = float(initial_cash), 0.0
+    exec_bars, cash_after, shares_after, records = [], [], [], []
+    events = zip((signal_bars + delay).tolist(), price[signal_bars + delay].tolist(),
+                 buy_frac[signal_bars].tolist(), sell_frac[signal_bars].tolist(),
+                 buy_level[signal_bars].tolist(), sell_level[signal_bars].tolist(),
+                 buy_score[signal_bars].tolist(), sell_score[signal_bars].tolist())
+    for at, p, b_frac, s_frac, b_level, s_level, b_score, s_score in events:
+        if s_frac > 0:
+            if shares <= 0:
+                continue
+            qty = shares * s_frac
+            value = qty * p
+            cost = value * (fee + tax)
+            cash += value - cost
+            shares -= qty
+            side, frac, level, score = 'sell', s_frac, s_level, s_score
+        else:
+            if cash <= 0:
+                continue
+            spend = cash * b_frac
+            qty = spend / (p * (1 + fee))
+            value = qty * p
+            cost = spend - value
+            cash -= spend
+            shares += qty
+            side, frac, level, score = 'buy', b_frac, b_level, b_score
+        exec_bars.append(at)
+        cash_after.append(cash)
+        shares_after.append(shares)
+        records.append((side, level, score, frac, p, qty, value, cost, cash, shares))
+
+    # 每日持股與現金：沿用最近一次成交後的狀態
+    exec_bars = np.asarray(exec_bars, dtype=np.int64)
+    last = np.searchsorted(exec_bars, np.arange(n), side='right') - 1
+    held = last >= 0
+    shares_daily = np.where(held, np.asarray(shares_after + [0.0])[last], 0.0)
+    cash_daily = np.where(held, np.asarray(cash_after + [initial_cash])[last], initial_cash)
+    return exec_bars, records, cash_daily, shares_daily
+
+
+def _fill_prices(df, fill):
+    if fill == 'open':
+        return df['Open'].to_numpy(dtype=float), 1
+    if fill == 'close':
+        return df['Close'].to_numpy(dtype=float), 0
+    raise ValueError(f"不支援的成交方式: {fill}")
+
+
+def backtest(df, profile, initial_cash=1_000_000.0, fill='open', fee=DEFAULT_FEE, tax=DEFAULT_TAX,
+             periods_per_year=TRADING_DAYS):
+    """以策略門檻回測評分結果
+
+    df 需含 Close、Buy_Score、Sell_Score（fill='open' 時另需 Open），
+    例如 pipeline.run_profile 的輸出。允許零碎股數，不考慮整張交易單位。
+    """
+    if not profile.buy_actions or not profile.sell_actions:
+        raise ValueError(f"策略 {profile.name} 未設定 buy_actions / sell_actions")
+    price, delay = _fill_prices(df, fill)
+    close = df['Close'].to_numpy(dtype=float)
+    exec_bars, records, cash_daily, shares_daily = _simulate(
+        close, price, df['Buy_Score'].to_numpy(dtype=float), df['Sell_Score'].to_numpy(dtype=float),
+        profile.buy_actions, profile.sell_actions, delay, initial_cash, fee, tax)
+
+    equity = cash_daily + shares_daily * close
+    equity_frame = pd.DataFrame({
+        'Close': close,
+        'Cash': cash_daily,
+        'Shares': shares_daily,
+        'Position': shares_daily * close / equity,
+        'Equity': equity,
+        'Drawdown': equity / np.fmax.accumulate(equity) - 1,
+    }, index=df.index)
+
+    trades = pd.DataFrame(records, columns=['Side', 'Level', 'Score', 'Fraction', 'Price', 'Shares',
+                                            'Value', 'Cost', 'Cash', 'Holding'])
+    trades.insert(0, 'Date', df.index[exec_bars])
+    buy_rows = (trades['Side'] == 'buy').to_numpy()
+    levels = trades.pop('Level').to_numpy(dtype=int)
+    tiers = np.empty(len(trades), dtype=object)
+    tiers[buy_rows] = _tier_labels(profile.buy_tiers, profile.buy_actions, levels[buy_rows])
+    tiers[~buy_rows] = _tier_labels(profile.sell_tiers, profile.sell_actions, levels[~buy_rows])
+    trades.insert(2, 'Tier', tiers)
+
+    return BacktestResult(equity=equity_frame, trades=trades,
+                          stats=backtest_stats(equity_frame, trades, initial_cash, periods_per_year))
+
+
+def backtest_stats(equity_frame, trades, initial_cash, periods_per_year=TRADING_DAYS):
+    """績效摘要：周轉率 = 成交總金額 / 平均權益，另以年化表示"""
+    return _summary(equity_frame['Equity'].to_numpy(dtype=float), equity_frame['Close'].to_numpy(dtype=float),
+                    equity_frame['Position'].to_numpy(dtype=float), trades['Side'].to_numpy(),
+                    trades['Value'].to_numpy(dtype=float), trades['Cost'].to_numpy(dtype=float),
+                    initial_cash, periods_per_year)
+
+
+def _summary(equity, close, position, sides, values, costs, initial_cash, periods_per_year):
+    n = len(equity)
+    if n == 0:
+        return {}
+    years = n / periods_per_year
+    final = equity[-1]
+    turnover = values.sum() / equity.mean()
+    return {
+        'initial_cash': float(initial_cash),
+        'final_equity': float(final),
+        'total_return': float(final / initial_cash - 1),
+        'cagr': float((final / initial_cash) ** (1 / years) - 1) if final > 0 else -1.0,
+        'max_drawdown': float((equity / np.fmax.accumulate(equity) - 1).min()),
+        'buy_and_hold_return': float(close[-1] / close[0] - 1),
+        'trades': int(len(sides)),
+        'buys': int((sides == 'buy').sum()),
+        'sells': int((sides == 'sell').sum()),
+        'costs': float(costs.sum()),
+        'turnover': float(turnover),
+        'annual_turnover': float(turnover / years),
+        'avg_position': float(position.mean()),
+    }
+
+
+def backtest_arrays(close, price, buy_score, sell_score, buy_actions, sell_actions, delay=1,
+                    initial_cash=1_000_000.0, fee=DEFAULT_FEE, tax=DEFAULT_TAX, periods_per_year=TRADING_DAYS):
+    """只回傳績效摘要的回測（不建 DataFrame），供參數掃描大量呼叫"""
+    _, records, cash_daily, shares_daily = _simulate(close, price, buy_score, sell_score, buy_actions,
+                                                     sell_actions, delay, initial_cash, fee, tax)
+    equity = cash_daily + shares_daily * close
+    trades = np.array([r[:1] + r[6:8] for r in records], dtype=object).reshape(-1, 3)
+    return _summary(equity, close, shares_daily * close / equity, trades[:, 0],
+                    trades[:, 1].astype(float), trades[:, 2].astype(float), initial_cash, periods_per_year)
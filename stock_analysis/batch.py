@@ -0,0 +1,99 @@
+"""全市場批次評分：以多進程平行處理股票清單，單一股票失敗不影響其他股票"""
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from .data import DEFAULT_CACHE_DIR, OHLCVStore
+from .pipeline import run_profile
+from .profiles import get_profile
+
+SCORE_COLUMNS = ['Close', 'Buy_Score', 'Sell_Score']
+
+
+@dataclass
+class BatchResult:
+    """批次評分結果
+
+    latest:  每檔股票最新一根 K 棒的 Close / Buy_Score / Sell_Score（index 為代號）
+    history: 全部歷史評分，MultiIndex (Ticker, Date)
+    errors:  {代號: 錯誤訊息}
+    memory:  {代號: 該檔評分結果佔用的 bytes}
+    """
+    latest: pd.DataFrame
+    history: pd.DataFrame
+    errors: dict = field(default_factory=dict)
+    memory: dict = field(default_factory=dict)
+
+
+def read_universe(path):
+    """讀取股票清單檔：每行一個代號，# 開頭為註解"""
+    with open(path, encoding='utf-8') as f:
+        return [line.split('#')[0].strip() for line in f if line.split('#')[0].strip()]
+
+
+def score_ticker(ticker, profile_name, start=None, end=None, cache_dir=DEFAULT_CACHE_DIR, offline=None, columns=None,
+                 compact=False):
+    """單一股票：載入資料並依策略評分，回傳含 Close 與評分欄位的 DataFrame
+
+    compact=True 時以精簡型別回傳（見 pipeline.compact_frame，columns 須為精簡後仍保留的欄位）。
+    """
+    store = OHLCVStore(cache_dir, offline=offline)
+    df = store.get(ticker, start, end)
+    if df.empty:
+        raise ValueError(f"{ticker} 沒有資料")
+    scored = run_profile(df, get_profile(profile_name), compact=compact)
+    return scored[columns or SCORE_COLUMNS]
+
+
+def _score_task(task):
+    """子進程工作：捕捉例外並回傳錯誤訊息，避免單檔失敗中斷整批"""
+    ticker, profile_name, start, end, cache_dir, offline, columns, compact = task
+    try:
+        return ticker, score_ticker(ticker, profile_name, start, end, cache_dir, offline, columns, compact), None
+    except Exception as exc:
+        return ticker, None, f"{type(exc).__name__}: {exc}\n{traceback.format_exc(limit=3)}"
+
+
+def run_universe(tickers, profile_name, start=None, end=None, workers=None, chunksize=None,
+                 cache_dir=DEFAULT_CACHE_DIR, offline=None, columns=None, compact=False):
+    """對股票清單批次評分
+
+    workers 預設為 CPU 核心數；chunksize 預設讓每個 worker 約分到 4 批，
+    降低進程間傳遞的次數。workers=1 時在目前進程內依序執行（方便除錯）。
+    compact=True 時各檔結果以精簡型別傳回，BatchResult.memory 可比較每檔佔用的記憶體。
+    """
+    workers = workers or os.cpu_count() or 1
+    tasks = [(t, str(profile_name), start, end, cache_dir, offline, columns, compact) for t in tickers]
+    if chunksize is None:
+        chunksize = max(1, len(tasks) // (workers * 4))
+
+    if workers == 1:
+        results = map(_score_task, tasks)
+        return _collect(results)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return _collect(pool.map(_score_task, tasks, chunksize=chunksize))
+
+
+def _collect(results):
+    frames = {}
+    errors = {}
+    for ticker, frame, error in results:
+        if error is not None:
+            errors[ticker] = error
+        else:
+            frames[ticker] = frame
+
+    if frames:
+        history = pd.concat(frames, names=['Ticker', 'Date'])
+        last = {t: f.iloc[-1] for t, f in frames.items() if len(f)}
+        latest = pd.DataFrame.from_dict(last, orient='index')
+        latest.insert(0, 'Date', [frames[t].index[-1] for t in last])
+        latest.index.name = 'Ticker'
+    else:
+        history = pd.DataFrame()
+        latest = pd.DataFrame()
+    memory = {t: int(f.memory_usage(deep=True).sum()) for t, f in frames.items()}
+    return BatchResult(latest=latest, history=history, errors=errors, memory=memory)
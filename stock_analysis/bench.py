@@ -0,0 +1,376 @@
+"""離線效能基準：以固定亂數種子產生的合成 OHLCV，分別量測每個指標與評分階段
+
+用法：
+    python -m stock_analysis.bench                                   # 1k / 10k / 100k 根，印出結果
+    python -m stock_analysis.bench --save benchmarks/baseline.json   # 儲存基準
+    python -m stock_analysis.bench --compare benchmarks/baseline.json --tolerance 0.25
+    python -m stock_analysis.bench --parity                          # 比對 numpy / numba 計算後端
+    python -m stock_analysis.bench --startup                         # CLI 啟動時間與延遲載入檢查
+    python -m stock_analysis.bench --memory                          # 每檔記憶體：完整 vs 精簡模式
+    python -m stock_analysis.bench --chunked --chunk-size 4096       # 分段計算：與整段結果比對、尖峰記憶體
+    python -m stock_analysis.bench --streaming --sizes 5000          # 逐筆串流：與整段結果比對、每筆更新時間
+
+每個階段先算好相依欄位（不計時），再重複執行取最短時間；尖峰記憶體以
+tracemalloc 另外跑一次量測（只計該階段新配置的記憶體）。--compare 時任一階段
+比基準慢超過 tolerance 即列為退步，並以結束碼 1 結束（可接在每日排程之後）。
+"""
+import argparse
+import copy
+import dataclasses
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from . import kernels
+from .chunked import CHUNK_SIZE, iter_profile_chunks
+from .pipeline import (
+    COMPACT_RTOL,
+    INDICATOR_STAGES,
+    compute_indicators,
+    fibo_columns,
+    profile_frame,
+    resolve_stages,
+    run_profile,
+)
+from .profiles import get_profile
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+DEFAULT_PROFILES = ('6669', '3231')
+
+
+def synthetic_ohlcv(n, seed=0, start='1850-01-01', price=100.0):
+    """固定種子的合成日 K：對數報酬隨機漫步 + 隨機區間，數值可重現
+
+    起始日期預設 1850 年，讓 100k 根的營業日仍在 pandas 可表示的日期範圍內。
+    """
+    rng = np.random.default_rng(seed)
+    close = price * np.exp(np.cumsum(rng.normal(0.0003, 0.02, n)))
+    open_ = close * np.exp(rng.normal(0, 0.005, n))
+    spread = np.abs(rng.normal(0, 0.01, n))
+    high = np.maximum(open_, close) * (1 + spread)
+    low = np.minimum(open_, close) * (1 - spread)
+    volume = rng.lognormal(15, 0.5, n).round()
+    index = pd.bdate_range(start, periods=n, name='Date')
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume}, index=index)
+
+
+def _measure(func, repeat):
+    """回傳 (最短秒數, 尖峰記憶體 bytes)"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def _profile_stages(df, profile):
+    """策略管線的各階段：[(名稱, 無參數函數)]，相依欄位先算好"""
+    stages = []
+    for name in resolve_stages(profile.stages):
+        func, deps = INDICATOR_STAGES[name]
+        prepared = compute_indicators(df, deps) if deps else df
+        stages.append((name, lambda func=func, prepared=prepared: func(prepared)))
+
+    base = compute_indicators(df, profile.stages)
+    stages.append(('fibo', lambda: fibo_columns(base, profile.fibo_window, profile.fibo_levels,
+                                                profile.fibo_swing, profile.fibo_valid_threshold)))
+    frame = profile_frame(base, profile)
+    stages.append(('buy_score', lambda: profile.buy_scorer(frame)))
+    stages.append(('sell_score', lambda: profile.sell_scorer(frame)))
+    stages.append(('total', lambda: run_profile(df, profile)))
+    return stages
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, profiles=DEFAULT_PROFILES, repeat=3, seed=0, log=None):
+    """執行基準量測，回傳每個 (策略, 階段, K 棒數) 一列的結果清單"""
+    results = []
+    for n in sizes:
+        df = synthetic_ohlcv(n, seed=seed)
+        for name in profiles:
+            profile = get_profile(name)
+            for stage, func in _profile_stages(df, profile):
+                seconds, peak = _measure(func, repeat)
+                row = {
+                    'profile': profile.name,
+                    'stage': stage,
+                    'bars': n,
+                    'seconds': seconds,
+                    'bars_per_sec': n / seconds if seconds > 0 else float('inf'),
+                    'peak_mb': peak / 2 ** 20,
+                }
+                results.append(row)
+                if log:
+                    log(row)
+    return results
+
+
+def memory_report(sizes=DEFAULT_SIZES, profiles=DEFAULT_PROFILES, seed=0):
+    """每檔 run_profile 輸出佔用的記憶體與計算時的尖峰記憶體：完整 float64 與精簡模式，
+    並檢查精簡後的誤差是否在 COMPACT_RTOL 內"""
+    rows = []
+    for n in sizes:
+        df = synthetic_ohlcv(n, seed=seed)
+        for name in profiles:
+            profile = get_profile(name)
+            full = run_profile(df, profile)  # 先跑一次，尖峰不含首次載入與編譯
+            compact = run_profile(df, profile, compact=True)
+            peaks = {}
+            for mode in (False, True):
+                tracemalloc.start()
+                try:
+                    run_profile(df, profile, compact=mode)
+                    peaks[mode] = tracemalloc.get_traced_memory()[1]
+                finally:
+                    tracemalloc.stop()
+            worst = 0.0
+            for col in compact.columns:
+                a = full[col].to_numpy(dtype=float)
+                b = compact[col].to_numpy(dtype=float)
+                ok = ~np.isnan(a)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    rel = np.abs(a[ok] - b[ok]) / np.abs(a[ok])
+                worst = max(worst, float(np.nan_to_num(rel, posinf=0.0).max(initial=0.0)))
+            rows.append({
+                'profile': profile.name,
+                'bars': n,
+                'full_columns': full.shape[1],
+                'compact_columns': compact.shape[1],
+                'full_mb': full.memory_usage(deep=True).sum() / 2 ** 20,
+                'compact_mb': compact.memory_usage(deep=True).sum() / 2 ** 20,
+                'full_peak_mb': peaks[False] / 2 ** 20,
+                'compact_peak_mb': peaks[True] / 2 ** 20,
+                'max_rel_error': worst,
+                'within_tolerance': worst <= COMPACT_RTOL,
+            })
+    return rows
+
+
+def chunked_report(sizes, profiles, seed=0, chunk_size=CHUNK_SIZE):
+    """分段與整段計算：逐欄比對是否逐位元相同，並以 tracemalloc 量測兩者的尖峰記憶體
+
+    分段計算時每段結果只保留雜湊後即丟棄，模擬逐段寫出的用法。
+    """
+    rows = []
+    for n in sizes:
+        df = synthetic_ohlcv(n, seed=seed)
+        for name in profiles:
+            profile = get_profile(name)
+            tracemalloc.start()
+            full = run_profile(df, profile)
+            full_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            expected = pd.util.hash_pandas_object(full, index=False).to_numpy()
+            del full
+
+            parts = []
+            tracemalloc.start()
+            for part in iter_profile_chunks(df, profile, chunk_size):
+                parts.append(pd.util.hash_pandas_object(part, index=False).to_numpy())
+            chunked_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            rows.append({
+                'profile': profile.name,
+                'bars': n,
+                'chunk_size': chunk_size,
+                'full_mb': full_peak / 2 ** 20,
+                'chunked_mb': chunked_peak / 2 ** 20,
+                'identical': bool(np.array_equal(expected, np.concatenate(parts))),
+            })
+    return rows
+
+
+def _mismatched_columns(expected, actual):
+    """actual 與 expected 不逐位元相同（或缺少）的欄位，旗標與整數欄位以 float 比較"""
+    return [col for col in expected.columns
+            if col not in actual or not np.array_equal(expected[col].to_numpy(float), actual[col].to_numpy(float),
+                                                       equal_nan=True)]
+
+
+def streaming_report(sizes, profiles, seed=0, updates=200, tickers=100):
+    """逐筆串流與整段計算：滾動與擴張兩種 Slope_PR 各比對一次
+
+    feed 回放整段、以及暖機後逐筆 update 最後 updates 根，每一欄都須與 run_profile 逐位元相同；
+    另量測單筆 update 與 update_universe（tickers 檔同時更新一根）的每檔時間。
+    """
+    from .streaming import StreamingScorer, update_universe
+    rows = []
+    for n in sizes:
+        df = synthetic_ohlcv(n, seed=seed)
+        warm, bars = df.iloc[:-updates], df.iloc[-updates:].to_dict('records')
+        for name in profiles:
+            for rank in ('rolling', 'expanding'):
+                profile = dataclasses.replace(get_profile(name), slope_rank=rank)
+                expected = run_profile(df, profile)
+                mismatched = _mismatched_columns(expected, StreamingScorer(profile).feed(df))
+
+                scorer = StreamingScorer(profile, history=warm)
+                universe = {f'T{i}': copy.deepcopy(scorer) for i in range(tickers)}
+                start = time.perf_counter()
+                updated = [scorer.update(bar) for bar in bars]
+                update_seconds = (time.perf_counter() - start) / len(bars)
+                updated = pd.DataFrame(updated, index=df.index[-updates:])
+                mismatched += [c for c in _mismatched_columns(expected.iloc[-updates:], updated) if c not in mismatched]
+
+                start = time.perf_counter()
+                for bar in bars[:10]:
+                    update_universe(universe, dict.fromkeys(universe, bar))
+                universe_seconds = (time.perf_counter() - start) / (10 * tickers)
+                rows.append({
+                    'profile': profile.name,
+                    'slope_rank': rank,
+                    'bars': n,
+                    'update_us': update_seconds * 1e6,
+                    'universe_us': universe_seconds * 1e6,
+                    'tickers': tickers,
+                    'mismatched': mismatched,
+                })
+    return rows
+
+
+def startup_time(repeat=5):
+    """以子進程量測載入 CLI 的時間（含直譯器啟動，取最短），並列出啟動時就被載入的重型模組"""
+    from .cli import LAZY_MODULES
+    code = (f"import sys, stock_analysis.cli; "
+            f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))")
+    best, eager = float('inf'), []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+        best = min(best, time.perf_counter() - start)
+        eager = [m for m in out.strip().split(',') if m]
+    return {'seconds': best, 'eager_imports': eager}
+
+
+def environment():
+    import scipy
+    return {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'scipy': scipy.__version__,
+        'backend': kernels.get_backend(),
+    }
+
+
+def save_baseline(path, results):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=2)
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare(results, baseline, tolerance=0.25):
+    """與基準比較：回傳 DataFrame（ratio = 本次秒數 / 基準秒數，regressed 為是否超過 1 + tolerance）"""
+    base = {(r['profile'], r['stage'], r['bars']): r['seconds'] for r in baseline['results']}
+    rows = []
+    for r in results:
+        ref = base.get((r['profile'], r['stage'], r['bars']))
+        if ref is None:
+            continue
+        ratio = r['seconds'] / ref if ref > 0 else float('inf')
+        rows.append({**r, 'baseline_seconds': ref, 'ratio': ratio, 'regressed': ratio > 1 + tolerance})
+    return pd.DataFrame(rows)
+
+
+def _format_row(row):
+    return (f"{row['profile']:>6} {row['stage']:<12} {row['bars']:>8,d} bars  "
+            f"{row['seconds'] * 1000:10.2f} ms  {row['bars_per_sec']:14,.0f} bars/s  {row['peak_mb']:8.2f} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='stock_analysis 各階段效能基準（離線、合成資料）')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help='K 棒數')
+    parser.add_argument('--profiles', nargs='+', default=list(DEFAULT_PROFILES), help='策略名稱')
+    parser.add_argument('--repeat', type=int, default=3, help='每階段重複次數（取最短）')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', help='把結果存成基準 JSON')
+    parser.add_argument('--compare', help='與基準 JSON 比較')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='容許變慢的比例')
+    parser.add_argument('--backend', choices=kernels.BACKENDS + ('auto',), help='遞迴核心的計算後端')
+    parser.add_argument('--parity', action='store_true', help='只比對 numpy 與 numba 後端的輸出')
+    parser.add_argument('--startup', action='store_true', help='只量測 CLI 啟動時間')
+    parser.add_argument('--memory', action='store_true', help='只比較完整與精簡模式的每檔記憶體')
+    parser.add_argument('--chunked', action='store_true', help='只比對分段與整段計算（結果與尖峰記憶體）')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='--chunked 的段落長度')
+    parser.add_argument('--streaming', action='store_true', help='只比對逐筆串流與整段計算（結果與每筆更新時間）')
+    args = parser.parse_args(argv)
+
+    if args.memory:
+        rows = memory_report(args.sizes, args.profiles, args.seed)
+        for r in rows:
+            print(f"{r['profile']:>6} {r['bars']:>8,d} bars  {r['full_columns']:3d} 欄 {r['full_mb']:8.2f} MB -> "
+                  f"{r['compact_columns']:3d} 欄 {r['compact_mb']:8.2f} MB  尖峰 {r['full_peak_mb']:8.2f} -> "
+                  f"{r['compact_peak_mb']:8.2f} MB  最大相對誤差 {r['max_rel_error']:.2e}")
+        return 0 if all(r['within_tolerance'] for r in rows) else 1
+
+    if args.chunked:
+        rows = chunked_report(args.sizes, args.profiles, args.seed, args.chunk_size)
+        for r in rows:
+            print(f"{r['profile']:>6} {r['bars']:>8,d} bars  整段 {r['full_mb']:8.2f} MB  "
+                  f"分段 ({r['chunk_size']:,d} 根) {r['chunked_mb']:8.2f} MB  {'逐位元相同' if r['identical'] else '不一致'}")
+        return 0 if all(r['identical'] for r in rows) else 1
+
+    if args.streaming:
+        rows = streaming_report(args.sizes, args.profiles, args.seed)
+        for r in rows:
+            status = '逐位元相同' if not r['mismatched'] else '不一致: ' + ', '.join(r['mismatched'])
+            print(f"{r['profile']:>6} {r['slope_rank']:<9} {r['bars']:>8,d} bars  update {r['update_us']:7.0f} µs  "
+                  f"update_universe ({r['tickers']} 檔) {r['universe_us']:5.0f} µs/檔  {status}")
+        return 0 if not any(r['mismatched'] for r in rows) else 1
+
+    if args.startup:
+        report = startup_time(args.repeat)
+        print(f"CLI 啟動 {report['seconds'] * 1000:.0f} ms；啟動時已載入：{', '.join(report['eager_imports']) or '無'}")
+        return 1 if report['eager_imports'] else 0
+
+    if args.parity:
+        report = kernels.parity_report(seed=args.seed)
+        for name, diff in report.items():
+            print(f"{name:<18} 最大差異 {diff:.3g}")
+        return 0 if all(diff == 0 for diff in report.values()) else 1
+    if args.backend:
+        kernels.set_backend(args.backend)
+    print(f"計算後端：{kernels.get_backend()}")
+
+    results = run_benchmarks(args.sizes, args.profiles, args.repeat, args.seed,
+                             log=lambda row: print(_format_row(row), flush=True))
+    if args.save:
+        save_baseline(args.save, results)
+        print(f"基準已儲存：{args.save}")
+    if args.compare:
+        report = compare(results, load_baseline(args.compare), args.tolerance)
+        regressed = report[report['regressed']] if len(report) else report
+        if len(regressed):
+            print(f"\n效能退步 (> {args.tolerance:.0%})：")
+            for _, row in regressed.iterrows():
+                print(f"  {row['profile']} {row['stage']} {row['bars']:,d} bars: "
+                      f"{row['baseline_seconds'] * 1000:.2f} ms -> {row['seconds'] * 1000:.2f} ms (x{row['ratio']:.2f})")
+            return 1
+        print(f"\n與基準相比無退步（{len(report)} 項）")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,303 @@
+"""分段 (out-of-core) 評分：把長序列切成固定長度的段落依序計算，峰值記憶體只與段落長度有關
+
+每段計算時在前面接上前一段輸出的最後 halo 根（各階段往回讀取的最大根數，見
+pipeline.STAGE_LOOKBACK），滾動視窗類指標直接在「halo + 本段」上計算，halo 列沿用
+前一段的結果；遞迴指標（MACD 的 EMA、RSI 的 Wilder EWM、DMI 的平滑）延續前一段
+最後的狀態，不重算歷史。pandas 的滾動平均 / 標準差（MA、布林通道、均量、KD 的 D）
+結果與整段歷史有關，同樣以 rolling.RollingMeanState / RollingVarState 延續逐筆狀態
+（Python 迴圈，每根每條約 1~2 µs）。斜率迴歸的累積和在 rolling.ROLLING_BLOCK 的倍數處
+重新起算，段落起點都對齊該倍數，因此每一欄都與 run_profile 整段計算的結果逐位元相同。
+
+用法：
+    for part in iter_profile_chunks(iter_parquet('6669.TW.parquet'), get_profile('6669')):
+        part.to_parquet(...)                  # 每段寫出後即可釋放
+
+40 萬根時尖峰記憶體約 278 MB -> 80 MB（`python -m stock_analysis.bench --chunked` 比對並量測）。
+
+假設收盤價沒有 NaN（data.clean_ohlcv 的輸出即是如此）。擴張視窗的 Slope_PR
+(profile.slope_rank='expanding') 需要保留全部歷史斜率的排序，記憶體隨歷史長度成長
+（每根 8 bytes）。
+"""
+import numpy as np
+import pandas as pd
+
+from . import kernels
+from .indicators import directional_movement, smooth_dmi, true_range
+from .instrument import stage
+from .pipeline import OHLCV, STAGE_LOOKBACK, compact_frame, fibo_lookback, profile_frame, resolve_stages, run_stage, \
+    score_frame
+from .rolling import ROLLING_BLOCK, RollingMeanState, RollingVarState, expanding_percentile_rank_arrays
+
+# 預設段落長度（ROLLING_BLOCK 的倍數）；日 K 約 260 年，全部欄位約 40 MB
+CHUNK_SIZE = 65_536
+# 評分往回讀取的根數（見 streaming.SCORE_LOOKBACK）
+SCORE_LOOKBACK = 3
+
+RSI_WINDOW = 14
+DMI_PERIOD = 14
+KD_WINDOW = 9
+KD_SMOOTH = 3
+BB_WINDOW = 20
+
+
+def _round_up(n, step):
+    return -(-n // step) * step
+
+
+def profile_halo(profile):
+    """策略分段計算所需的 halo 根數
+
+    各階段與 FIBO 往回讀取的最大值加上評分回看，取 ROLLING_BLOCK 的倍數後再多一個區塊：
+    斜率的累積和從視窗起點所在區塊的開頭累加，該區塊的資料也必須與整段計算相同。
+    """
+    lookback = max([STAGE_LOOKBACK[name] for name in resolve_stages(profile.stages)] + [fibo_lookback(profile)])
+    return _round_up(lookback + SCORE_LOOKBACK, ROLLING_BLOCK) + ROLLING_BLOCK
+
+
+def _ewm_continue(values, prev, **kwargs):
+    """pandas ewm(adjust=False) 從前一段的最後一個值接續（prev 為 None 時從頭開始）
+
+    前面補上 prev 再計算：第一個值原樣保留，之後的遞迴與整段計算的運算完全相同。
+    """
+    if prev is None:
+        return pd.Series(values).ewm(adjust=False, **kwargs).mean().to_numpy()
+    return pd.Series(np.concatenate([[prev], values])).ewm(adjust=False, **kwargs).mean().to_numpy()[1:]
+
+
+def _wilder_continue(values, prev, period):
+    """kernels.wilder_smooth 從前一段的最後一個值接續"""
+    if prev is None:
+        return smooth_dmi(values, period)
+    return kernels.wilder_smooth(np.concatenate([[prev], values]), period)[1:]
+
+
+def _carry_rsi(frame, new, state):
+    """D. RSI (14)：與 ta 的 RSIIndicator 相同的運算，up / down 的 EWM 延續前一段"""
+    diff = frame['Close'].diff().to_numpy()[-new:]
+    up = np.where(diff > 0, diff, 0.0)
+    down = -np.where(diff < 0, diff, 0.0)
+    emaup = _ewm_continue(up, state.get('rsi_up'), alpha=1 / RSI_WINDOW)
+    emadn = _ewm_continue(down, state.get('rsi_down'), alpha=1 / RSI_WINDOW)
+    state['rsi_up'], state['rsi_down'] = emaup[-1], emadn[-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = np.where(emadn == 0, 100, 100 - (100 / (1 + emaup / emadn)))
+    # ta 以 min_periods=window 遮蔽開頭（第一根的 diff 記為 0，仍計入筆數）
+    position = state['offset'] + np.arange(new)
+    return {'RSI': np.where(position < RSI_WINDOW - 1, np.nan, rsi)}
+
+
+def _carry_macd(frame, new, state):
+    """E. MACD (12, 26, 9)：三條 EMA 延續前一段"""
+    close = frame['Close'].to_numpy()[-new:]
+    ema12 = _ewm_continue(close, state.get('ema12'), span=12)
+    ema26 = _ewm_continue(close, state.get('ema26'), span=26)
+    dif = ema12 - ema26
+    dem = _ewm_continue(dif, state.get('dem'), span=9)
+    state['ema12'], state['ema26'], state['dem'] = ema12[-1], ema26[-1], dem[-1]
+    return {'EMA12': ema12, 'EMA26': ema26, 'MACD_DIF': dif, 'MACD_DEM': dem, 'MACD_OSC': dif - dem}
+
+
+def _carry_dmi(frame, new, state):
+    """F. DMI (14日)：TR / DM 需要前一根（取自 halo），三條平滑與 ADX 延續前一段"""
+    high, low, close = (frame[c].to_numpy() for c in ('High', 'Low', 'Close'))
+    tr = true_range(high, low, close)[-new:]
+    pdm, mdm = (dm[-new:] for dm in directional_movement(high, low))
+    str_smooth = _wilder_continue(tr, state.get('str'), DMI_PERIOD)
+    spdm_smooth = _wilder_continue(pdm, state.get('spdm'), DMI_PERIOD)
+    smdm_smooth = _wilder_continue(mdm, state.get('smdm'), DMI_PERIOD)
+
+    denom = np.where(str_smooth != 0, str_smooth, 1)
+    pdi = 100 * spdm_smooth / denom
+    mdi = 100 * smdm_smooth / denom
+    di_sum = pdi + mdi
+    dx = 100 * np.abs(pdi - mdi) / np.where(di_sum != 0, di_sum, 1)
+    adx = _wilder_continue(dx, state.get('adx'), DMI_PERIOD)
+    state['str'], state['spdm'], state['smdm'], state['adx'] = str_smooth[-1], spdm_smooth[-1], smdm_smooth[-1], adx[-1]
+    return {'PDI': pdi, 'MDI': mdi, 'ADX': adx}
+
+
+def _rolling_continue(values, state, key, window, std=False):
+    """pandas rolling(window).mean()（std=True 時為 .std()）延續前一段的逐筆狀態"""
+    if key not in state:
+        state[key] = RollingVarState(window, std=True) if std else RollingMeanState(window)
+    return np.array(state[key].extend(values))
+
+
+def _diff_continue(values, state, key):
+    """Series.diff()：第一根減去前一段的最後一個值（第一段為 NaN）"""
+    out = np.diff(values, prepend=state.get(key, np.nan))
+    state[key] = values[-1]
+    return out
+
+
+def _carry_ma(frame, new, state, window):
+    close = frame['Close'].to_numpy()[-new:]
+    ma = _rolling_continue(close, state, f'ma{window}', window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bias = (close - ma) / ma * 100
+    return {f'MA{window}': ma, f'MA{window}_Slope': _diff_continue(ma, state, f'ma{window}_last'), f'Bias_{window}': bias}
+
+
+def _carry_ma60(frame, new, state):
+    """B. MA 季線 (60MA)：滾動平均延續前一段"""
+    return _carry_ma(frame, new, state, 60)
+
+
+def _carry_ma20(frame, new, state):
+    """B. MA 月線 (20MA)：滾動平均延續前一段"""
+    return _carry_ma(frame, new, state, 20)
+
+
+def _carry_kd(frame, new, state):
+    """D. KD (9, 3)：K 只讀取最近 9 根（取自 halo），D（K 的 3 日平均）延續前一段"""
+    from ta.momentum import StochasticOscillator
+    k = StochasticOscillator(high=frame['High'], low=frame['Low'], close=frame['Close'], window=KD_WINDOW,
+                             smooth_window=KD_SMOOTH).stoch().to_numpy()[-new:]
+    return {'K': k, 'D': _rolling_continue(k, state, 'kd_d', KD_SMOOTH)}
+
+
+def _carry_bb(frame, new, state):
+    """G. Bollinger Bands (20日, 2倍標準差)：平均與標準差延續前一段，其餘同 pipeline._stage_bb"""
+    close = frame['Close'].to_numpy()[-new:]
+    mid = _rolling_continue(close, state, 'bb_mid', BB_WINDOW)
+    std = _rolling_continue(close, state, 'bb_std', BB_WINDOW, std=True)
+    upper = mid + 2 * std
+    lower = mid - 2 * std
+    return {
+        'BB_Mid': mid,
+        'BB_Std': std,
+        'BB_Upper': upper,
+        'BB_Lower': lower,
+        'BB_pctB': (close - lower) / (upper - lower + 1e-10),
+        'BB_BandWidth': (upper - lower) / (mid + 1e-10),
+    }
+
+
+def _carry_volume(frame, new, state):
+    """H. Volume MA：兩條滾動平均延續前一段"""
+    volume = frame['Volume'].to_numpy()[-new:]
+    return {'VolMA5': _rolling_continue(volume, state, 'vol5', 5), 'VolMA20': _rolling_continue(volume, state, 'vol20', 20)}
+
+
+# 延續狀態的階段（遞迴指標與 pandas 滾動平均 / 標準差）-> 計算函數 (frame, 本段根數, state) -> {欄位: 本段的值}
+CARRY_STAGES = {
+    'ma60': _carry_ma60,
+    'ma20': _carry_ma20,
+    'rsi': _carry_rsi,
+    'kd': _carry_kd,
+    'macd': _carry_macd,
+    'dmi': _carry_dmi,
+    'bb': _carry_bb,
+    'volume': _carry_volume,
+}
+
+
+class ChunkedScorer:
+    """單一策略的分段評分器：依序餵入相鄰的 OHLCV 段落，回傳與 run_profile 相同的逐段結果
+
+    除最後一段外，每段長度須為 ROLLING_BLOCK 的倍數（iter_profile_chunks 會自動重切）。
+    """
+
+    def __init__(self, profile, compact=False):
+        self.profile = profile
+        self.compact = compact
+        self.stages = resolve_stages(profile.stages)
+        self.halo = profile_halo(profile)
+        self.tail = None
+        self.state = {'offset': 0}
+        self.rank_prior = np.empty(0)
+        self.closed = False
+
+    def process(self, block):
+        """計算一段新的 K 棒（DataFrame，含 OHLCV），回傳該段的指標與評分"""
+        if self.closed:
+            raise ValueError(f'前面各段共 {self.state["offset"]} 根，不是 {ROLLING_BLOCK} 的倍數，無法再接續')
+        block = block[OHLCV]
+        new = len(block)
+        frame = block.copy() if self.tail is None else pd.concat([self.tail[OHLCV], block])
+        n_halo = len(frame) - new
+
+        for name in self.stages:
+            if name in CARRY_STAGES:
+                with stage(name, rows=new):
+                    carried = CARRY_STAGES[name](frame, new, self.state)
+                for col, values in carried.items():
+                    frame[col] = np.concatenate([self.tail[col].to_numpy(), values]) if n_halo else values
+            else:
+                for col, values in run_stage(name, frame).items():
+                    values = np.array(values)
+                    if n_halo:
+                        values[:n_halo] = self.tail[col].to_numpy()
+                    frame[col] = values
+        return self._finish(frame, n_halo)
+
+    def _finish(self, frame, n_halo):
+        cache = {}
+        rank_key = self.profile.slope_rank_key()
+        if rank_key is not None and 'Slope_60' in frame.columns:
+            with stage('slope_pr_expanding', rows=len(frame) - n_halo):
+                cache[rank_key] = self._expanding_rank(frame, n_halo).to_frame('Slope_PR')
+        scored = profile_frame(frame, self.profile, cache)
+        out = pd.concat([scored, *score_frame(scored, self.profile)], axis=1)
+
+        new = len(out) - n_halo
+        self.tail = out.iloc[-self.halo:] if self.halo else out.iloc[:0]
+        self.state['offset'] += new
+        if self.state['offset'] % ROLLING_BLOCK:
+            self.closed = True
+        out = out.iloc[n_halo:]
+        return compact_frame(out, self.profile) if self.compact else out
+
+    def _expanding_rank(self, frame, n_halo):
+        """擴張視窗 Slope_PR：以前面各段的排序斜率 (rank_prior) 接續，halo 列沿用前一段"""
+        start = self.profile.slope_rank_start
+        slope = frame['Slope_60'].to_numpy()[n_halo:].copy()
+        position = self.state['offset'] + np.arange(len(slope))
+        slope[position < start] = np.nan
+        rank = expanding_percentile_rank_arrays(slope, prior=self.rank_prior) * 100
+        valid = np.sort(slope[~np.isnan(slope)])
+        self.rank_prior = np.insert(self.rank_prior, np.searchsorted(self.rank_prior, valid), valid)
+        if n_halo:
+            rank = np.concatenate([self.tail['Slope_PR'].to_numpy(), rank])
+        return pd.Series(rank, index=frame.index)
+
+
+def rechunk(source, chunk_size=CHUNK_SIZE):
+    """把 DataFrame 或 DataFrame 段落的 iterable 重切成 chunk_size 根一段（取 ROLLING_BLOCK 的倍數）"""
+    chunk_size = max(ROLLING_BLOCK, chunk_size // ROLLING_BLOCK * ROLLING_BLOCK)
+    if isinstance(source, pd.DataFrame):
+        source = [source]
+    pending, count = [], 0
+    for block in source:
+        while len(block):
+            take = min(chunk_size - count, len(block))
+            pending.append(block.iloc[:take])
+            count += take
+            block = block.iloc[take:]
+            if count == chunk_size:
+                yield pd.concat(pending) if len(pending) > 1 else pending[0]
+                pending, count = [], 0
+    if pending:
+        yield pd.concat(pending) if len(pending) > 1 else pending[0]
+
+
+def iter_parquet(path, batch_size=CHUNK_SIZE):
+    """逐批讀取 OHLCVStore 的 parquet 快取（Date 欄位 + OHLCV），不一次載入整個檔案"""
+    import pyarrow.parquet as pq
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=['Date'] + OHLCV):
+        yield batch.to_pandas().set_index('Date')
+
+
+def iter_profile_chunks(source, profile, chunk_size=CHUNK_SIZE, compact=False):
+    """分段評分：source 為 DataFrame 或依時間排序、相鄰的 DataFrame 段落，逐段產生 run_profile 的結果"""
+    scorer = ChunkedScorer(profile, compact=compact)
+    for block in rechunk(source, chunk_size):
+        with stage('chunk', rows=len(block)):
+            part = scorer.process(block)
+        yield part
+
+
+def run_profile_chunked(source, profile, chunk_size=CHUNK_SIZE, compact=False):
+    """iter_profile_chunks 的結果串接成一個 DataFrame（結果需放得進記憶體時使用，例如驗證）"""
+    parts = list(iter_profile_chunks(source, profile, chunk_size, compact))
+    return pd.concat(parts) if parts else pd.DataFrame()
@@ -0,0 +1,338 @@
+"""命令列入口：python -m stock_analysis <子命令>
+
+    python -m stock_analysis score 6669.TW --last 5          # 最近 5 根的買賣評分與建議
+    python -m stock_analysis score 6669.TW 3231.TW --format json
+    python -m stock_analysis plot 6669.TW -o 6669.png        # 三聯圖存檔（需 matplotlib）
+    python -m stock_analysis charts 6669.TW 3231.TW -o charts --format png svg   # 批次平行出圖（Agg，降採樣）
+    python -m stock_analysis fetch 6669.TW 3231.TW           # 只更新本機快取（需 yfinance）
+    python -m stock_analysis fetch $(cat universe.txt) --concurrency 32   # 非同步同時更新（需 aiohttp）
+    python -m stock_analysis export 6669.TW 3231.TW -o public/data   # 前端評分檔（見 artifact.py）
+    python -m stock_analysis score 6669.TW --timing timing.json --cprofile prof   # 各階段計時（見 instrument.py）
+    python -m stock_analysis store 6669.TW 3231.TW --store scores   # 評分寫入存放區（見 store.py）
+    python -m stock_analysis events --store scores --side buy --threshold 60 --days 5   # 查詢門檻穿越
+    python -m stock_analysis forward 6669.TW 3231.TW --by tier   # 各建議級別之後 5 / 20 / 60 根的報酬（見 forward.py）
+
+matplotlib、scipy、ta、yfinance 只在用到的子命令路徑上才載入；無圖形的評分啟動
+時間約等於載入 pandas 的時間（見 `python -m stock_analysis.bench --startup`）。
+單檔評分時 Numba 的載入成本大於計算時間，未指定 --backend 且未設定
+STOCK_ANALYSIS_BACKEND 時使用 numpy 後端。
+"""
+import argparse
+import os
+import sys
+
+# 各子命令用不到、不應在啟動時載入的模組（bench --startup 會檢查）
+LAZY_MODULES = ('matplotlib', 'scipy', 'ta', 'yfinance', 'numba', 'aiohttp')
+
+DEFAULT_START = '2019-01-01'
+
+
+def _tier(score, tiers, default):
+    """分數超過的最高一級名稱（tiers 由高到低）"""
+    for threshold, name in tiers:
+        if score > threshold:
+            return name
+    return default
+
+
+def _load(args, ticker):
+    from .data import load_ohlcv
+    from .pipeline import run_profile
+    from .profiles import get_profile
+    profile = get_profile(args.profile or ticker)
+    df = load_ohlcv(ticker, start=args.start, end=args.end, cache_dir=args.cache_dir, offline=args.offline or None)
+    return profile, run_profile(df, profile)
+
+
+def _cmd_score(args):
+    import pandas as pd
+
+    from .profiles import BUY_DEFAULT_TIER, SELL_DEFAULT_TIER
+    frames = []
+    for ticker in args.tickers:
+        profile, df = _load(args, ticker)
+        recent = df.tail(args.last)
+        frames.append(pd.DataFrame({
+            'Ticker': ticker,
+            'Profile': profile.name,
+            'Close': recent['Close'],
+            'Buy_Score': recent['Buy_Score'].round(2),
+            'Buy_Tier': [_tier(s, profile.buy_tiers, BUY_DEFAULT_TIER) for s in recent['Buy_Score']],
+            'Sell_Score': recent['Sell_Score'].round(2),
+            'Sell_Tier': [_tier(s, profile.sell_tiers, SELL_DEFAULT_TIER) for s in recent['Sell_Score']],
+        }, index=recent.index))
+    table = pd.concat(frames).reset_index()
+    table['Date'] = table['Date'].dt.strftime('%Y-%m-%d')
+    if args.format == 'json':
+        print(table.to_json(orient='records', force_ascii=False))
+    elif args.format == 'csv':
+        print(table.to_csv(index=False), end='')
+    else:
+        print(table.to_string(index=False))
+    return 0
+
+
+def _cmd_plot(args):
+    from .plotting import plot_scores
+    for ticker in args.tickers:
+        profile, df = _load(args, ticker)
+        path = args.output
+        if path and len(args.tickers) > 1:
+            root, ext = os.path.splitext(path)
+            path = f'{root}_{ticker}{ext}'
+        plot_scores(df, profile, path=path, show=path is None, max_points=args.max_points)
+        if path:
+            print(f'{ticker}: {path}')
+    return 0
+
+
+def _cmd_charts(args):
+    from .plotting import render_charts
+    paths, errors = render_charts(args.tickers, args.output, profile_name=args.profile, formats=args.format,
+                                  workers=args.workers, max_points=args.max_points or None, start=args.start,
+                                  end=args.end, cache_dir=args.cache_dir, offline=args.offline or None)
+    for ticker in args.tickers:
+        if ticker in paths:
+            print(f"{ticker}: {', '.join(paths[ticker])}")
+        else:
+            print(f'{ticker}: 失敗 ({errors[ticker].splitlines()[0]})', file=sys.stderr)
+    return 1 if errors else 0
+
+
+def _cmd_export(args):
+    from .artifact import artifact_name, write_artifact, write_manifest
+    entries, failed = {}, 0
+    for ticker in args.tickers:
+        try:
+            profile, df = _load(args, ticker)
+        except Exception as exc:
+            failed += 1
+            print(f'{ticker}: 失敗 ({exc})', file=sys.stderr)
+            continue
+        path = write_artifact(df, profile, ticker, args.output)
+        entries[ticker] = {
+            'file': artifact_name(ticker),
+            'profile': profile.name,
+            'rows': len(df),
+            'last_date': f'{df.index[-1]:%Y-%m-%d}' if len(df) else None,
+        }
+        print(f'{ticker}: {path} ({os.path.getsize(path) / 1024:.0f} KB)')
+    write_manifest(args.output, entries)
+    return 1 if failed else 0
+
+
+def _cmd_store(args):
+    from .store import ScoreStore
+    items, failed = [], 0
+    for ticker in args.tickers:
+        try:
+            profile, df = _load(args, ticker)
+        except Exception as exc:
+            failed += 1
+            print(f'{ticker}: 失敗 ({exc})', file=sys.stderr)
+            continue
+        items.append((ticker, df, profile))
+        print(f'{ticker}: {len(df)} 根')
+    ScoreStore(args.store).put_many(items)
+    return 1 if failed else 0
+
+
+def _cmd_events(args):
+    from .store import ScoreStore
+    store = ScoreStore(args.store)
+    # 建議級別可能由上往下進入，指定 --tier 時預設兩個方向
+    direction = args.direction or ('both' if args.tier else 'up')
+    direction = None if direction == 'both' else (1 if direction == 'up' else -1)
+    if args.days is not None:
+        events = store.crossed(args.side, args.threshold, args.days, direction, args.tickers or None, args.tier)
+    else:
+        events = store.events(args.side, args.threshold, direction, args.tickers or None, args.start, args.end,
+                              args.tier)
+    events = events.assign(Date=events['Date'].dt.strftime('%Y-%m-%d'), Score=events['Score'].round(2))
+    if args.format == 'json':
+        print(events.to_json(orient='records', force_ascii=False))
+    elif args.format == 'csv':
+        print(events.to_csv(index=False), end='')
+    else:
+        print(events.to_string(index=False) if len(events) else '無事件')
+    return 0
+
+
+def _cmd_forward(args):
+    import pandas as pd
+
+    from .forward import forward_analysis
+    frames, profiles, failed = {}, {}, 0
+    for ticker in args.tickers:
+        try:
+            profiles[ticker], frames[ticker] = _load(args, ticker)
+        except Exception as exc:
+            failed += 1
+            print(f'{ticker}: 失敗 ({exc})', file=sys.stderr)
+    if not frames:
+        return 1
+    result = forward_analysis(pd.concat(frames, names=['Ticker', 'Date']), profiles, args.horizons, fill=args.fill)
+    table = (result.tiers if args.by == 'tier' else result.buckets).reset_index()
+    table = table.round({col: 4 for col in table.columns if col not in ('count', 'Horizon')})
+    if args.format == 'json':
+        print(table.to_json(orient='records', force_ascii=False))
+    elif args.format == 'csv':
+        print(table.to_csv(index=False), end='')
+    else:
+        print(table.to_string(index=False))
+    return 1 if failed else 0
+
+
+def _cmd_fetch(args):
+    if args.concurrency:
+        return _fetch_concurrent(args)
+    from .data import OHLCVStore
+    store = OHLCVStore(args.cache_dir, offline=args.offline or None)
+    failed = 0
+    for ticker in args.tickers:
+        try:
+            df = store.get(ticker, args.start, args.end)
+        except Exception as exc:
+            failed += 1
+            print(f'{ticker}: 失敗 ({exc})', file=sys.stderr)
+            continue
+        if len(df):
+            print(f'{ticker}: {len(df)} 根 ({df.index[0]:%Y-%m-%d} ~ {df.index[-1]:%Y-%m-%d})')
+        else:
+            print(f'{ticker}: 無資料')
+    return 1 if failed else 0
+
+
+def _fetch_concurrent(args):
+    from .fetcher import update_universe_cache
+    updated, errors = update_universe_cache(args.tickers, args.cache_dir, args.start, args.end,
+                                            concurrency=args.concurrency, rate=args.rate)
+    for ticker in args.tickers:
+        if ticker in errors:
+            print(f'{ticker}: 失敗 ({errors[ticker]})', file=sys.stderr)
+        else:
+            info = updated[ticker]
+            print(f"{ticker}: 下載 {info['fetched']} 根" + ('（整段重抓）' if info['full_refresh'] else ''))
+    return 1 if errors else 0
+
+
+def build_parser():
+    from .data import DEFAULT_CACHE_DIR
+    from .forward import FORWARD_HORIZONS
+    from .plotting import DEFAULT_MAX_POINTS
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('tickers', nargs='+', help='股票代號，例如 6669.TW')
+    common.add_argument('--start', default=DEFAULT_START, help=f'起始日期（預設 {DEFAULT_START}）')
+    common.add_argument('--end', help='結束日期（不含）')
+    common.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='本機快取目錄')
+    common.add_argument('--offline', action='store_true', help='只讀快取與 fixture，不連網')
+    common.add_argument('--timing', metavar='JSON', help='記錄各階段的時間、根數與尖峰記憶體，寫成 JSON')
+    common.add_argument('--cprofile', metavar='DIR', help='各階段的 cProfile 寫到此目錄 (<階段>.prof)')
+    common.add_argument('--no-trace-memory', action='store_true', help='--timing 時不量測記憶體（計時較準）')
+
+    scoring = argparse.ArgumentParser(add_help=False)
+    scoring.add_argument('--profile', help='策略名稱（預設依代號，例如 6669.TW -> 6669）')
+    scoring.add_argument('--backend', choices=('numpy', 'numba', 'auto'), help='遞迴核心的計算後端（預設 numpy）')
+
+    parser = argparse.ArgumentParser(prog='python -m stock_analysis', description='股票買賣點分析')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    score = sub.add_parser('score', parents=[common, scoring], help='計算買賣評分並列出最近幾根')
+    score.add_argument('--last', type=int, default=1, help='列出最近幾根（預設 1）')
+    score.add_argument('--format', choices=('table', 'json', 'csv'), default='table')
+    score.set_defaults(func=_cmd_score)
+
+    plot = sub.add_parser('plot', parents=[common, scoring], help='繪製股價與買賣評分圖')
+    plot.add_argument('-o', '--output', help='存成圖檔（多檔時附加代號）；未指定則開視窗顯示')
+    plot.add_argument('--max-points', type=int, help='每條序列以 LTTB 降採樣到約幾點（預設不降採樣）')
+    plot.set_defaults(func=_cmd_plot)
+
+    charts = sub.add_parser('charts', parents=[common, scoring], help='批次平行出圖 (PNG / SVG，不開視窗)')
+    charts.add_argument('-o', '--output', default='charts', help='輸出目錄（預設 charts）')
+    charts.add_argument('--format', nargs='+', choices=('png', 'svg'), default=['png'], help='圖檔格式（可多選）')
+    charts.add_argument('--workers', type=int, help='進程數（預設 CPU 核心數）')
+    charts.add_argument('--max-points', type=int, default=DEFAULT_MAX_POINTS,
+                        help=f'每條序列降採樣後的點數（0 為不降採樣，預設 {DEFAULT_MAX_POINTS}）')
+    charts.set_defaults(func=_cmd_charts)
+
+    export = sub.add_parser('export', parents=[common, scoring], help='匯出前端用的評分檔 (JSON)')
+    export.add_argument('-o', '--output', default=os.path.join('public', 'data'), help='輸出目錄（預設 public/data）')
+    export.set_defaults(func=_cmd_export)
+
+    store = sub.add_parser('store', parents=[common, scoring], help='評分寫入存放區並更新門檻穿越事件')
+    store.add_argument('--store', default='scores', help='存放區目錄（預設 scores）')
+    store.set_defaults(func=_cmd_store)
+
+    events = sub.add_parser('events', help='查詢存放區的門檻穿越事件（不重算評分）')
+    events.add_argument('tickers', nargs='*', help='只列這些代號（預設全部）')
+    events.add_argument('--store', default='scores', help='存放區目錄（預設 scores）')
+    events.add_argument('--side', choices=('buy', 'sell'))
+    events.add_argument('--threshold', type=float, help='門檻，例如 60')
+    events.add_argument('--tier', help='建議級別名稱，例如 清倉賣出')
+    events.add_argument('--direction', choices=('up', 'down', 'both'),
+                        help='穿越方向（預設向上；指定 --tier 時為兩者）')
+    events.add_argument('--days', type=int, help='只看最近幾個交易日')
+    events.add_argument('--start', help='起始日期')
+    events.add_argument('--end', help='結束日期（不含）')
+    events.add_argument('--format', choices=('table', 'json', 'csv'), default='table')
+    events.set_defaults(func=_cmd_events, timing=None, cprofile=None, no_trace_memory=False)
+
+    forward = sub.add_parser('forward', parents=[common, scoring], help='各評分區間 / 建議級別之後的報酬統計')
+    forward.add_argument('--horizons', nargs='+', type=int, default=list(FORWARD_HORIZONS),
+                         help=f"前瞻根數（預設 {' '.join(map(str, FORWARD_HORIZONS))}）")
+    forward.add_argument('--by', choices=('tier', 'bucket'), default='tier', help='依建議級別或每 10 分的評分區間')
+    forward.add_argument('--fill', choices=('close', 'open'), default='close',
+                         help='close：當日收盤進場；open：同回測，隔日開盤進場')
+    forward.add_argument('--format', choices=('table', 'json', 'csv'), default='table')
+    forward.set_defaults(func=_cmd_forward)
+
+    fetch = sub.add_parser('fetch', parents=[common], help='下載 / 更新本機快取')
+    fetch.add_argument('--concurrency', type=int, help='以非同步下載器同時更新幾檔（需 aiohttp，見 fetcher.py）')
+    fetch.add_argument('--rate', type=float, default=5.0, help='--concurrency 時每個主機每秒最多幾次請求（預設 5）')
+    fetch.set_defaults(func=_cmd_fetch)
+    return parser
+
+
+def main(argv=None):
+    try:
+        return _run(argv)
+    except BrokenPipeError:
+        # 輸出接到 head 等提早關閉的管線：不印 traceback；stdout 改指向 devnull，
+        # 避免直譯器結束時 flush 再次失敗（Python 文件 signal 一節的作法）
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
+
+
+def _run(argv):
+    args = build_parser().parse_args(argv)
+    from . import kernels
+    backend = getattr(args, 'backend', None)
+    if backend or not os.environ.get(kernels.BACKEND_ENV):
+        kernels.set_backend(backend or 'numpy')
+    if not (args.timing or args.cprofile):
+        return args.func(args)
+
+    from .instrument import recording
+    with recording(memory=not args.no_trace_memory, profile_dir=args.cprofile) as recorder:
+        code = args.func(args)
+    _print_timing(recorder.report())
+    if args.timing:
+        recorder.write_json(args.timing)
+    return code
+
+
+def _print_timing(report):
+    """各階段彙總印到 stderr（不影響 --format json / csv 的輸出）"""
+    print(f"{'階段':<20}{'次數':>6}{'牆鐘 ms':>12}{'CPU ms':>12}{'根數':>10}{'尖峰 MB':>10}", file=sys.stderr)
+    for s in report['stages']:
+        indent = '  ' if s['parent'] else ''
+        peak = '' if s['peak_mb'] is None else f"{s['peak_mb']:.2f}"
+        print(f"{indent + s['stage']:<20}{s['calls']:>6}{s['wall_s'] * 1000:>12.2f}{s['cpu_s'] * 1000:>12.2f}"
+              f"{s['rows']:>10}{peak:>10}", file=sys.stderr)
+    print(f"總計 {report['wall_s'] * 1000:.2f} ms", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""OHLCV 資料來源：本機欄式快取 (Parquet / Feather) + 增量下載
+
+快取以股票代號為單位存檔。每次更新只向資料源要缺少的日期區間，並重抓最後
+幾根 K 棒比對，偵測資料商對近期 K 棒的修正（盤中暫定價、除權息還原等）。
+離線模式只讀快取與本機 fixture 檔，不連網。
+
+快取預設在 ~/.cache/stock_analysis/<代號>.parquet（環境變數 STOCK_ANALYSIS_CACHE 可改目錄），
+預設重抓最近 5 根 (revision_bars)；查詢的 end 未超過快取最後一天時直接讀快取、不連網。
+設定 STOCK_ANALYSIS_OFFLINE=1 時只讀快取或 fixture CSV。
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from .instrument import stage
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+DEFAULT_CACHE_DIR = os.environ.get('STOCK_ANALYSIS_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'stock_analysis'))
+OFFLINE_ENV = 'STOCK_ANALYSIS_OFFLINE'
+
+
+def clean_ohlcv(df):
+    """資料清洗：攤平 yfinance 的 MultiIndex 欄位、只保留 OHLCV、移除缺值並依日期排序"""
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.copy()
+        df.columns = df.columns.get_level_values(0)
+    df = df[[c for c in OHLCV_COLUMNS if c in df.columns]].dropna()
+    df = df[~df.index.duplicated(keep='last')].sort_index()
+    df.index = pd.DatetimeIndex(df.index, name='Date')
+    return df.astype(float)
+
+
+def download_yahoo(ticker, start=None, end=None):
+    """以 yfinance 下載日 K（end 不含當日，與 yf.download 相同）"""
+    import yfinance as yf
+    return clean_ohlcv(yf.download(ticker, start=start, end=end, progress=False))
+
+
+def slice_dates(df, start=None, end=None):
+    """取出 [start, end) 區間的資料"""
+    mask = np.ones(len(df), dtype=bool)
+    if start is not None:
+        mask &= df.index >= pd.Timestamp(start)
+    if end is not None:
+        mask &= df.index < pd.Timestamp(end)
+    return df[mask]
+
+
+def _is_offline():
+    return os.environ.get(OFFLINE_ENV, '').lower() in ('1', 'true', 'yes')
+
+
+class OHLCVStore:
+    """以股票代號為鍵的 OHLCV 本機快取
+
+    root:           快取目錄
+    fmt:            'parquet' 或 'feather'（皆需 pyarrow）
+    fixtures_dir:   本機 fixture 目錄，檔名 <代號>.csv，欄位 Date,Open,High,Low,Close,Volume；
+                    快取不存在時以此為初始資料
+    offline:        True 時不連網，只讀快取與 fixture；None 時依環境變數 STOCK_ANALYSIS_OFFLINE
+    revision_bars:  每次更新重抓並比對的最近 K 棒數
+    downloader:     下載函數 (ticker, start, end) -> DataFrame，預設 download_yahoo
+    """
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, fmt='parquet', fixtures_dir=None, offline=None,
+                 revision_bars=5, downloader=download_yahoo):
+        if fmt not in ('parquet', 'feather'):
+            raise ValueError(f"不支援的快取格式: {fmt}")
+        self.root = root
+        self.fmt = fmt
+        self.fixtures_dir = fixtures_dir
+        self.offline = _is_offline() if offline is None else offline
+        self.revision_bars = revision_bars
+        self.downloader = downloader
+        self.last_update = {}
+
+    def path(self, ticker):
+        return os.path.join(self.root, f"{ticker.upper()}.{self.fmt}")
+
+    def read(self, ticker):
+        """讀取快取，不存在時回傳 None"""
+        path = self.path(ticker)
+        if not os.path.exists(path):
+            return None
+        if self.fmt == 'parquet':
+            df = pd.read_parquet(path)
+        else:
+            df = pd.read_feather(path)
+        return df.set_index('Date')
+
+    def write(self, ticker, df):
+        """寫入快取（先寫暫存檔再取代，避免中斷時留下損壞的檔案）"""
+        os.makedirs(self.root, exist_ok=True)
+        path = self.path(ticker)
+        tmp = f"{path}.tmp"
+        table = df.reset_index()
+        if self.fmt == 'parquet':
+            table.to_parquet(tmp, index=False)
+        else:
+            table.to_feather(tmp)
+        os.replace(tmp, path)
+
+    def read_fixture(self, ticker):
+        """讀取本機 fixture CSV，不存在時回傳 None"""
+        if not self.fixtures_dir:
+            return None
+        path = os.path.join(self.fixtures_dir, f"{ticker.upper()}.csv")
+        if not os.path.exists(path):
+            return None
+        return clean_ohlcv(pd.read_csv(path, index_col=0, parse_dates=True))
+
+    def get(self, ticker, start=None, end=None):
+        """取得 [start, end) 的 OHLCV；連網時先增量更新快取"""
+        with stage('fetch') as frame:
+            df = self._get(ticker, start, end)
+            if frame is not None:
+                frame.rows = len(df)
+        return df
+
+    def _get(self, ticker, start, end):
+        cached = self.read(ticker)
+        if cached is None:
+            cached = self.read_fixture(ticker)
+        if self.offline:
+            if cached is None:
+                raise FileNotFoundError(f"離線模式下找不到 {ticker} 的快取或 fixture（{self.path(ticker)}）")
+            return slice_dates(cached, start, end)
+        return slice_dates(self.update(ticker, cached, start, end), start, end)
+
+    def update(self, ticker, cached=None, start=None, end=None):
+        """增量更新：只下載缺少的區間，並比對最近 revision_bars 根以偵測修正（end 未超過快取時不比對）
+
+        更新結果記錄在 self.last_update：fetched（下載列數）、revised（被修正的日期）、
+        full_refresh（偵測到整段價格等比例調整，例如除權息還原，而重抓全部歷史）。
+        """
+        info = {'ticker': ticker, 'fetched': 0, 'revised': [], 'full_refresh': False}
+        self.last_update = info
+        if cached is None or cached.empty:
+            data = self.downloader(ticker, start, end)
+            info['fetched'] = len(data)
+            self.write(ticker, data)
+            return data
+
+        parts = [cached]
+        if start is not None and pd.Timestamp(start) < cached.index[0]:
+            head = self.downloader(ticker, start, cached.index[0])
+            info['fetched'] += len(head)
+            parts.insert(0, head)
+
+        # 只有未指定 end 或 end 超過快取最後一天時才需要新資料，順便重抓最後幾根比對修正；
+        # 已完全落在快取內的歷史區間直接讀快取，不連網
+        overlap_start = cached.index[max(0, len(cached) - self.revision_bars)]
+        if end is None or pd.Timestamp(end) > cached.index[-1] + pd.Timedelta(days=1):
+            tail = self.downloader(ticker, overlap_start, end)
+            info['fetched'] += len(tail)
+            revised = revised_dates(cached, tail)
+            info['revised'] = list(revised)
+            if is_adjustment(cached, tail, revised):
+                info['full_refresh'] = True
+                refresh_start = cached.index[0] if start is None else min(cached.index[0], pd.Timestamp(start))
+                data = self.downloader(ticker, refresh_start, end)
+                info['fetched'] += len(data)
+                self.write(ticker, data)
+                return data
+            parts.append(tail)
+
+        data = pd.concat(parts)
+        data = data[~data.index.duplicated(keep='last')].sort_index()
+        if len(data) > len(cached) or info['revised']:
+            self.write(ticker, data)
+        return data
+
+
+def revised_dates(cached, fresh, rtol=1e-6):
+    """找出兩份資料在重疊日期上數值不同的日期"""
+    common = cached.index.intersection(fresh.index)
+    if len(common) == 0:
+        return pd.DatetimeIndex([])
+    old = cached.loc[common, OHLCV_COLUMNS].to_numpy(dtype=float)
+    new = fresh.loc[common, OHLCV_COLUMNS].to_numpy(dtype=float)
+    changed = ~np.isclose(old, new, rtol=rtol, atol=0).all(axis=1)
+    return common[changed]
+
+
+def is_adjustment(cached, fresh, revised, rtol=1e-4):
+    """重疊區間每根收盤價都以相同比例改變時，視為除權息 / 分割的歷史還原"""
+    common = cached.index.intersection(fresh.index)
+    if len(common) < 2 or len(revised) != len(common):
+        return False
+    ratio = fresh.loc[common, 'Close'].to_numpy(dtype=float) / cached.loc[common, 'Close'].to_numpy(dtype=float)
+    return bool(np.allclose(ratio, ratio[0], rtol=rtol)) and not np.isclose(ratio[0], 1.0, rtol=rtol)
+
+
+def load_ohlcv(ticker, start=None, end=None, cache_dir=DEFAULT_CACHE_DIR, offline=None, fixtures_dir=None):
+    """便利函數：經由本機快取取得 OHLCV"""
+    store = OHLCVStore(cache_dir, offline=offline, fixtures_dir=fixtures_dir)
+    return store.get(ticker, start, end)
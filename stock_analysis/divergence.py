@@ -0,0 +1,52 @@
+"""背離特徵：一次預先算好回溯極值與各震盪指標的背離旗標，供評分直接讀取"""
+import numpy as np
+import pandas as pd
+
+# 背離回溯視窗：[t - length - lag, t - lag)，預設即舊版的 df.iloc[i-22:i-2]
+DIVERGENCE_LENGTH = 20
+DIVERGENCE_LAG = 2
+DIVERGENCE_OSCILLATORS = ('K', 'RSI', 'MACD_OSC')
+
+
+def lagged_extreme(series, how, length=DIVERGENCE_LENGTH, lag=DIVERGENCE_LAG):
+    """回溯視窗 [t-length-lag, t-lag) 的 min / max（忽略 NaN），視窗超出資料起點時為 NaN"""
+    roll = series.rolling(window=length, min_periods=1)
+    values = (roll.min() if how == 'min' else roll.max()).to_numpy(dtype=float)
+    out = np.full(len(values), np.nan)
+    start = length + lag
+    if start < len(values):
+        out[start:] = values[start - lag - 1:len(values) - lag - 1]
+    return out
+
+
+def divergence_flag_names(oscillators=DIVERGENCE_OSCILLATORS):
+    """背離旗標欄位名稱：Bull_Div_<指標> / Bear_Div_<指標>"""
+    return [f'{kind}_Div_{osc}' for osc in oscillators for kind in ('Bull', 'Bear')]
+
+
+def divergence_features(df, length=DIVERGENCE_LENGTH, lag=DIVERGENCE_LAG, oscillators=DIVERGENCE_OSCILLATORS):
+    """計算背離特徵 DataFrame
+
+    Close_LbMin / Close_LbMax、<指標>_LbMin / <指標>_LbMax 為回溯極值；
+    Bull_Div_<指標>：收盤創回溯新低但指標高於回溯低點（底背離）；
+    Bear_Div_<指標>：收盤創回溯新高但指標低於回溯高點（頂背離）。
+    """
+    close = df['Close'].to_numpy(dtype=float)
+    out = {
+        'Close_LbMin': lagged_extreme(df['Close'], 'min', length, lag),
+        'Close_LbMax': lagged_extreme(df['Close'], 'max', length, lag),
+    }
+    for osc in oscillators:
+        values = df[osc].to_numpy(dtype=float)
+        out[f'{osc}_LbMin'] = lagged_extreme(df[osc], 'min', length, lag)
+        out[f'{osc}_LbMax'] = lagged_extreme(df[osc], 'max', length, lag)
+        out[f'Bull_Div_{osc}'] = (close < out['Close_LbMin']) & (values > out[f'{osc}_LbMin'])
+        out[f'Bear_Div_{osc}'] = (close > out['Close_LbMax']) & (values < out[f'{osc}_LbMax'])
+    return pd.DataFrame(out, index=df.index)
+
+
+def divergence_flags(df, oscillators=DIVERGENCE_OSCILLATORS):
+    """取得背離旗標：df 已含旗標欄位就直接使用（回傳 df 本身），否則現算一次"""
+    if all(name in df for name in divergence_flag_names(oscillators)):
+        return df
+    return divergence_features(df, oscillators=oscillators)
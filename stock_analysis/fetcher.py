@@ -0,0 +1,324 @@
+"""非同步日 K 下載：直接讀取 Yahoo v8 chart JSON，多檔同時抓取（需 aiohttp）
+
+與 src/App.jsx 的 fetchStockData 相同的容錯順序：依序嘗試 endpoints（直連 query1 / query2，
+再來是網頁用的 CORS 代理），全部失敗時等待後從第一個重來，最多 retries 輪；等待時間以
+backoff 起算每輪加倍（上限 max_backoff，另加隨機抖動）。此外：
+- 整批共用一個 aiohttp 連線池（每個主機最多 per_host 條連線）
+- concurrency 限制同時進行的股票數
+- 每個主機各自的速率上限（token bucket，rate 次/秒，可瞬間用掉 burst 次）；
+  收到 429 時依 Retry-After 暫停該主機
+- 代號不存在（chart.error 為 Not Found）直接失敗，不重試
+
+chart JSON 的 timestamp 與 indicators.quote / adjclose 陣列直接轉成 numpy，
+adjust=True 時以 adjclose / close 的比例還原 OHLC（同 yfinance 的 auto_adjust）。
+
+endpoints 可換成本機的測試伺服器，例如 Endpoint('stub', 'http://127.0.0.1:8080/v8/finance/chart/{ticker}')。
+
+    frames, errors = fetch_many(['6669.TW', '3231.TW'], start='2019-01-01')
+    update_universe_cache(tickers, cache_dir, start='2019-01-01', concurrency=32)   # 經由 OHLCVStore 增量更新
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from urllib.parse import quote, urlencode, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from .data import DEFAULT_CACHE_DIR, OHLCV_COLUMNS, OHLCVStore, clean_ohlcv, slice_dates
+
+DEFAULT_TIMEOUT = 20.0
+
+
+class FetchError(RuntimeError):
+    """所有 endpoint 與重試都失敗"""
+
+
+class SymbolNotFound(FetchError):
+    """Yahoo 回報代號不存在（不重試）"""
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    """下載來源：url 為含 {ticker} 的 chart URL，或以 {url} 包裝 Yahoo URL 的代理
+
+    wrapped=True 表示回應為 allorigins /get 的 {"contents": "<JSON 字串>"} 格式。
+    """
+    name: str
+    url: str
+    wrapped: bool = False
+
+    def build(self, ticker, params):
+        query = urlencode(params)
+        if '{url}' in self.url:
+            yahoo = f"{YAHOO_CHART_URL.format(ticker=quote(ticker))}?{query}"
+            return self.url.format(url=quote(yahoo, safe=''))
+        return f"{self.url.format(ticker=quote(ticker))}?{query}"
+
+
+YAHOO_CHART_URL = 'https://query1.finance.yahoo.com/v8/finance/chart/{ticker}'
+
+# 與 App.jsx 的 proxyServices 相同的來源，伺服器端不受 CORS 限制，直連放在最前面
+DEFAULT_ENDPOINTS = (
+    Endpoint('Yahoo query1', YAHOO_CHART_URL),
+    Endpoint('Yahoo query2', 'https://query2.finance.yahoo.com/v8/finance/chart/{ticker}'),
+    Endpoint('AllOrigins', 'https://api.allorigins.win/get?url={url}', wrapped=True),
+    Endpoint('CorsProxy', 'https://corsproxy.io/?{url}'),
+    Endpoint('AllOrigins (Raw)', 'https://api.allorigins.win/raw?url={url}'),
+)
+
+
+def chart_params(start=None, end=None):
+    """v8 chart 的查詢參數：[start, end) 轉成 period1 / period2（秒），日 K、含除權息事件"""
+    period1 = 0 if start is None else int(pd.Timestamp(start).timestamp())
+    period2 = int(time.time()) if end is None else int(pd.Timestamp(end).timestamp())
+    return {'period1': period1, 'period2': period2, 'interval': '1d', 'events': 'div,split',
+            'includeAdjustedClose': 'true'}
+
+
+def _array(values, n):
+    """JSON 陣列（null 為 NaN）-> float ndarray；欄位缺少時全為 NaN"""
+    if values is None:
+        return np.full(n, np.nan)
+    return np.array(values, dtype=float)
+
+
+def parse_chart(payload, adjust=True):
+    """v8 chart JSON (dict 或字串) -> OHLCV DataFrame（index 為交易所當地日期，格式同 clean_ohlcv）"""
+    if isinstance(payload, (str, bytes)):
+        payload = json.loads(payload)
+    chart = payload.get('chart') or {}
+    error = chart.get('error')
+    if error:
+        code = error.get('code', '') if isinstance(error, dict) else str(error)
+        if code == 'Not Found':
+            raise SymbolNotFound(error.get('description', code) if isinstance(error, dict) else code)
+        raise FetchError(f"chart 回傳錯誤: {error}")
+    results = chart.get('result') or []
+    if not results:
+        raise FetchError('chart 沒有 result')
+    result = results[0]
+    stamps = result.get('timestamp') or []
+    n = len(stamps)
+    if not n:
+        return pd.DataFrame({c: pd.Series(dtype=float) for c in OHLCV_COLUMNS},
+                            index=pd.DatetimeIndex([], name='Date'))
+
+    quote_ = (result.get('indicators', {}).get('quote') or [{}])[0]
+    data = {c: _array(quote_.get(c.lower()), n) for c in OHLCV_COLUMNS}
+    if adjust:
+        adjclose = (result.get('indicators', {}).get('adjclose') or [{}])[0].get('adjclose')
+        if adjclose is not None:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ratio = _array(adjclose, n) / data['Close']
+            for c in ('Open', 'High', 'Low', 'Close'):
+                data[c] = data[c] * ratio
+    offset = (result.get('meta') or {}).get('gmtoffset', 0) or 0
+    seconds = np.asarray(stamps, dtype=np.int64) + int(offset)
+    index = pd.DatetimeIndex(seconds.astype('datetime64[s]').astype('datetime64[D]').astype('datetime64[ns]'))
+    return clean_ohlcv(pd.DataFrame(data, index=index))
+
+
+class RateLimiter:
+    """每個主機各自的 token bucket：平均 rate 次/秒，最多累積 burst 次（rate=0 不限速，但仍遵守 pause）"""
+
+    def __init__(self, rate=5.0, burst=5):
+        self.rate = rate
+        self.burst = burst
+        self.hosts = {}
+        self.locks = {}
+
+    async def acquire(self, host):
+        if not self.rate and host not in self.hosts:
+            return
+        lock = self.locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            while True:
+                now = time.monotonic()
+                tokens, last, paused = self.hosts.get(host, (float(self.burst), now, 0.0))
+                if not self.rate:
+                    wait = paused - now
+                    if wait <= 0:
+                        return
+                    await asyncio.sleep(wait)
+                    continue
+                tokens = min(float(self.burst), tokens + (now - last) * self.rate)
+                wait = max(paused - now, (1 - tokens) / self.rate if tokens < 1 else 0.0)
+                if wait <= 0:
+                    self.hosts[host] = (tokens - 1, now, paused)
+                    return
+                self.hosts[host] = (tokens, now, paused)
+                await asyncio.sleep(wait)
+
+    def pause(self, host, seconds):
+        """主機回應 429 時暫停 seconds 秒"""
+        now = time.monotonic()
+        tokens, last, paused = self.hosts.get(host, (0.0, now, 0.0))
+        self.hosts[host] = (min(tokens, 0.0), last, max(paused, now + seconds))
+
+
+class AsyncFetcher:
+    """共用連線池的非同步下載器；以 async with 開啟 / 關閉連線池
+
+    concurrency:  同時下載的股票數
+    per_host:     連線池中每個主機的連線上限
+    rate / burst: 每個主機的速率上限（次/秒）與可瞬間使用的次數；rate=0 不限速
+    retries:      全部 endpoint 失敗後重來的輪數（同 App.jsx 的 maxRetries），至少 1 輪
+    backoff:      第一輪失敗後的等待秒數，之後每輪加倍，上限 max_backoff
+    """
+
+    def __init__(self, endpoints=DEFAULT_ENDPOINTS, concurrency=16, per_host=8, rate=5.0, burst=5, retries=3,
+                 backoff=1.0, max_backoff=30.0, timeout=DEFAULT_TIMEOUT, adjust=True, headers=None):
+        if retries < 1:
+            raise ValueError(f"retries 須 >= 1: {retries}")
+        self.endpoints = tuple(endpoints)
+        if not self.endpoints:
+            raise ValueError("至少需要一個 endpoint")
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.limiter = RateLimiter(rate, burst)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.adjust = adjust
+        self.headers = {'Accept': 'application/json', 'User-Agent': 'Mozilla/5.0', **(headers or {})}
+        self.session = None
+        self.semaphore = None
+
+    async def __aenter__(self):
+        import aiohttp
+        connector = aiohttp.TCPConnector(limit=max(self.concurrency, self.per_host), limit_per_host=self.per_host,
+                                         ttl_dns_cache=300)
+        self.session = aiohttp.ClientSession(connector=connector, headers=self.headers,
+                                             timeout=aiohttp.ClientTimeout(total=self.timeout))
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+        self.session = None
+
+    async def _request(self, endpoint, ticker, params):
+        """單一 endpoint 的一次請求 -> DataFrame；暫時性錯誤以 FetchError 回報"""
+        import aiohttp
+        url = endpoint.build(ticker, params)
+        host = urlsplit(url).netloc
+        await self.limiter.acquire(host)
+        try:
+            async with self.session.get(url) as response:
+                status = response.status
+                body = await response.read()
+                if status == 429:
+                    retry_after = response.headers.get('Retry-After', '')
+                    self.limiter.pause(host, float(retry_after) if retry_after.isdigit() else self.backoff)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            raise FetchError(f"{endpoint.name}: {type(exc).__name__}: {exc}") from exc
+        # Yahoo 以 404 + chart.error 回報代號不存在，其餘非 200 都視為該來源暫時失敗
+        if status not in (200, 404):
+            raise FetchError(f"{endpoint.name}: HTTP {status}")
+        try:
+            payload = json.loads(body)
+            if endpoint.wrapped:
+                payload = json.loads(payload['contents'])
+        except (ValueError, KeyError, TypeError) as exc:
+            raise FetchError(f"{endpoint.name}: HTTP {status}，回應不是 chart JSON ({exc})") from exc
+        if status == 404 and not (isinstance(payload, dict) and (payload.get('chart') or {}).get('error')):
+            raise FetchError(f"{endpoint.name}: HTTP 404")
+        return parse_chart(payload, self.adjust)
+
+    async def fetch(self, ticker, start=None, end=None):
+        """下載單一股票 [start, end) 的日 K（DataFrame，格式同 download_yahoo）"""
+        params = chart_params(start, end)
+        errors = []
+        async with self.semaphore:
+            for attempt in range(self.retries):
+                for endpoint in self.endpoints:
+                    try:
+                        df = await self._request(endpoint, ticker, params)
+                    except SymbolNotFound:
+                        raise
+                    except FetchError as exc:
+                        errors.append(str(exc))
+                        continue
+                    return slice_dates(df, start, end)
+                if attempt < self.retries - 1:
+                    delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+                    await asyncio.sleep(delay * (1 + 0.25 * random.random()))
+        raise FetchError(f"{ticker}: {len(self.endpoints)} 個來源 x {self.retries} 輪皆失敗（最後：{errors[-1]}）")
+
+    async def fetch_many(self, tickers, start=None, end=None):
+        """同時下載多檔，回傳 ({代號: DataFrame}, {代號: 錯誤訊息})"""
+        results = await asyncio.gather(*(self.fetch(t, start, end) for t in tickers), return_exceptions=True)
+        frames, errors = {}, {}
+        for ticker, result in zip(tickers, results):
+            if isinstance(result, Exception):
+                errors[ticker] = f"{type(result).__name__}: {result}"
+            else:
+                frames[ticker] = result
+        return frames, errors
+
+
+def fetch_many(tickers, start=None, end=None, **kwargs):
+    """同步介面：以 AsyncFetcher 同時下載多檔，kwargs 見 AsyncFetcher"""
+    async def run():
+        async with AsyncFetcher(**kwargs) as fetcher:
+            return await fetcher.fetch_many(list(tickers), start, end)
+    return asyncio.run(run())
+
+
+class _LoopThread:
+    """在背景執行緒跑 event loop，讓同步程式碼（OHLCVStore 的 downloader）共用同一個 AsyncFetcher"""
+
+    def __init__(self, **kwargs):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.fetcher = self.call(self._open(kwargs))
+
+    async def _open(self, kwargs):
+        return await AsyncFetcher(**kwargs).__aenter__()
+
+    def call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def download(self, ticker, start=None, end=None):
+        return self.call(self.fetcher.fetch(ticker, start, end))
+
+    def close(self):
+        self.call(self.fetcher.__aexit__(None, None, None))
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+def update_universe_cache(tickers, cache_dir=DEFAULT_CACHE_DIR, start=None, end=None, fmt='parquet', **kwargs):
+    """以 OHLCVStore 的增量更新規則（缺少區間、最近幾根修正、除權息重抓）同時更新多檔快取
+
+    每檔的更新流程在執行緒中進行，下載全部經由同一個 AsyncFetcher（共用連線池與速率限制）。
+    回傳 ({代號: 更新資訊 (OHLCVStore.last_update)}, {代號: 錯誤訊息})。
+    """
+    runner = _LoopThread(**kwargs)
+    concurrency = runner.fetcher.concurrency
+
+    def update(ticker):
+        store = OHLCVStore(cache_dir, fmt=fmt, offline=False, downloader=runner.download)
+        store.update(ticker, store.read(ticker), start, end)
+        return store.last_update
+
+    updated, errors = {}, {}
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = {ticker: pool.submit(update, ticker) for ticker in tickers}
+            for ticker, future in futures.items():
+                try:
+                    updated[ticker] = future.result()
+                except Exception as exc:
+                    errors[ticker] = f"{type(exc).__name__}: {exc}"
+    finally:
+        runner.close()
+    return updated, errors
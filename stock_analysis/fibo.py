@@ -0,0 +1,54 @@
+"""FIBO 波段引擎：視窗高低點掃描見 kernels.fibo_scan (NumPy 稀疏表或 Numba 單調佇列)，此處換算位階"""
+import numpy as np
+
+from . import kernels
+
+# 位階名稱 -> 以 (最高價 + 區間 * 係數) 表示的係數；回檔為負、擴展為正
+FIBO_LEVELS = {
+    'Fibo_l236': -0.236,
+    'Fibo_l382': -0.382,
+    'Fibo_l500': -0.5,
+    'Fibo_l618': -0.618,
+    'Fibo_l786': -0.786,
+    'Fibo_ext1272': 0.272,
+    'Fibo_ext1618': 0.618,
+}
+
+# swing 模式中最高點太靠近視窗起點時，改取最近幾日的最低點
+FIBO_FALLBACK_LOOKBACK = 200
+
+# 3231 只計算關鍵位階
+FIBO_LEVELS_3231 = {
+    'Fibo_l500': -0.5,
+    'Fibo_l786': -0.786,
+    'Fibo_ext1272': 0.272,
+}
+
+
+def fibo_levels(close, window=120, levels=FIBO_LEVELS, swing=True, min_lead=5, fallback_lookback=FIBO_FALLBACK_LOOKBACK):
+    """計算每根 K 棒往回 window 日的 FIBO 位階，回傳 {欄位名稱: ndarray}
+
+    swing=True (6669)：找視窗最高點，再找最高點之前（含）的最低點；
+        若最高點落在視窗前 min_lead 根內，改用最近 fallback_lookback 日的最低點。
+    swing=False (3231)：箱型，直接取視窗內最高與最低。
+
+    另外回傳 Fibo_MaxPrice / Fibo_MinPrice（視窗最高、最低收盤價）。
+    區間 <= 0 或視窗未滿時位階為 NaN。
+    """
+    close = np.asarray(close, dtype=float)
+    n = len(close)
+    out = {name: np.full(n, np.nan) for name in levels}
+    out['Fibo_MaxPrice'] = np.full(n, np.nan)
+    out['Fibo_MinPrice'] = np.full(n, np.nan)
+    if window < 5 or n < window:
+        return out
+
+    max_price, window_min, min_price = kernels.fibo_scan(close, window, swing, min_lead, fallback_lookback)
+
+    range_val = max_price - min_price
+    ok = range_val > 0
+    for name, coef in levels.items():
+        out[name][window - 1:] = np.where(ok, max_price + range_val * coef, np.nan)
+    out['Fibo_MaxPrice'][window - 1:] = max_price
+    out['Fibo_MinPrice'][window - 1:] = window_min
+    return out
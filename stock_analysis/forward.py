@@ -0,0 +1,225 @@
+"""前瞻報酬分析：各評分區間與買賣建議級別之後 5 / 20 / 60 根的報酬分布，用來檢驗門檻
+
+用法：
+    result = forward_analysis(run_profile(df, profile), profile)
+    result.tiers        # (Side, Tier, Horizon) 的次數、命中率、平均、中位數、分位數與尾端平均
+    result.buckets      # (Side, Bucket, Horizon)，評分每 10 分一區
+    batch = run_universe(tickers, '6669')
+    forward_analysis(batch.history, get_profile('6669')).tiers   # 整份清單一次計算
+
+訊號於當日收盤產生：fill='close' 以當日收盤進場、h 根後收盤出場；fill='open' 同回測，
+以隔日開盤進場、再 h 根後開盤出場。多檔資料（MultiIndex (Ticker, Date)，例如
+BatchResult.history）整份一起以陣列計算，前瞻視窗不跨越代號；每檔需依日期排序且連續排列。
+
+買入側的命中為報酬 > 0，賣出側為報酬 < 0（賣出後下跌才算正確）。各分組的中位數、
+分位數與尾端平均在排序一次後以區段位置直接取值，不逐組迴圈（2000 檔 x 1700 根約 10 秒）。
+未扣手續費與稅。
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .backtest import _fill_prices, action_levels
+from .instrument import stage
+from .profiles import BUY_DEFAULT_TIER, SELL_DEFAULT_TIER
+
+FORWARD_HORIZONS = (5, 20, 60)
+# 評分區間邊界：(0, 10], (10, 20], ...；0 分併入第一區，與建議門檻同樣以「超過」判斷
+SCORE_EDGES = tuple(range(0, 101, 10))
+# 尾端統計：最差 / 最好的 5% 報酬平均
+TAIL = 0.05
+ALL_LABEL = '全部'
+
+SIDES = (
+    ('buy', 'Buy_Score', 'buy_tiers', BUY_DEFAULT_TIER, 1),
+    ('sell', 'Sell_Score', 'sell_tiers', SELL_DEFAULT_TIER, -1),
+)
+STAT_COLUMNS = ['count', 'hit_rate', 'mean', 'median', 'std', 'p05', 'p25', 'p75', 'p95', 'tail_low', 'tail_high']
+
+
+@dataclass
+class ForwardResult:
+    """前瞻報酬分析結果
+
+    returns: 每根 K 棒各期間的前瞻報酬 Fwd_<h>（期間超出資料尾端為 NaN），index 同輸入
+    buckets: 依評分區間的統計，MultiIndex (Side, Bucket, Horizon)，各側另有「全部」作為基準
+    tiers:   依買賣建議級別的統計，MultiIndex (Side, Tier, Horizon)，級別由強到弱
+    """
+    returns: pd.DataFrame
+    buckets: pd.DataFrame
+    tiers: pd.DataFrame
+
+
+def forward_returns(price, horizons=FORWARD_HORIZONS, groups=None, delay=0):
+    """前瞻報酬矩陣 (n, len(horizons))：price[t + delay + h] / price[t + delay] - 1
+
+    groups 為每列的代號編碼（同一代號須連續），進出場位置不在同一代號時為 NaN。
+    """
+    price = np.asarray(price, dtype=float)
+    n = len(price)
+    rows = np.arange(n)
+    entry = rows + delay
+    out = np.full((n, len(horizons)), np.nan)
+    for j, h in enumerate(horizons):
+        exit_ = entry + h
+        valid = exit_ < n
+        if groups is not None:
+            valid &= groups[np.minimum(exit_, n - 1)] == groups
+        out[valid, j] = price[exit_[valid]] / price[entry[valid]] - 1
+    return out
+
+
+def score_buckets(scores, edges=SCORE_EDGES):
+    """評分所在區間的編號 (edges[k], edges[k + 1]]，超出範圍併入兩端，NaN 為 -1"""
+    scores = np.asarray(scores, dtype=float)
+    codes = np.searchsorted(edges, scores, side='left') - 1
+    codes = np.clip(codes, 0, len(edges) - 2)
+    return np.where(np.isnan(scores), -1, codes)
+
+
+def bucket_labels(edges=SCORE_EDGES):
+    """區間名稱，例如 '(40, 50]'；第一區含下界"""
+    labels = [f'({lo:g}, {hi:g}]' for lo, hi in zip(edges[:-1], edges[1:])]
+    return ['[' + labels[0][1:]] + labels[1:]
+
+
+def group_stats(values, codes, n_groups, sign=1, tail=TAIL):
+    """依 codes 分組的報酬統計，回傳 {統計: 長度 n_groups 的陣列}（NaN 值與 codes < 0 不計）"""
+    values = np.asarray(values, dtype=float)
+    codes = np.asarray(codes)
+    keep = ~np.isnan(values) & (codes >= 0)
+    values, codes = values[keep], codes[keep]
+    order = np.argsort(values)
+    return _sorted_stats(values[order], codes[order], n_groups, sign, tail)
+
+
+def _sorted_stats(values, codes, n_groups, sign, tail=TAIL):
+    """values 已由小到大排序：再依組別穩定排序（組數少時為基數排序），各組區段內仍由小到大，
+    中位數、分位數（線性內插）與尾端平均都以區段位置取值
+    """
+    dtype = np.int8 if n_groups < 2 ** 7 else np.int16 if n_groups < 2 ** 15 else np.int64
+    values = values[np.argsort(codes.astype(dtype), kind='stable')]
+    counts = np.bincount(codes, minlength=n_groups)
+    codes = np.repeat(np.arange(n_groups), counts)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    ends = starts + counts
+    present = counts > 0
+    safe = np.maximum(counts, 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(codes, weights=values, minlength=n_groups) / counts
+        var = np.bincount(codes, weights=(values - mean[codes]) ** 2, minlength=n_groups) / (counts - 1)
+        hits = np.bincount(codes, weights=sign * values > 0, minlength=n_groups) / counts
+
+    padded = np.append(values, np.nan)
+
+    def quantile(q):
+        pos = starts + q * (safe - 1)
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.minimum(lo + 1, ends - 1)
+        out = padded[lo] + (padded[hi] - padded[lo]) * (pos - lo)
+        return np.where(present, out, np.nan)
+
+    cumsum = np.concatenate([[0.0], np.cumsum(values)])
+    k = np.maximum(np.ceil(tail * counts).astype(np.int64), 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        tail_low = np.where(present, (cumsum[np.minimum(starts + k, ends)] - cumsum[starts]) / k, np.nan)
+        tail_high = np.where(present, (cumsum[ends] - cumsum[np.maximum(ends - k, starts)]) / k, np.nan)
+
+    return {
+        'count': counts,
+        'hit_rate': hits,
+        'mean': mean,
+        'median': quantile(0.5),
+        'std': np.sqrt(var),
+        'p05': quantile(0.05),
+        'p25': quantile(0.25),
+        'p75': quantile(0.75),
+        'p95': quantile(0.95),
+        'tail_low': tail_low,
+        'tail_high': tail_high,
+    }
+
+
+def _rank_returns(returns):
+    """(n, H) 報酬攤平後去掉 NaN 並由小到大排序一次，回傳 (報酬, 所在列, 期間編號)，供各種分組共用"""
+    flat = returns.ravel()
+    index = np.flatnonzero(~np.isnan(flat))
+    index = index[np.argsort(flat[index])]
+    n_h = returns.shape[1]
+    return flat[index], index // n_h, index % n_h
+
+
+def _summarize(ranked, codes, labels, horizons, sign, level, base):
+    """依 codes 把已排序的報酬分成 (級別, 期間) 各組，最後接上 base（「全部」基準）"""
+    values, rows, horizon = ranked
+    n_h = len(horizons)
+    row_codes = codes[rows]
+    keep = row_codes >= 0
+    stats = _sorted_stats(values[keep], row_codes[keep] * n_h + horizon[keep], len(labels) * n_h, sign)
+    table = pd.DataFrame({col: np.concatenate([stats[col], base[col]]) for col in STAT_COLUMNS})
+    table.index = pd.MultiIndex.from_product([list(labels) + [ALL_LABEL], list(horizons)], names=[level, 'Horizon'])
+    return table[table['count'] > 0]
+
+
+def _tier_codes(scores, plans):
+    """各列的建議級別編號與名稱表；plans 為 [(列, tiers, 預設級別)]，每個策略一筆
+
+    級別依門檻由高到低排列（多個策略的同名級別取較高的門檻），預設級別在最後。
+    """
+    strength = {}
+    for _, tiers, default in plans:
+        for threshold, name in tiers:
+            strength[name] = max(strength.get(name, threshold), threshold)
+    defaults = [default for _, _, default in plans if default not in strength]
+    labels = sorted(strength, key=lambda name: -strength[name]) + list(dict.fromkeys(defaults))
+
+    codes = np.full(len(scores), -1)
+    for rows, tiers, default in plans:
+        # action_levels：未達任何門檻為 0，超過最高門檻為 len(tiers)
+        index = np.array([labels.index(name) for name in [default] + [name for _, name in reversed(tiers)]])
+        codes[rows] = index[action_levels(scores[rows], tiers)]
+    return np.where(np.isnan(scores), -1, codes), labels
+
+
+def forward_analysis(scored, profile, horizons=FORWARD_HORIZONS, edges=SCORE_EDGES, fill='close'):
+    """前瞻報酬依評分區間與建議級別彙總，回傳 ForwardResult
+
+    scored 需含 Close、Buy_Score、Sell_Score（fill='open' 時另需 Open），例如 run_profile 的輸出，
+    或 index 為 (Ticker, Date) 的多檔資料。profile 為 StrategyProfile，或 {代號: StrategyProfile}
+    讓各檔以自己的門檻分級（同名級別合併統計）。
+    """
+    horizons = tuple(int(h) for h in horizons)
+    with stage('forward', rows=len(scored)):
+        price, delay = _fill_prices(scored, fill)
+        tickers = groups = None
+        if isinstance(scored.index, pd.MultiIndex) and 'Ticker' in scored.index.names:
+            tickers = scored.index.get_level_values('Ticker')
+            groups, uniques = pd.factorize(tickers)
+        returns = forward_returns(price, horizons, groups, delay)
+        ranked = _rank_returns(returns)
+
+        if isinstance(profile, dict):
+            if tickers is None:
+                raise ValueError('profile 為 {代號: 策略} 時 scored 的 index 需含 Ticker')
+            distinct = {profile[t].name: profile[t] for t in uniques}
+            owner = np.array([list(distinct).index(profile[t].name) for t in uniques])[groups]
+            profiles = [(owner == i, p) for i, p in enumerate(distinct.values())]
+        else:
+            profiles = [(slice(None), profile)]
+
+        buckets, tiers = {}, {}
+        for side, column, tier_attr, default, sign in SIDES:
+            scores = scored[column].to_numpy(dtype=float)
+            base = _sorted_stats(ranked[0], ranked[2], len(horizons), sign)
+            codes = score_buckets(scores, edges)
+            buckets[side] = _summarize(ranked, codes, bucket_labels(edges), horizons, sign, 'Bucket', base)
+            plans = [(rows, getattr(p, tier_attr), default) for rows, p in profiles]
+            codes, labels = _tier_codes(scores, plans)
+            tiers[side] = _summarize(ranked, codes, labels, horizons, sign, 'Tier', base)
+
+        return ForwardResult(
+            returns=pd.DataFrame(returns, index=scored.index, columns=[f'Fwd_{h}' for h in horizons]),
+            buckets=pd.concat(buckets, names=['Side']),
+            tiers=pd.concat(tiers, names=['Side']),
+        )
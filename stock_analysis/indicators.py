@@ -0,0 +1,107 @@
+"""技術指標：以陣列運算取代逐列 df.iloc 存取"""
+import numpy as np
+
+from . import kernels
+
+
+def smooth_dmi(values, period=14):
+    """平滑函數：與 temp.jsx 相同 res[i] = (res[i-1]*(period-1) + arr[i]) / period
+
+    遞迴由 kernels.wilder_smooth 完成（NumPy 後端為 Python 迴圈，Numba 後端為編譯迴圈），
+    運算順序與 temp.jsx / test.py 相同，結果逐位元相同；首值沿用 arr[0]。
+    """
+    x = np.asarray(values, dtype=float)
+    if len(x) < 2:
+        return x.copy()
+    return kernels.wilder_smooth(x, period)
+
+
+def true_range(high, low, close):
+    """TR = max(H-L, |H-C前|, |L-C前|)，第一根沒有前收盤，記為 0"""
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    close = np.asarray(close, dtype=float)
+    tr = np.zeros(len(close))
+    if len(close) > 1:
+        prev_close = close[:-1]
+        tr[1:] = np.maximum.reduce([
+            high[1:] - low[1:],
+            np.abs(high[1:] - prev_close),
+            np.abs(low[1:] - prev_close),
+        ])
+    return tr
+
+
+def directional_movement(high, low):
+    """+DM / -DM：上漲幅度大於下跌幅度且為正時才計入，第一根為 0"""
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    pdm = np.zeros(len(high))
+    mdm = np.zeros(len(high))
+    if len(high) > 1:
+        move_up = high[1:] - high[:-1]
+        move_down = low[:-1] - low[1:]
+        pdm[1:] = np.where((move_up > move_down) & (move_up > 0), move_up, 0.0)
+        mdm[1:] = np.where((move_down > move_up) & (move_down > 0), move_down, 0.0)
+    return pdm, mdm
+
+
+def dmi(high, low, close, period=14):
+    """DMI (+DI / -DI / ADX)，計算方式與 temp.jsx 相同，回傳 {'PDI', 'MDI', 'ADX'}"""
+    tr = true_range(high, low, close)
+    pdm, mdm = directional_movement(high, low)
+
+    str_smooth = smooth_dmi(tr, period)
+    spdm_smooth = smooth_dmi(pdm, period)
+    smdm_smooth = smooth_dmi(mdm, period)
+
+    denom = np.where(str_smooth != 0, str_smooth, 1)
+    pdi = 100 * spdm_smooth / denom
+    mdi = 100 * smdm_smooth / denom
+    di_sum = pdi + mdi
+    dx = 100 * np.abs(pdi - mdi) / np.where(di_sum != 0, di_sum, 1)
+    adx = smooth_dmi(dx, period)
+    return {'PDI': pdi, 'MDI': mdi, 'ADX': adx}
+
+
+def atr(high, low, close, period=14, method='window'):
+    """ATR，TR 只計算一次再做平滑，回傳 ndarray
+
+    method:
+        'window' 相容模式：重現 test.py 舊版逐列計算的數值，即每根 K 棒只取
+                 最近 period 根 (period-1 個 TR) 做 EWM(alpha=1/period)；前 period 根為 NaN。
+        'wilder' 全歷史 Wilder 平滑 (EWM alpha=1/period, adjust=False)。
+        'sma'    與 src/App.jsx calculateATR 相同的 TR 簡單平均，前 period 根以已有筆數平均。
+    後兩者的第一根 TR 取 H-L（與 App.jsx 相同）。
+    """
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    close = np.asarray(close, dtype=float)
+    n = len(close)
+    tr = true_range(high, low, close)
+    if n > 0:
+        tr[0] = high[0] - low[0]
+
+    if method == 'window':
+        out = np.full(n, np.nan)
+        taps = period - 1
+        if taps < 1 or n <= period:
+            return out
+        alpha = 1 / period
+        # EWM(adjust=False) 在固定長度視窗上等同有限長度的加權和 (首項權重為 (1-α)^(taps-1))
+        weights = alpha * (1 - alpha) ** np.arange(taps - 1, -1, -1)
+        weights[0] = (1 - alpha) ** (taps - 1)
+        windows = np.lib.stride_tricks.sliding_window_view(tr[1:], taps)
+        out[taps:] = windows @ weights
+        out[:period] = np.nan
+        return out
+    if method == 'wilder':
+        return smooth_dmi(tr, period)
+    if method == 'sma':
+        csum = np.cumsum(tr)
+        out = np.empty(n)
+        head = min(period, n)
+        out[:head] = csum[:head] / np.arange(1, head + 1)
+        out[head:] = (csum[head:] - csum[:-head]) / period
+        return out
+    raise ValueError(f"未知的 ATR 計算方式: {method}")
@@ -0,0 +1,182 @@
+"""各階段的計時與記憶體量測：下載、每個指標階段、FIBO、買賣評分、繪圖
+
+用法：
+    with recording(memory=True, profile_dir='prof') as rec:
+        run_profile(load_ohlcv('6669.TW'), get_profile('6669'))
+    rec.write_json('timing.json')          # 或 rec.report()
+
+    python -m stock_analysis score 6669.TW --timing timing.json --cprofile prof
+
+每個階段記錄牆鐘時間、CPU 時間、處理根數與尖峰配置（tracemalloc，memory=True 時）；
+階段可巢狀（例如 run_profile 內的各指標），尖峰配置含子階段，時間亦同。
+profile_dir 指定時每個階段各有一個 cProfile，只統計該階段本身（不含子階段）的函數，
+結束時寫成 <profile_dir>/<階段>.prof（可用 snakeviz / pstats 檢視）。
+
+未在 recording 內時 stage() 只檢查一個全域變數並回傳共用的空 context，幾乎沒有額外成本。
+只記錄目前進程：run_universe / render_charts 的子進程不會回報。
+"""
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+_NULL = nullcontext()
+_recorder = None
+
+
+class _Frame:
+    __slots__ = ('name', 'rows', 'wall', 'cpu', 'base', 'peak', 'profiler')
+
+    def __init__(self, name, rows):
+        self.name = name
+        self.rows = rows
+        self.base = self.peak = 0
+        self.profiler = None
+
+
+class Recorder:
+    """一次 recording 期間的量測結果：records 為每次呼叫一筆，report() 依階段彙總"""
+
+    def __init__(self, memory=True, profile_dir=None):
+        self.memory = memory
+        self.profile_dir = profile_dir
+        self.records = []
+        self.profilers = {}
+        self.stack = []
+        self.started = time.perf_counter()
+        self.wall = None
+
+    def _profiler(self, name):
+        import cProfile
+        if name not in self.profilers:
+            self.profilers[name] = cProfile.Profile()
+        return self.profilers[name]
+
+    def enter(self, name, rows):
+        frame = _Frame(name, rows)
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self.stack:
+                parent = self.stack[-1]
+                parent.peak = max(parent.peak, peak)
+            tracemalloc.reset_peak()
+            frame.base = frame.peak = current
+        if self.profile_dir is not None:
+            if self.stack and self.stack[-1].profiler is not None:
+                self.stack[-1].profiler.disable()
+            frame.profiler = self._profiler(name)
+            frame.profiler.enable()
+        self.stack.append(frame)
+        frame.wall = time.perf_counter()
+        frame.cpu = time.process_time()
+        return frame
+
+    def exit(self, frame):
+        wall = time.perf_counter() - frame.wall
+        cpu = time.process_time() - frame.cpu
+        self.stack.pop()
+        if frame.profiler is not None:
+            frame.profiler.disable()
+            if self.stack and self.stack[-1].profiler is not None:
+                self.stack[-1].profiler.enable()
+        peak = None
+        if self.memory:
+            frame.peak = max(frame.peak, tracemalloc.get_traced_memory()[1])
+            peak = frame.peak - frame.base
+            if self.stack:
+                self.stack[-1].peak = max(self.stack[-1].peak, frame.peak)
+        self.records.append({
+            'stage': frame.name,
+            'parent': self.stack[-1].name if self.stack else None,
+            'depth': len(self.stack),
+            'wall_s': wall,
+            'cpu_s': cpu,
+            'rows': frame.rows,
+            'peak_bytes': peak,
+        })
+
+    def report(self):
+        """依階段彙總（依首次結束的順序，子階段在前）：呼叫次數、總牆鐘 / CPU 秒數、總根數、最大尖峰配置"""
+        stages = {}
+        for r in self.records:
+            s = stages.setdefault(r['stage'], {
+                'stage': r['stage'], 'parent': r['parent'], 'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'rows': 0,
+                'peak_mb': None,
+            })
+            s['calls'] += 1
+            s['wall_s'] += r['wall_s']
+            s['cpu_s'] += r['cpu_s']
+            s['rows'] += r['rows'] or 0
+            if r['peak_bytes'] is not None:
+                s['peak_mb'] = max(s['peak_mb'] or 0.0, r['peak_bytes'] / 2 ** 20)
+        for s in stages.values():
+            s['rows_per_s'] = s['rows'] / s['wall_s'] if s['rows'] and s['wall_s'] > 0 else None
+        wall = self.wall if self.wall is not None else time.perf_counter() - self.started
+        return {'wall_s': wall, 'memory': self.memory, 'stages': list(stages.values()), 'calls': self.records}
+
+    def write_json(self, path):
+        """report() 寫成 JSON，回傳路徑"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+        return path
+
+    def dump_profiles(self, directory=None):
+        """各階段的 cProfile 寫成 <directory>/<階段>.prof，回傳 {階段: 路徑}"""
+        directory = directory or self.profile_dir
+        os.makedirs(directory, exist_ok=True)
+        paths = {}
+        for name, profiler in self.profilers.items():
+            path = os.path.join(directory, f"{name.replace('/', '_')}.prof")
+            profiler.dump_stats(path)
+            paths[name] = path
+        return paths
+
+
+@contextmanager
+def _stage(recorder, name, rows):
+    frame = recorder.enter(name, rows)
+    try:
+        yield frame
+    finally:
+        recorder.exit(frame)
+
+
+def stage(name, rows=None):
+    """量測一個階段：with stage('fibo', rows=len(df)): ...（未在 recording 內時不做任何事）"""
+    if _recorder is None:
+        return _NULL
+    return _stage(_recorder, name, rows)
+
+
+def active():
+    """目前的 Recorder（未在 recording 內時為 None）"""
+    return _recorder
+
+
+@contextmanager
+def recording(memory=True, profile_dir=None):
+    """開始記錄各階段，yield Recorder；結束時 profile_dir 有指定則寫出各階段的 cProfile
+
+    memory=True 時以 tracemalloc 量測尖峰配置（會讓執行變慢約 1.5–3 倍，時間請另外以
+    memory=False 量測）。不可巢狀使用。
+    """
+    global _recorder
+    if _recorder is not None:
+        raise RuntimeError('已在 recording 內')
+    recorder = Recorder(memory=memory, profile_dir=profile_dir)
+    started_tracing = memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    _recorder = recorder
+    try:
+        yield recorder
+    finally:
+        _recorder = None
+        recorder.wall = time.perf_counter() - recorder.started
+        if started_tracing:
+            tracemalloc.stop()
+        if profile_dir is not None:
+            recorder.dump_profiles()
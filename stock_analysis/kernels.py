@@ -0,0 +1,251 @@
+"""計算核心：遞迴型指標的可替換後端
+
+遞迴（每一根依賴前一根結果）的計算集中在這裡，提供兩種後端：
+- 'numpy'：一階遞迴以純 Python 迴圈完成，單一序列長度 >= LFILTER_MIN_LENGTH 時改用
+  scipy.signal.lfilter（近似路徑，見 wilder_smooth）；FIBO 以稀疏表查詢，永遠可用
+- 'numba'：同樣的遞迴以 Numba JIT 編譯成迴圈（需安裝 numba，首次編譯結果快取於 __pycache__）
+
+後端於執行期選擇：set_backend('numba' | 'numpy' | 'auto')，或環境變數
+STOCK_ANALYSIS_BACKEND；預設 'auto'（有安裝 numba 就使用）。兩個後端的迴圈運算順序
+相同，輸出逐位元一致，可用 parity_report() 或 `python -m stock_analysis.bench --parity` 檢查。
+"""
+import importlib.util
+import os
+
+import numpy as np
+
+BACKEND_ENV = 'STOCK_ANALYSIS_BACKEND'
+BACKENDS = ('numpy', 'numba')
+# 一階遞迴的 Python 迴圈每根約 0.3 µs，lfilter 約 0.01 µs，但首次載入 scipy.signal 約 1.5 秒；
+# 單一序列約 500 萬根時迴圈時間才追上載入成本，短於此長度一律用迴圈
+LFILTER_MIN_LENGTH = 5_000_000
+
+_selected = os.environ.get(BACKEND_ENV, 'auto').lower()
+_numba_kernels = None
+
+
+def available_backends():
+    """目前環境可用的後端"""
+    return [name for name in BACKENDS if name == 'numpy' or importlib.util.find_spec(name) is not None]
+
+
+def set_backend(name):
+    """選擇後端：'numpy'、'numba' 或 'auto'"""
+    global _selected
+    name = name.lower()
+    if name not in BACKENDS + ('auto',):
+        raise ValueError(f"未知的計算後端: {name}（可用：{', '.join(BACKENDS)}、auto）")
+    if name != 'auto' and name not in available_backends():
+        raise ImportError(f"計算後端 {name} 未安裝")
+    _selected = name
+
+
+def get_backend():
+    """實際使用的後端名稱（'auto' 解析為 numba 或 numpy）"""
+    if _selected == 'auto':
+        return 'numba' if 'numba' in available_backends() else 'numpy'
+    return _selected
+
+
+def _kernels(backend=None):
+    global _numba_kernels
+    backend = backend or get_backend()
+    if backend == 'numba':
+        if _numba_kernels is None:
+            from . import _kernels_numba
+            _numba_kernels = _kernels_numba.KERNELS
+        return _numba_kernels
+    if backend == 'numpy':
+        return _NUMPY_KERNELS
+    raise ValueError(f"未知的計算後端: {backend}")
+
+
+# --- NumPy 後端 ---
+
+def _first_order(x, gain, keep, first):
+    """y[0] = first；y[i] = gain * x[i] + keep * y[i-1]（lfilter 直接型，運算順序同逐筆迴圈）"""
+    out = np.empty(len(x))
+    if len(x) == 0:
+        return out
+    out[0] = first
+    if len(x) < LFILTER_MIN_LENGTH:
+        prev = first
+        values = [first]
+        for v in x[1:].tolist():
+            prev = gain * v + keep * prev
+            values.append(prev)
+        out[:] = values
+    else:
+        from scipy.signal import lfilter
+        out[1:], _ = lfilter([gain], [1, -keep], x[1:], zi=[keep * first])
+    return out
+
+
+def _wilder_smooth_numpy(x, period):
+    if len(x) >= LFILTER_MIN_LENGTH:
+        return _first_order(x, 1 / period, (period - 1) / period, x[0])
+    out = np.empty(len(x))
+    if len(x) == 0:
+        return out
+    prev = x[0]
+    values = [prev]
+    for v in x[1:].tolist():
+        prev = (prev * (period - 1) + v) / period
+        values.append(prev)
+    out[:] = values
+    return out
+
+
+def _ema_numpy(x, alpha):
+    return _first_order(x, alpha, 1 - alpha, x[0] if len(x) else 0.0)
+
+
+def _kd_numpy(high, low, close, period, init):
+    n = len(close)
+    k = np.full(n, init)
+    d = np.full(n, init)
+    if n < period:
+        return k, d
+    window_high = np.lib.stride_tricks.sliding_window_view(high, period).max(axis=1)
+    window_low = np.lib.stride_tricks.sliding_window_view(low, period).min(axis=1)
+    span = window_high - window_low
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsv = np.where(span == 0, 50.0, (close[period - 1:] - window_low) / span * 100)
+    # 前一根為 init，第 period-1 根起 K = 2/3 K前 + 1/3 RSV、D = 2/3 D前 + 1/3 K
+    seed = np.concatenate([[init], rsv])
+    k[period - 1:] = _first_order(seed, 1 / 3, 2 / 3, init)[1:]
+    d[period - 1:] = _first_order(np.concatenate([[init], k[period - 1:]]), 1 / 3, 2 / 3, init)[1:]
+    return k, d
+
+
+def _floor_log2(lengths):
+    """整數長度的 floor(log2)，以 frexp 取指數避免浮點誤差"""
+    return np.frexp(np.asarray(lengths, dtype=float))[1] - 1
+
+
+def _min_table(values, levels):
+    """table[k][i] = min(values[i : i + 2^k])"""
+    table = [values]
+    for k in range(1, levels):
+        prev = table[-1]
+        half = 1 << (k - 1)
+        table.append(np.minimum(prev[:-half], prev[half:]))
+    return table
+
+
+def _argmax_table(values, levels):
+    """table[k][i] = values[i : i + 2^k] 中最大值的位置（同值取最前面）"""
+    table = [np.arange(len(values))]
+    for k in range(1, levels):
+        prev = table[-1]
+        half = 1 << (k - 1)
+        a, b = prev[:-half], prev[half:]
+        table.append(np.where(values[b] > values[a], b, a))
+    return table
+
+
+def _range_query(table, lo, hi, combine):
+    """對每組 [lo, hi] (含端點) 以兩段重疊的 2^k 區間合併查詢"""
+    k = _floor_log2(hi - lo + 1)
+    out = np.empty(len(lo), dtype=table[0].dtype)
+    for level in np.unique(k):
+        sel = k == level
+        span = 1 << int(level)
+        a = table[level][lo[sel]]
+        b = table[level][hi[sel] - span + 1]
+        out[sel] = combine(a, b)
+    return out
+
+
+def _fibo_scan_numpy(close, window, swing, min_lead, fallback_lookback):
+    n = len(close)
+    table_levels = int(_floor_log2(window)) + 1
+    min_table = _min_table(close, table_levels)
+    argmax_table = _argmax_table(close, table_levels)
+
+    hi = np.arange(window - 1, n)
+    lo = hi - window + 1
+    pick_max = lambda a, b: np.where(close[b] > close[a], b, a)
+    max_pos = _range_query(argmax_table, lo, hi, pick_max)
+    max_price = close[max_pos]
+    window_min = _range_query(min_table, lo, hi, np.minimum)
+
+    if not swing:
+        return max_price, window_min, window_min
+    min_price = _range_query(min_table, lo, max_pos, np.minimum)
+    early = (max_pos - lo) < min_lead
+    if window > fallback_lookback:
+        fallback = _range_query(min_table, hi - fallback_lookback + 1, hi, np.minimum)
+    else:
+        fallback = window_min
+    return max_price, window_min, np.where(early, fallback, min_price)
+
+
+_NUMPY_KERNELS = {
+    'wilder_smooth': _wilder_smooth_numpy,
+    'ema': _ema_numpy,
+    'kd': _kd_numpy,
+    'fibo_scan': _fibo_scan_numpy,
+}
+
+
+# --- 對外介面：依目前後端分派 ---
+
+def wilder_smooth(values, period=14, backend=None):
+    """Wilder 平滑：res[0] = x[0]；res[i] = (res[i-1] * (period-1) + x[i]) / period
+
+    運算順序同 test.py / App.jsx 的 smooth_dmi，結果逐位元相同。NumPy 後端在長度
+    >= LFILTER_MIN_LENGTH 時改以 lfilter 計算 x[i] / period + res[i-1] * (period-1) / period，
+    捨入方式不同，相對誤差約 1e-13。
+    """
+    return _kernels(backend)['wilder_smooth'](np.ascontiguousarray(values, dtype=float), period)
+
+
+def ema(values, alpha, backend=None):
+    """EMA（以首值起算）：ema[i] = x[i] * alpha + ema[i-1] * (1 - alpha)，同 App.jsx calculateEMA"""
+    return _kernels(backend)['ema'](np.ascontiguousarray(values, dtype=float), float(alpha))
+
+
+def kd(high, low, close, period=9, init=50.0, backend=None):
+    """App.jsx 的 KD (9,3,3)：RSV 以 2/3、1/3 遞迴平滑，前 period-1 根為 init；回傳 (K, D)"""
+    arrays = [np.ascontiguousarray(a, dtype=float) for a in (high, low, close)]
+    return _kernels(backend)['kd'](*arrays, period, float(init))
+
+
+def fibo_scan(close, window, swing=True, min_lead=5, fallback_lookback=200, backend=None):
+    """FIBO 視窗掃描：回傳第 window-1 根起的 (最高價, 視窗最低價, 波段低點) 三個陣列
+
+    swing=True 時波段低點為最高點之前（含）的最低點，最高點落在視窗前 min_lead 根內時
+    改用最近 fallback_lookback 日（不超過視窗時即視窗）的最低點；swing=False 時即視窗最低價。
+    """
+    close = np.ascontiguousarray(close, dtype=float)
+    if np.isnan(close).any():
+        backend = 'numpy'  # 單調佇列無法比較 NaN，含缺值時以稀疏表的 NaN 傳遞規則為準
+    return _kernels(backend)['fibo_scan'](close, int(window), bool(swing), int(min_lead), int(fallback_lookback))
+
+
+def parity_report(n=5000, seed=0):
+    """比較 numpy 與 numba 後端的輸出，回傳 {核心: 最大絕對差}（0 表示逐位元相同）"""
+    if 'numba' not in available_backends():
+        raise ImportError("未安裝 numba，無法比較後端")
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    close[n // 3:n // 3 + 15] = close[n // 3]  # 平盤區段：測試同值取最前面與區間為 0
+    high = close * (1 + np.abs(rng.normal(0, 0.01, n)))
+    low = close * (1 - np.abs(rng.normal(0, 0.01, n)))
+    low[n // 2:n // 2 + 12] = high[n // 2:n // 2 + 12] = close[n // 2]
+
+    cases = {
+        'wilder_smooth': lambda b: [wilder_smooth(high - low, 14, backend=b)],
+        'ema': lambda b: [ema(close, 2 / 13, backend=b)],
+        'kd': lambda b: list(kd(high, low, close, backend=b)),
+        'fibo_scan(swing)': lambda b: list(fibo_scan(close, 120, True, backend=b)),
+        'fibo_scan(box)': lambda b: list(fibo_scan(close, 20, False, backend=b)),
+        'fibo_scan(long)': lambda b: list(fibo_scan(close, 250, True, backend=b)),
+    }
+    report = {}
+    for name, case in cases.items():
+        diffs = [np.nanmax(np.abs(a - b), initial=0.0) for a, b in zip(case('numpy'), case('numba'))]
+        report[name] = float(max(diffs))
+    return report
+
@@ -0,0 +1,317 @@
+"""指標管線：依策略需求計算指標欄位，多個策略共用的指標只計算一次
+
+精簡模式 run_profile(df, profile, compact=True)（或 run_universe(..., compact=True)）只保留
+OHLCV、評分讀取的欄位、背離旗標與評分：震盪指標與評分存 float32、整數分項存 int8、旗標存
+bool，每檔記憶體約減少 55–63%。評分仍以 float64 計算後才轉型，float32 欄位與完整結果的
+相對誤差 <= COMPACT_RTOL（2^-24，0–100 分約 6e-6），int8 / bool 欄位完全相同；
+`python -m stock_analysis.bench --memory` 列出每檔記憶體與計算尖峰並檢查誤差。
+"""
+import pandas as pd
+
+from .divergence import DIVERGENCE_LAG, DIVERGENCE_LENGTH, DIVERGENCE_OSCILLATORS, divergence_features, \
+    divergence_flag_names
+from .fibo import FIBO_FALLBACK_LOOKBACK, fibo_levels
+from .indicators import atr, dmi
+from .instrument import stage
+from .rolling import expanding_percentile_rank, rolling_linregress, rolling_percentile_rank
+from .scoring import BUY_COMPONENTS, FRACTIONAL_COMPONENTS, SCORE_INPUTS, SELL_COMPONENTS, reweight
+
+OHLCV = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# 精簡模式：震盪指標、比例類欄位與評分存 float32，整數分項存 int8，旗標存 bool；
+# 價格、均線、FIBO 位階與成交量維持 float64（評分門檻直接與價格比較）
+COMPACT_FLOAT32 = (
+    'Slope_60', 'Slope_PR', 'MA60_Slope', 'MA20_Slope', 'Bias_60', 'Bias_20', 'RSI', 'K', 'D', 'MACD_OSC',
+    'PDI', 'MDI', 'ADX', 'BB_pctB', 'BB_BandWidth', 'Buy_Score', 'Sell_Score', *FRACTIONAL_COMPONENTS,
+)
+# 精簡欄位與 float64 結果的相對誤差上限（float32 單次捨入）；0~100 的評分絕對誤差 <= 100 * COMPACT_RTOL
+COMPACT_RTOL = 2.0 ** -24
+
+
+# --- 指標階段：每個函數讀取 df，回傳 {欄位名稱: 值} ---
+
+def _stage_slope(df):
+    """A. 動態斜率 (60日)"""
+    return {'Slope_60': rolling_linregress(df['Close'], 60)['slope']}
+
+
+def _stage_slope_pr(df):
+    """A. 斜率 PR 值 (252日滾動排名)"""
+    return {'Slope_PR': rolling_percentile_rank(df['Slope_60'], 252) * 100}
+
+
+def _stage_ma60(df):
+    """B. MA 季線 (60MA)"""
+    ma60 = df['Close'].rolling(window=60).mean()
+    return {'MA60': ma60, 'MA60_Slope': ma60.diff(), 'Bias_60': (df['Close'] - ma60) / ma60 * 100}
+
+
+def _stage_ma20(df):
+    """B. MA 月線 (20MA)"""
+    ma20 = df['Close'].rolling(window=20).mean()
+    return {'MA20': ma20, 'MA20_Slope': ma20.diff(), 'Bias_20': (df['Close'] - ma20) / ma20 * 100}
+
+
+def _stage_rsi(df):
+    """D. RSI (14)"""
+    from ta.momentum import RSIIndicator
+    return {'RSI': RSIIndicator(close=df['Close'], window=14).rsi()}
+
+
+def _stage_kd(df):
+    """D. KD (9, 3)"""
+    from ta.momentum import StochasticOscillator
+    kd_ind = StochasticOscillator(high=df['High'], low=df['Low'], close=df['Close'], window=9, smooth_window=3)
+    return {'K': kd_ind.stoch(), 'D': kd_ind.stoch_signal()}
+
+
+def _stage_macd(df):
+    """E. MACD (12, 26, 9)"""
+    ema12 = df['Close'].ewm(span=12, adjust=False).mean()
+    ema26 = df['Close'].ewm(span=26, adjust=False).mean()
+    dif = ema12 - ema26
+    dem = dif.ewm(span=9, adjust=False).mean()
+    return {'EMA12': ema12, 'EMA26': ema26, 'MACD_DIF': dif, 'MACD_DEM': dem, 'MACD_OSC': dif - dem}
+
+
+def _stage_dmi(df):
+    """F. DMI (14日)"""
+    return dmi(df['High'].values, df['Low'].values, df['Close'].values, period=14)
+
+
+def _stage_bb(df):
+    """G. Bollinger Bands (20日, 2倍標準差)"""
+    mid = df['Close'].rolling(window=20).mean()
+    std = df['Close'].rolling(window=20).std()
+    upper = mid + 2 * std
+    lower = mid - 2 * std
+    return {
+        'BB_Mid': mid,
+        'BB_Std': std,
+        'BB_Upper': upper,
+        'BB_Lower': lower,
+        'BB_pctB': (df['Close'] - lower) / (upper - lower + 1e-10),
+        'BB_BandWidth': (upper - lower) / (mid + 1e-10),
+    }
+
+
+def _stage_volume(df):
+    """H. Volume MA"""
+    return {'VolMA5': df['Volume'].rolling(window=5).mean(), 'VolMA20': df['Volume'].rolling(window=20).mean()}
+
+
+def _stage_atr(df):
+    """I. ATR (14日)，沿用舊版逐視窗 EWM 的數值"""
+    return {'ATR': atr(df['High'].values, df['Low'].values, df['Close'].values, period=14, method='window')}
+
+
+def _stage_divergence(df):
+    """J. 背離特徵 (KD / RSI / MACD 共用)"""
+    return divergence_features(df)
+
+
+# 階段名稱 -> (計算函數, 相依階段)；依此順序計算
+INDICATOR_STAGES = {
+    'slope': (_stage_slope, ()),
+    'slope_pr': (_stage_slope_pr, ('slope',)),
+    'ma60': (_stage_ma60, ()),
+    'ma20': (_stage_ma20, ()),
+    'rsi': (_stage_rsi, ()),
+    'kd': (_stage_kd, ()),
+    'macd': (_stage_macd, ()),
+    'dmi': (_stage_dmi, ()),
+    'bb': (_stage_bb, ()),
+    'volume': (_stage_volume, ()),
+    'atr': (_stage_atr, ()),
+    'divergence': (_stage_divergence, ('rsi', 'kd', 'macd')),
+}
+
+# 各階段讀取的前面階段欄位（OHLCV 以外）；精簡模式據此在最後一個讀取的階段算完後即丟棄中間欄位
+STAGE_INPUTS = {
+    'slope_pr': ('Slope_60',),
+    'divergence': DIVERGENCE_OSCILLATORS,
+}
+
+# 各階段往回讀取的根數（只算本階段；相依欄位在這段期間的值由前一段沿用，見 chunked.py）。
+# rsi / macd / dmi 為遞迴指標，ma60 / ma20 / bb / volume 與 KD 的 D 為 pandas 滾動平均 / 標準差
+# （結果與整段歷史有關），分段計算時都延續狀態，不需往回讀取
+STAGE_LOOKBACK = {
+    'slope': 59,
+    'slope_pr': 251,
+    'ma60': 0,
+    'ma20': 0,
+    'rsi': 1,
+    'kd': 8,
+    'macd': 0,
+    'dmi': 1,
+    'bb': 0,
+    'volume': 0,
+    'atr': 14,
+    'divergence': DIVERGENCE_LENGTH + DIVERGENCE_LAG,
+}
+
+
+def fibo_lookback(profile):
+    """策略的 FIBO 欄位往回讀取的根數"""
+    return max(profile.fibo_window, FIBO_FALLBACK_LOOKBACK if profile.fibo_swing else 0)
+
+
+def resolve_stages(names):
+    """展開相依階段並依 INDICATOR_STAGES 的順序排列"""
+    needed = set()
+    pending = list(names)
+    while pending:
+        name = pending.pop()
+        if name not in INDICATOR_STAGES:
+            raise KeyError(f"未知的指標階段: {name}")
+        if name not in needed:
+            needed.add(name)
+            pending.extend(INDICATOR_STAGES[name][1])
+    return [name for name in INDICATOR_STAGES if name in needed]
+
+
+def compute_indicators(df, stages, keep=None):
+    """在 OHLCV 資料上計算指定的指標階段（含相依階段），回傳新的 DataFrame
+
+    keep 為欄位集合時（精簡模式）只保留 OHLCV 與 keep 內的欄位：其餘欄位在之後的階段
+    不再讀取時即丟棄（EMA12 / BB_Std / *_LbMin 等從不寫入），不必先建出完整的 float64 表。
+    """
+    out = df.copy()
+    order = resolve_stages(stages)
+    for i, name in enumerate(order):
+        result = run_stage(name, out)
+        if keep is None:
+            for col, values in result.items():
+                out[col] = values
+            continue
+        needed = set(OHLCV).union(keep, *(STAGE_INPUTS.get(later, ()) for later in order[i + 1:]))
+        stale = [c for c in out.columns if c not in needed]
+        if stale:
+            out = out.drop(columns=stale)
+        for col, values in result.items():
+            if col in needed:
+                out[col] = values
+    return out
+
+
+def run_stage(name, df):
+    """執行單一指標階段，回傳 {欄位: 值}（instrument.recording 內時記錄時間與記憶體）"""
+    with stage(name, rows=len(df)):
+        return INDICATOR_STAGES[name][0](df)
+
+
+def fibo_columns(df, window, levels, swing, valid_threshold):
+    """C. FIBO 波段位階與有效性 (區間 / 最低價 >= valid_threshold)"""
+    with stage('fibo', rows=len(df)):
+        cols = fibo_levels(df['Close'].values, window=window, levels=levels, swing=swing)
+        out = pd.DataFrame(cols, index=df.index)
+        out['Fibo_Range'] = out['Fibo_MaxPrice'] - out['Fibo_MinPrice']
+        out['Fibo_Valid'] = (out['Fibo_Range'] / out['Fibo_MinPrice']) >= valid_threshold
+    return out
+
+
+def profile_frame(base, profile, cache=None, keep=None):
+    """在共用指標上疊加策略專屬欄位 (FIBO、擴張視窗 Slope_PR)；cache 讓相同設定的策略共用結果
+
+    keep 為欄位集合時只疊加其中的欄位（Fibo_Range 與評分未讀取的位階不併入）。
+    """
+    key = profile.fibo_key()
+    if cache is not None and key in cache:
+        fibo = cache[key]
+    else:
+        fibo = fibo_columns(base, profile.fibo_window, profile.fibo_levels, profile.fibo_swing, profile.fibo_valid_threshold)
+        if cache is not None:
+            cache[key] = fibo
+    overlays = [fibo]
+
+    rank_key = profile.slope_rank_key()
+    if rank_key is not None and 'Slope_60' in base.columns:
+        if cache is not None and rank_key in cache:
+            slope_pr = cache[rank_key]
+        else:
+            with stage('slope_pr_expanding', rows=len(base)):
+                slope_pr = expanding_percentile_rank(base['Slope_60'], profile.slope_rank_start) * 100
+            slope_pr = slope_pr.to_frame('Slope_PR')
+            if cache is not None:
+                cache[rank_key] = slope_pr
+        overlays.append(slope_pr)
+
+    if keep is not None:
+        overlays = [overlay[[c for c in overlay.columns if c in keep]] for overlay in overlays]
+    columns = [c for overlay in overlays for c in overlay.columns]
+    frame = base.drop(columns=[c for c in columns if c in base.columns])
+    return pd.concat([frame, *overlays], axis=1)
+
+
+def score_profiles(df, profiles):
+    """一次計算所有策略所需指標的聯集，再輸出每個策略的買賣評分
+
+    回傳 (base, scores)：base 為共用指標欄位；scores 為 {策略名稱: 評分 DataFrame}，
+    評分 DataFrame 含各分項分數與 Buy_Score / Sell_Score。
+    """
+    stages = set()
+    for profile in profiles:
+        stages.update(profile.stages)
+    base = compute_indicators(df, stages)
+    cache = {}
+    scores = {}
+    for profile in profiles:
+        frame = profile_frame(base, profile, cache)
+        scores[profile.name] = pd.concat(score_frame(frame, profile), axis=1)
+    return base, scores
+
+
+def score_frame(frame, profile):
+    """策略的買入與賣出評分 (buy, sell)，兩者分別記錄為 buy_score / sell_score 階段；總分依 profile.weights 加權"""
+    with stage('buy_score', rows=len(frame)):
+        buy = reweight(profile.buy_scorer(frame), BUY_COMPONENTS, profile.weights, 'Buy_Score')
+    with stage('sell_score', rows=len(frame)):
+        sell = reweight(profile.sell_scorer(frame), SELL_COMPONENTS, profile.weights, 'Sell_Score')
+    return buy, sell
+
+
+def compact_columns(profile):
+    """精簡模式保留的欄位：OHLCV、評分讀取的欄位、背離旗標與評分；評分函數未登記於 SCORE_INPUTS 時為 None"""
+    inputs = [SCORE_INPUTS.get(profile.buy_scorer), SCORE_INPUTS.get(profile.sell_scorer)]
+    if None in inputs:
+        return None
+    return set(OHLCV).union(*inputs, divergence_flag_names(), BUY_COMPONENTS, SELL_COMPONENTS,
+                            ['Buy_Score', 'Sell_Score'])
+
+
+def compact_frame(df, profile):
+    """精簡 run_profile 的輸出：只保留 compact_columns 的欄位，並縮小數值型別
+
+    評分已在 float64 下算完，精簡只影響儲存：float32 欄位與原值的相對誤差 <= COMPACT_RTOL，
+    int8 / bool 欄位與原值相同。未登記於 scoring.SCORE_INPUTS 的評分函數保留全部欄位。
+    """
+    keep = compact_columns(profile)
+    out = df if keep is None else df[[c for c in df.columns if c in keep]]
+    flags = set(divergence_flag_names()) | {'Fibo_Valid'}
+    dtypes = {}
+    for col in out.columns:
+        if col in flags:
+            dtypes[col] = bool
+        elif col in COMPACT_FLOAT32:
+            dtypes[col] = 'float32'
+        elif col in BUY_COMPONENTS or col in SELL_COMPONENTS:
+            dtypes[col] = 'int8'
+    return out.astype(dtypes)
+
+
+def run_profile(df, profile, compact=False):
+    """單一策略：回傳含指標、FIBO 與評分的完整 DataFrame（供繪圖使用）
+
+    compact=True 時中間欄位在計算過程中即丟棄（見 compute_indicators 的 keep），最後縮小型別
+    （見 compact_frame），適合大量股票同時留在記憶體；結果與 compact_frame(run_profile(df, profile)) 相同。
+    """
+    keep = compact_columns(profile) if compact else None
+    with stage('run_profile', rows=len(df)):
+        if keep is None:
+            base = compute_indicators(df, profile.stages)
+        else:
+            # 擴張視窗 Slope_PR 在 profile_frame 讀取 Slope_60
+            base = compute_indicators(df, profile.stages, keep | {'Slope_60'})
+        frame = profile_frame(base, profile, keep=keep)
+        out = pd.concat([frame, *score_frame(frame, profile)], axis=1)
+        return compact_frame(out, profile) if compact else out
@@ -0,0 +1,261 @@
+"""評分圖表：股價 + 買入評分 + 賣出評分三聯圖（與 test.py 的繪圖相同，門檻取自策略設定）
+
+matplotlib 只在繪圖時才載入，評分流程不需要安裝或載入它。圖例含中文級別名稱（強力買進區等），
+需安裝任一 CJK_FONTS 中的字型（例如 Linux 的 fonts-noto-cjk），否則中文顯示為方框。
+長序列可用 max_points 以 LTTB 降採樣（保留形狀與每一次跨越門檻的轉折）；
+render_charts 以多進程、非互動的 Agg 後端把整份股票清單直接畫成 PNG / SVG（預設降採樣到約
+DEFAULT_MAX_POINTS 點，門檻區塊的進出日期與完整解析度相同；單檔失敗只列出錯誤）。
+"""
+import os
+import traceback
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+
+from .data import DEFAULT_CACHE_DIR
+from .instrument import stage
+
+# 批次出圖時每條序列最多保留的點數（不含跨越門檻額外保留的點）
+DEFAULT_MAX_POINTS = 1500
+CHART_FORMATS = ('png', 'svg')
+# 中文字型：接在 font.sans-serif 原有字型之後，英數字維持原字型，缺字時逐字改用（matplotlib >= 3.6）
+CJK_FONTS = (
+    'Noto Sans CJK TC', 'Noto Sans TC', 'Source Han Sans TC', 'Microsoft JhengHei', 'PingFang TC', 'Heiti TC',
+    'Noto Sans CJK JP', 'Noto Sans CJK SC', 'WenQuanYi Zen Hei', 'Microsoft YaHei', 'SimHei', 'Arial Unicode MS',
+)
+
+# 目前進程是否有 CJK_FONTS 中的字型（None 為尚未檢查）
+_cjk_available = None
+
+# 門檻由低到高的線色與區塊色 (與 test.py 相同)
+BUY_LINE_STYLES = (
+    {'color': 'blue', 'alpha': 0.5},
+    {'color': 'cyan'},
+    {'color': 'red'},
+)
+BUY_FILL_STYLES = (
+    {'color': 'lightblue', 'alpha': 0.2},
+    {'color': 'lightgreen', 'alpha': 0.3},
+    {'color': 'green', 'alpha': 0.4},
+)
+SELL_LINE_STYLES = (
+    {'color': 'orange'},
+    {'color': 'darkred'},
+)
+SELL_FILL_STYLES = (
+    {'color': 'orange', 'alpha': 0.3},
+    {'color': 'red', 'alpha': 0.4},
+)
+
+
+def lttb_indices(values, n_out):
+    """Largest-Triangle-Three-Buckets 降採樣，回傳保留點的位置（遞增）
+
+    x 軸取位置（交易日等距）；NaN 不參與挑選，保留首尾有效點。
+    有效點不超過 n_out 時全部保留。
+    """
+    y = np.asarray(values, dtype=float)
+    valid = np.flatnonzero(np.isfinite(y))
+    n = len(valid)
+    if n_out >= n or n_out < 3:
+        return valid
+    yv = y[valid]
+    xv = valid.astype(float)
+
+    # 中間 n - 2 點均分成 n_out - 2 個桶，每桶挑與「前一個選點、下一桶平均點」面積最大的點
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0] = 0
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        if b + 2 < len(edges):
+            nlo, nhi = edges[b + 1], edges[b + 2]
+            cx, cy = xv[nlo:nhi].mean(), yv[nlo:nhi].mean()
+        else:
+            cx, cy = xv[-1], yv[-1]
+        area = np.abs((xv[a] - cx) * (yv[lo:hi] - yv[a]) - (xv[a] - xv[lo:hi]) * (cy - yv[a]))
+        a = lo + int(np.argmax(area))
+        out[b + 1] = a
+    out[-1] = n - 1
+    return valid[out]
+
+
+def crossing_indices(values, thresholds):
+    """序列跨越任一門檻（>= 門檻的狀態改變）時，改變前後兩根的位置"""
+    y = np.asarray(values, dtype=float)
+    keep = []
+    for threshold in thresholds:
+        above = y >= threshold
+        changed = np.flatnonzero(above[1:] != above[:-1])
+        keep.extend([changed, changed + 1])
+    if not keep:
+        return np.empty(0, dtype=np.int64)
+    return np.unique(np.concatenate(keep))
+
+
+def downsample(df, columns, max_points, thresholds=()):
+    """只保留各欄位 LTTB 選點與跨越門檻點的聯集（max_points 為 None 時原樣回傳）"""
+    if max_points is None or len(df) <= max_points:
+        return df
+    keep = [crossing_indices(df[columns[0]].to_numpy(dtype=float), thresholds)]
+    keep += [lttb_indices(df[c].to_numpy(dtype=float), max_points) for c in columns]
+    return df.iloc[np.unique(np.concatenate(keep))]
+
+
+def _score_panel(ax, df, column, tiers, line_styles, fill_styles, color, label, max_points=None):
+    """評分走勢 + 門檻線 + 各級區塊（tiers 由高到低，繪製時由低到高）"""
+    df = downsample(df, [column], max_points, [t for t, _ in tiers])
+    score = df[column]
+    ax.plot(df.index, score, label=label, color=color)
+    ascending = sorted(tiers)
+    for (threshold, name), style in zip(ascending, line_styles):
+        ax.axhline(y=threshold, linestyle='--', label=f'{name} ({threshold})', **style)
+    for i, ((threshold, name), style) in enumerate(zip(ascending, fill_styles)):
+        upper = ascending[i + 1][0] if i + 1 < len(ascending) else None
+        where = score >= threshold if upper is None else (score >= threshold) & (score < upper)
+        ax.fill_between(df.index, score, threshold, where=where, label=f'{name}區', **style)
+    levels = ' / '.join(str(t) for t, _ in ascending)
+    ax.set_ylabel(label)
+    ax.set_title(f"{label.split()[0]} Signals (Linear Scoring: {levels})", fontsize=12)
+    ax.legend(loc='upper left', fontsize=8)
+    ax.grid(True, alpha=0.3)
+
+
+def _configure_fonts():
+    """把 CJK_FONTS 加進 font.sans-serif（每個進程一次），回傳是否有已安裝的中文字型；沒有時警告一次"""
+    global _cjk_available
+    if _cjk_available is None:
+        from matplotlib import font_manager, rcParams
+        families = list(rcParams['font.sans-serif'])
+        rcParams['font.sans-serif'] = families + [name for name in CJK_FONTS if name not in families]
+        _cjk_available = bool({font.name for font in font_manager.fontManager.ttflist}.intersection(CJK_FONTS))
+        if not _cjk_available:
+            warnings.warn('未安裝中文字型（見 plotting.CJK_FONTS，例如 fonts-noto-cjk），圖例的中文級別名稱會顯示為方框',
+                          stacklevel=4)
+    return _cjk_available
+
+
+@contextmanager
+def _cjk_fonts():
+    """繪圖與存檔期間：設定中文字型；未安裝時略過每個字各一次的缺字警告（已由 _configure_fonts 說明）"""
+    with warnings.catch_warnings():
+        if not _configure_fonts():
+            warnings.filterwarnings('ignore', message=r'Glyph \d+ .* missing from', category=UserWarning)
+        yield
+
+
+def plot_scores(df, profile, path=None, show=False, figsize=(16, 12), max_points=None):
+    """繪製三聯圖，path 指定時存檔；回傳 matplotlib Figure
+
+    df 為 run_profile 的輸出；均線取 MA60（沒有時改用 MA20）。
+    max_points 指定時各面板以 LTTB 降採樣，評分面板另外保留跨越門檻的點，
+    門檻區塊的進出位置與原圖相同。
+    """
+    import matplotlib
+    if path is not None and not show:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    with _cjk_fonts(), stage('plot', rows=len(df)):
+        code = profile.name
+        ma = 'MA60' if 'MA60' in df.columns else 'MA20'
+        fig = plt.figure(figsize=figsize)
+
+        ax1 = fig.add_subplot(3, 1, 1)
+        price = downsample(df, ['Close', ma] if ma in df.columns else ['Close'], max_points)
+        ax1.plot(price.index, price['Close'], label=f'Price ({code})', color='black')
+        if ma in df.columns:
+            ax1.plot(price.index, price[ma], label=f'{ma[2:]} MA', color='orange', linestyle='--')
+        ax1.set_title(f'{profile.title}: Price Trend', fontsize=14)
+        ax1.legend(loc='upper left')
+        ax1.grid(True, alpha=0.3)
+
+        ax2 = fig.add_subplot(3, 1, 2, sharex=ax1)
+        _score_panel(ax2, df, 'Buy_Score', profile.buy_tiers, BUY_LINE_STYLES, BUY_FILL_STYLES, '#00CC00',
+                     'Buy Score', max_points)
+        ax3 = fig.add_subplot(3, 1, 3, sharex=ax1)
+        _score_panel(ax3, df, 'Sell_Score', profile.sell_tiers, SELL_LINE_STYLES, SELL_FILL_STYLES, '#FF3333',
+                     'Sell Score', max_points)
+
+        fig.tight_layout()
+        if path is not None:
+            fig.savefig(path)
+    if show:
+        plt.show()
+    elif path is not None:
+        plt.close(fig)
+    return fig
+
+
+def chart_paths(ticker, directory, formats=('png',)):
+    """各格式的輸出路徑：<directory>/<代號>.<格式>"""
+    name = ticker.replace('/', '_')
+    return [os.path.join(directory, f'{name}.{fmt}') for fmt in formats]
+
+
+def render_chart(ticker, profile_name, directory, formats=('png',), max_points=DEFAULT_MAX_POINTS, start=None,
+                 end=None, cache_dir=DEFAULT_CACHE_DIR, offline=None):
+    """單一股票：載入資料、評分並以 Agg 後端存成各格式的圖檔，回傳路徑清單"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    from .data import OHLCVStore
+    from .pipeline import run_profile
+    from .profiles import get_profile
+
+    df = OHLCVStore(cache_dir, offline=offline).get(ticker, start, end)
+    if df.empty:
+        raise ValueError(f"{ticker} 沒有資料")
+    profile = get_profile(profile_name or ticker)
+    fig = plot_scores(run_profile(df, profile), profile, max_points=max_points)
+    paths = chart_paths(ticker, directory, formats)
+    try:
+        with _cjk_fonts(), stage('plot_save', rows=len(df)):
+            for path in paths:
+                fig.savefig(path)
+    finally:
+        plt.close(fig)
+    return paths
+
+
+def _render_task(task):
+    """子進程工作：捕捉例外並回傳錯誤訊息，避免單檔失敗中斷整批"""
+    ticker, *args = task
+    try:
+        return ticker, render_chart(ticker, *args), None
+    except Exception as exc:
+        return ticker, None, f"{type(exc).__name__}: {exc}\n{traceback.format_exc(limit=3)}"
+
+
+def render_charts(tickers, directory, profile_name=None, formats=('png',), workers=None, max_points=DEFAULT_MAX_POINTS,
+                  start=None, end=None, cache_dir=DEFAULT_CACHE_DIR, offline=None):
+    """對股票清單平行出圖，回傳 ({代號: [路徑]}, {代號: 錯誤訊息})
+
+    profile_name 為 None 時依代號選策略（6669.TW -> 6669）。workers 預設為 CPU 核心數，
+    workers=1 時在目前進程內依序執行（方便除錯）。
+    """
+    unknown = [fmt for fmt in formats if fmt not in CHART_FORMATS]
+    if unknown:
+        raise ValueError(f"不支援的圖檔格式: {', '.join(unknown)}（可用：{', '.join(CHART_FORMATS)}）")
+    os.makedirs(directory, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    tasks = [(t, profile_name, directory, tuple(formats), max_points, start, end, cache_dir, offline) for t in tickers]
+
+    if workers == 1:
+        return _collect_charts(map(_render_task, tasks))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return _collect_charts(pool.map(_render_task, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+
+
+def _collect_charts(results):
+    paths, errors = {}, {}
+    for ticker, written, error in results:
+        if error is not None:
+            errors[ticker] = error
+        else:
+            paths[ticker] = written
+    return paths, errors
@@ -0,0 +1,109 @@
+"""策略設定：各股票的評分規則、所需指標與買賣建議門檻"""
+from dataclasses import dataclass, field
+from typing import Callable
+
+from .fibo import FIBO_LEVELS, FIBO_LEVELS_3231
+from .scoring import buy_score_3231, buy_score_6669, sell_score_3231, sell_score_6669
+
+# 評分未超過任何建議門檻時的級別名稱
+BUY_DEFAULT_TIER = '觀望'
+SELL_DEFAULT_TIER = '續抱'
+
+
+@dataclass
+class StrategyProfile:
+    """一組評分策略
+
+    stages 為共用指標階段 (見 pipeline.INDICATOR_STAGES)；FIBO 因視窗與位階
+    依策略而異，於 pipeline.profile_frame 另外疊加。門檻由高到低排列。
+    buy_actions / sell_actions 為回測用的 (門檻, 比例)：買進投入現金的比例、
+    賣出持股的比例（見 backtest.backtest）。
+    slope_rank 為 Slope_PR 的排名方式：'rolling' 為 252 日滾動平均排名；
+    'expanding' 與 src/App.jsx 相同，取第 slope_rank_start 根起所有斜率中
+    嚴格小於當日的比例（見 rolling.expanding_percentile_rank），用來對齊網頁與 Python 的評分，
+    例如 dataclasses.replace(get_profile('6669'), slope_rank='expanding')；網頁的斜率以 61 根
+    收盤計算，與 Python 的 60 根視窗仍略有差異。
+    weights 為分項權重 {分項欄位: 倍數}（未列出的分項為 1），Buy_Score / Sell_Score 依此加權
+    重算，分項欄位維持原始配分（見 scoring.reweight、sweep.tuned_profile）。
+    """
+    name: str
+    title: str
+    buy_scorer: Callable
+    sell_scorer: Callable
+    stages: tuple
+    fibo_window: int
+    fibo_levels: dict
+    fibo_swing: bool
+    fibo_valid_threshold: float
+    buy_tiers: tuple = field(default=())
+    sell_tiers: tuple = field(default=())
+    buy_actions: tuple = field(default=())
+    sell_actions: tuple = field(default=())
+    slope_rank: str = 'rolling'
+    slope_rank_start: int = 60
+    weights: dict = field(default_factory=dict)
+
+    def fibo_key(self):
+        """FIBO 設定的識別鍵，相同設定的策略共用同一份計算結果"""
+        return (self.fibo_window, tuple(self.fibo_levels.items()), self.fibo_swing, self.fibo_valid_threshold)
+
+    def slope_rank_key(self):
+        """Slope_PR 排名方式的識別鍵；'rolling' 沿用共用指標階段的結果"""
+        if self.slope_rank == 'rolling':
+            return None
+        if self.slope_rank != 'expanding':
+            raise ValueError(f"未知的 slope_rank: {self.slope_rank}（可用：rolling、expanding）")
+        return (self.slope_rank, self.slope_rank_start)
+
+
+PROFILES = {}
+
+
+def register_profile(profile):
+    """註冊策略，名稱重複時覆蓋"""
+    PROFILES[profile.name] = profile
+    return profile
+
+
+def get_profile(name):
+    """依名稱 (例如 '6669'、'3231'、'6669.TW') 取得策略"""
+    key = str(name).split('.')[0].upper()
+    if key not in PROFILES:
+        raise KeyError(f"未註冊的策略: {name}（可用：{', '.join(PROFILES)}）")
+    return PROFILES[key]
+
+
+# 6669 Wiwynn：長線投資策略
+register_profile(StrategyProfile(
+    name='6669',
+    title='6669 Wiwynn',
+    buy_scorer=buy_score_6669,
+    sell_scorer=sell_score_6669,
+    stages=('slope', 'slope_pr', 'ma60', 'rsi', 'kd', 'macd', 'dmi', 'bb', 'volume', 'atr', 'divergence'),
+    fibo_window=120,
+    fibo_levels=FIBO_LEVELS,
+    fibo_swing=True,
+    fibo_valid_threshold=0.1,
+    buy_tiers=((50, '強力買進'), (40, '分批佈局'), (20, '中性觀察')),
+    sell_tiers=((55, '清倉賣出'), (40, '調節警戒')),
+    # 6669 的建議未標示比例，沿用 3231 的 50% / 20% 投入、100% / 50% 賣出
+    buy_actions=((50, 0.5), (40, 0.2)),
+    sell_actions=((55, 1.0), (40, 0.5)),
+))
+
+# 3231 緯創：短線波段策略
+register_profile(StrategyProfile(
+    name='3231',
+    title='3231 Wistron',
+    buy_scorer=buy_score_3231,
+    sell_scorer=sell_score_3231,
+    stages=('ma20', 'rsi', 'kd', 'macd', 'bb', 'divergence'),
+    fibo_window=20,
+    fibo_levels=FIBO_LEVELS_3231,
+    fibo_swing=False,
+    fibo_valid_threshold=0.05,
+    buy_tiers=((60, '強力買進'), (45, '嘗試進場'), (20, '中性觀察')),
+    sell_tiers=((60, '清倉賣出'), (40, '獲利調節')),
+    buy_actions=((60, 0.5), (45, 0.2)),
+    sell_actions=((60, 1.0), (40, 0.5)),
+))
@@ -0,0 +1,358 @@
+"""滾動視窗統計：以累積和在單次掃描中完成的迴歸與排名計算，以及 pandas 滾動平均 / 變異數的逐筆狀態
+
+迴歸的累積和在固定長度的區塊內進行 (ROLLING_BLOCK)，每個視窗的結果只由所在區塊的資料決定，
+分段 (chunked.py) 與整段計算的結果逐位元相同。滾動平均與標準差沿用 pandas（與舊版腳本
+相同的數值），分段與串流計算以 RollingMeanState / RollingVarState 重現其逐筆運算並接續狀態。
+"""
+from collections import deque
+from math import copysign, sqrt
+
+import numpy as np
+import pandas as pd
+
+
+# 滾動和的區塊長度：累積和自序列起點每 ROLLING_BLOCK 根重新起算，每個視窗的結果
+# 只由所在區塊的資料決定；分段計算時段落起點為其倍數即可逐位元重現（見 chunked.py）
+ROLLING_BLOCK = 64
+
+
+def _block_sums(y, window, regression=False, block=ROLLING_BLOCK):
+    """各視窗的中心化總和 Σd 與有效筆數（regression=True 時另含 Σd²、Σjd）
+
+    第 b 個區塊涵蓋 [b*block, b*block + block + window - 1)，起點落在 [b*block, (b+1)*block)
+    的視窗都完整落在其中。區塊內以首值 ref 中心化 (d = y - ref，NaN 記為 0)，j 為區塊內
+    置中的位置；累積和只在區塊內進行，數值大小與序列長度無關。
+    回傳 dict（長度皆為 n - window + 1，第 k 個對應結尾在 k + window - 1 的視窗）：
+    ref、sum、count，以及 sum_sq、sum_jd 與視窗內 j 的平均 j_mid。
+    """
+    n = len(y)
+    m = n - window + 1
+    nb = -(-m // block)
+    span = block + window - 1
+    padded = np.full(nb * block + window - 1, np.nan)
+    padded[:n] = y
+    rows = np.lib.stride_tricks.sliding_window_view(padded, span)[::block]
+
+    valid = ~np.isnan(rows)
+    ref = np.where(valid[:, 0], rows[:, 0], 0.0)
+    d = np.where(valid, rows - ref[:, None], 0.0)
+
+    def window_sum(values):
+        # 每個區塊第 lo 個起點的視窗和 = csum[lo + window - 1] - csum[lo - 1]
+        csum = np.cumsum(values, axis=1)
+        sums = csum[:, window - 1:]
+        sums[:, 1:] -= csum[:, :block - 1]
+        return sums.ravel()[:m]
+
+    out = {
+        'ref': np.repeat(ref, block)[:m],
+        'sum': window_sum(d),
+        'count': window_sum(valid.astype(float)),
+    }
+    if regression:
+        j = np.arange(span) - (span - 1) / 2
+        out['sum_sq'] = window_sum(d * d)
+        out['sum_jd'] = window_sum(j * d)
+        out['j_mid'] = np.tile(j[:block] + (window - 1) / 2, nb)[:m]
+    return out
+
+
+def rolling_linregress_arrays(y, window):
+    """滾動最小平方法 (x = 0..window-1)，回傳 slope, intercept, r2 三個陣列
+
+    每個視窗的 Σy、Σxy、Σy² 都由區塊內的累積和相減取得，整段只需 O(n)（見 _block_sums）。
+    視窗內有 NaN 時該列結果為 NaN（與 rolling(window).apply 相同）。
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    slope = np.full(n, np.nan)
+    intercept = np.full(n, np.nan)
+    r2 = np.full(n, np.nan)
+    if window < 2 or n < window:
+        return slope, intercept, r2
+
+    sums = _block_sums(y, window, regression=True)
+    sy = sums['sum']
+    sxx = window * (window * window - 1) / 12.0  # Σ(x - x̄)²
+    sxy = sums['sum_jd'] - sums['j_mid'] * sy     # Σ(x - x̄)(y - ȳ)
+    ssy = sums['sum_sq'] - sy * sy / window      # Σ(y - ȳ)²
+    full = sums['count'] == window
+
+    b = sxy / sxx
+    y_mean = sy / window + sums['ref']
+    a = y_mean - b * (window - 1) / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = np.where(ssy > 0, sxy * sxy / (sxx * ssy), 0.0)
+
+    tail = slice(window - 1, None)
+    slope[tail] = np.where(full, b, np.nan)
+    intercept[tail] = np.where(full, a, np.nan)
+    r2[tail] = np.where(full, np.minimum(r, 1.0), np.nan)
+    return slope, intercept, r2
+
+
+def rolling_linregress(series, window):
+    """對 Series 做滾動線性迴歸，回傳含 slope / intercept / r2 欄位的 DataFrame
+
+    slope 與 test.py 的 get_slope (scipy linregress) 在浮點誤差內一致（相對誤差約 1e-12）。
+    價格有跳動單位時，不同視窗可能有數學上相同的斜率，舊版依 linregress 的捨入排出先後，
+    這裡可能並列或順序相反，該根 Slope_PR 相差「並列筆數 / 252」，偶爾改變評分
+    （頻率依跳動單位而定，合成資料約每數百至 1,500 根一次，見 tests/test_rolling.py）。
+    """
+    slope, intercept, r2 = rolling_linregress_arrays(series.values, window)
+    return pd.DataFrame({'slope': slope, 'intercept': intercept, 'r2': r2}, index=series.index)
+
+
+def _floats(values):
+    """逐筆迴圈用：ndarray 先轉成 Python float 的 list（逐一取出 numpy 純量較慢）"""
+    return values.astype(float).tolist() if isinstance(values, np.ndarray) else values
+
+
+# pandas roll_var 判斷相消誤差的門檻 (InvCondTol)
+_VAR_UNSTABLE_TOL = np.finfo(float).eps * 1e3
+
+
+class RollingMeanState:
+    """pandas rolling(window).mean() 的逐筆狀態，供分段與串流計算接續
+
+    pandas (_libs/window/aggregations.pyx 的 roll_mean) 以 Kahan 補償累加新值、扣除離開
+    視窗的值，和是從序列起點一路延續的，結果與視窗外的歷史有關，無法只由視窗內的值重現。
+    這裡逐筆重現相同的運算（含連續同值直接取原值、全正 / 全負時的符號修正），從序列
+    起點餵入即與 pandas 整段計算逐位元相同。視窗內有 NaN 時為 NaN；window 需 >= 2。
+    """
+
+    def __init__(self, window):
+        if window < 2:
+            raise ValueError(f'window 需 >= 2: {window}')
+        self.window = window
+        self.history = deque(maxlen=window)
+        self.nobs = self.neg = self.same = 0
+        self.total = self.comp_add = self.comp_remove = 0.0
+        self.prev = np.nan
+
+    def update(self, value):
+        """加入一個新值，回傳目前的平均"""
+        return self.extend((float(value),))[0]
+
+    def extend(self, values):
+        """依序加入多個值，回傳每一步的平均 (list)"""
+        window, history = self.window, self.history
+        nobs, neg, same, prev = self.nobs, self.neg, self.same, self.prev
+        total, comp_add, comp_remove = self.total, self.comp_add, self.comp_remove
+        out = []
+        for x in _floats(values):
+            if len(history) == window:
+                old = history[0]
+                if old == old:
+                    nobs -= 1
+                    y = -old - comp_remove
+                    t = total + y
+                    comp_remove = t - total - y
+                    total = t
+                    if copysign(1.0, old) < 0:
+                        neg -= 1
+            history.append(x)
+            if x == x:
+                nobs += 1
+                y = x - comp_add
+                t = total + y
+                comp_add = t - total - y
+                total = t
+                if copysign(1.0, x) < 0:
+                    neg += 1
+                same = same + 1 if x == prev else 1
+                prev = x
+            if nobs >= window:
+                mean = total / nobs
+                if same >= nobs:
+                    mean = prev
+                elif (neg == 0 and mean < 0) or (neg == nobs and mean > 0):
+                    mean = 0.0
+                out.append(mean)
+            else:
+                out.append(np.nan)
+        self.nobs, self.neg, self.same, self.prev = nobs, neg, same, prev
+        self.total, self.comp_add, self.comp_remove = total, comp_add, comp_remove
+        return out
+
+
+class RollingVarState:
+    """pandas rolling(window).var(ddof) 的逐筆狀態（roll_var：Welford 加 Kahan 補償）
+
+    與 RollingMeanState 相同，結果與視窗外的歷史有關；新增或移除後平方和驟降（可能相消）
+    時 pandas 以視窗內的值從頭重算，這裡一併重現。std=True 時回傳標準差（同 pandas 的
+    .std()，負的變異數記為 0）。
+    """
+
+    def __init__(self, window, ddof=1, std=False):
+        if window < 2:
+            raise ValueError(f'window 需 >= 2: {window}')
+        self.window = window
+        self.ddof = ddof
+        self.std = std
+        self.history = deque(maxlen=window)
+        self.nobs = self.mean = self.ssq = self.comp_add = self.comp_remove = 0.0
+        self.unstable = False
+
+    def _add(self, x):
+        if x != x:
+            return
+        prev_ssq = self.ssq
+        self.nobs += 1
+        prev_mean = self.mean - self.comp_add
+        y = x - self.comp_add
+        t = y - self.mean
+        self.comp_add = t + self.mean - y
+        self.mean = self.mean + t / self.nobs
+        self.ssq = self.ssq + (x - prev_mean) * (x - self.mean)
+        if prev_ssq * _VAR_UNSTABLE_TOL > self.ssq:
+            self.unstable = True
+
+    def _remove(self, x):
+        if x != x:
+            return
+        self.nobs -= 1
+        if not self.nobs:
+            self.mean = self.ssq = 0.0
+            self.unstable = False
+            return
+        prev_ssq = self.ssq
+        prev_mean = self.mean - self.comp_remove
+        y = x - self.comp_remove
+        t = y - self.mean
+        self.comp_remove = t + self.mean - y
+        self.mean = self.mean - t / self.nobs
+        self.ssq = self.ssq - (x - prev_mean) * (x - self.mean)
+        if prev_ssq * _VAR_UNSTABLE_TOL > self.ssq:
+            self.unstable = True
+
+    def update(self, value):
+        """加入一個新值，回傳目前的變異數（std=True 時為標準差）"""
+        return self.extend((float(value),))[0]
+
+    def extend(self, values):
+        """依序加入多個值，回傳每一步的結果 (list)"""
+        window, ddof, history = self.window, self.ddof, self.history
+        out = []
+        for x in _floats(values):
+            first = not history
+            if len(history) == window:
+                self._remove(history[0])
+            history.append(x)
+            self._add(x)
+            if first or self.unstable:
+                self.nobs = self.mean = self.ssq = self.comp_add = self.comp_remove = 0.0
+                for v in history:
+                    self._add(v)
+                self.unstable = False
+            if self.nobs >= window and self.nobs > ddof:
+                var = self.ssq / (self.nobs - ddof)
+                out.append((0.0 if var < 0 else sqrt(var)) if self.std else var)
+            else:
+                out.append(np.nan)
+        return out
+
+
+class FenwickTree:
+    """樹狀陣列 (Binary Indexed Tree)：單點增減與前綴計數皆為 O(log n)"""
+
+    def __init__(self, size):
+        self.size = size
+        self.tree = [0] * (size + 1)
+
+    def add(self, i, delta=1):
+        """位置 i (0 起算) 的計數加上 delta"""
+        i += 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix(self, i):
+        """位置 0..i-1 的計數總和（即嚴格小於 i 的數量）"""
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+
+def _rank_codes(x):
+    """座標壓縮：回傳每個值在排序後唯一值中的位置 (NaN 為 -1) 與唯一值個數"""
+    valid = ~np.isnan(x)
+    uniq, inverse = np.unique(x[valid], return_inverse=True)
+    codes = np.full(len(x), -1, dtype=np.int64)
+    codes[valid] = inverse
+    return codes.tolist(), len(uniq)
+
+
+def rolling_percentile_rank_arrays(values, window):
+    """滾動百分位排名 (0~1)，結果等同 pandas rolling(window).rank(pct=True)
+
+    每一步只插入一個新值、移除一個舊值，以樹狀陣列查詢排名，整段 O(n log n)。
+    同值採平均排名；視窗未滿或視窗內含 NaN 時為 NaN。
+    """
+    x = np.asarray(values, dtype=float)
+    n = len(x)
+    out = np.full(n, np.nan)
+    if window < 1 or n < window:
+        return out
+
+    codes, size = _rank_codes(x)
+    tree = FenwickTree(size)
+    equal = [0] * size
+    nan_count = 0
+    for i in range(n):
+        c = codes[i]
+        if c >= 0:
+            tree.add(c, 1)
+            equal[c] += 1
+        else:
+            nan_count += 1
+        if i >= window:
+            old = codes[i - window]
+            if old >= 0:
+                tree.add(old, -1)
+                equal[old] -= 1
+            else:
+                nan_count -= 1
+        if i >= window - 1 and nan_count == 0:
+            out[i] = (tree.prefix(c) + (equal[c] + 1) / 2) / window
+    return out
+
+
+def rolling_percentile_rank(series, window):
+    """對 Series 做滾動百分位排名 (0~1)，用於 Slope_PR"""
+    return pd.Series(rolling_percentile_rank_arrays(series.values, window), index=series.index)
+
+
+def expanding_percentile_rank_arrays(values, start=0, prior=None):
+    """擴張視窗百分位 (0~1)：第 i 根在 [start, i] 的有效值中「嚴格小於」自己的比例
+
+    與 src/App.jsx 的 sPerc 相同（從第 60 根起的所有斜率排序後計數 s < 當日斜率，
+    除以筆數），但以樹狀陣列逐筆插入與查詢，整段 O(n log n)。
+    i < start 或當日值為 NaN 時為 NaN；NaN 不列入筆數。
+    prior 為更早之前的有效值（已排序），分段計算時用來接續前面各段。
+    """
+    x = np.asarray(values, dtype=float)
+    n = len(x)
+    out = np.full(n, np.nan)
+    if n <= start:
+        return out
+    prior = np.empty(0) if prior is None else prior
+    below = np.searchsorted(prior, x[start:], side='left').tolist()
+
+    codes, size = _rank_codes(x[start:])
+    tree = FenwickTree(size)
+    count = len(prior)
+    for i, (c, k) in enumerate(zip(codes, below), start):
+        if c < 0:
+            continue
+        tree.add(c, 1)
+        count += 1
+        out[i] = (k + tree.prefix(c)) / count
+    return out
+
+
+def expanding_percentile_rank(series, start=0):
+    """對 Series 做擴張視窗百分位 (0~1)，見 expanding_percentile_rank_arrays"""
+    return pd.Series(expanding_percentile_rank_arrays(series.values, start), index=series.index)
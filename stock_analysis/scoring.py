@@ -0,0 +1,439 @@
+"""欄位化評分引擎：以整欄陣列運算 (shift / mask) 取代 df.apply(..., axis=1)
+
+每個評分函數回傳一個 DataFrame，包含各指標的分項分數與總分
+(Buy_Score / Sell_Score)，分數與 test.py、test_3231.py 舊版逐列評分一致。
+"""
+import numpy as np
+import pandas as pd
+
+from .divergence import divergence_flags
+
+BUY_COMPONENTS = ['Buy_FIBO', 'Buy_Slope', 'Buy_MA', 'Buy_KD', 'Buy_RSI', 'Buy_MACD', 'Buy_DMI', 'Buy_BB']
+SELL_COMPONENTS = ['Sell_FIBO', 'Sell_Slope', 'Sell_MA', 'Sell_KD', 'Sell_RSI', 'Sell_MACD', 'Sell_DMI', 'Sell_BB']
+# 任一策略中以線性映射給分（可能有小數）的分項，其餘分項恆為整數
+FRACTIONAL_COMPONENTS = ['Buy_FIBO', 'Buy_Slope', 'Buy_BB', 'Sell_Slope', 'Sell_BB']
+
+
+def linear_map(val, in_min, in_max, out_min, out_max):
+    """線性映射：將 val 從 [in_min, in_max] 映射到 [out_min, out_max]
+
+    陣列版本，val 與區間端點皆可為逐列的陣列；超出區間的值會被截斷。
+    """
+    lo = np.minimum(in_min, in_max)
+    hi = np.maximum(in_min, in_max)
+    val = np.maximum(np.minimum(val, hi), lo)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mapped = out_min + (val - in_min) * (out_max - out_min) / (in_max - in_min)
+    return np.where(np.equal(in_max, in_min), float(out_min), mapped)
+
+
+def _shift(x, periods=1):
+    """向後平移 periods 根，前面補 NaN（等同 Series.shift）"""
+    out = np.full(len(x), np.nan)
+    if periods < len(x):
+        out[periods:] = x[:len(x) - periods]
+    return out
+
+
+def _col(df, name):
+    """取出欄位為 float 陣列；df 可為 DataFrame 或 {欄位名稱: 陣列} 的 dict"""
+    return np.asarray(df[name], dtype=float)
+
+
+def _flag(df, name):
+    return np.asarray(df[name], dtype=bool)
+
+
+def _below_ma_3days(close, ma):
+    """破位：最近 3 天收盤都在均線下"""
+    below = close < ma
+    out = np.zeros(len(close), dtype=bool)
+    out[2:] = below[2:] & below[1:-1] & below[:-2]
+    return out
+
+
+def _select(conditions, choices, default=0):
+    """同 np.select（取第一個成立的條件），以 np.where 由後往前串接；
+    逐筆評分時陣列只有幾列，np.select 的廣播檢查比計算本身還慢
+    """
+    out = default
+    for condition, choice in zip(reversed(conditions), reversed(choices)):
+        out = np.where(condition, choice, out)
+    return out
+
+
+def _sum_in_order(parts):
+    """依序累加各分項（與舊版 score += ... 的浮點運算順序相同）"""
+    total = np.zeros(len(parts[0]))
+    for part in parts:
+        total = total + part
+    return total
+
+
+def weighted_total(parts, scales):
+    """依序累加 parts[i] * scales[i]；倍數為 1 的分項不相乘，全為 1 時與 _sum_in_order 逐位元相同"""
+    total = np.zeros(np.broadcast(*parts).shape)
+    for part, scale in zip(parts, scales):
+        total = total + (part if scale == 1.0 else part * scale)
+    return total
+
+
+def component_scales(names, weights):
+    """{分項: 倍數} -> 依 names 順序的倍數清單（未列出的分項為 1）；weights 含未知分項時 KeyError"""
+    unknown = [name for name in weights if name not in BUY_COMPONENTS + SELL_COMPONENTS]
+    if unknown:
+        raise KeyError(f"未知的評分分項: {', '.join(unknown)}")
+    return [float(weights.get(name, 1.0)) for name in names]
+
+
+def reweight(scores, names, weights, total_name):
+    """評分 DataFrame 的總分改依 {分項: 倍數} 加權重算；分項欄位維持原始配分，倍數全為 1 時原樣回傳"""
+    scales = component_scales(names, weights)
+    if all(scale == 1.0 for scale in scales):
+        return scores
+    out = scores.copy()
+    out[total_name] = weighted_total([out[name].to_numpy(dtype=float) for name in names], scales)
+    return out
+
+
+def _frame(df, names, parts, total, total_name):
+    out = pd.DataFrame(dict(zip(names, parts)), index=getattr(df, 'index', None))
+    out[total_name] = total
+    return out
+
+
+def _buy_6669(df):
+    """6669 長線版買入評分（總分 100）：回傳 (各分項陣列, 總分陣列)"""
+    close = _col(df, 'Close')
+    openp = _col(df, 'Open')
+    low = _col(df, 'Low')
+    prev_close = _shift(close)
+    prev_close[:1] = close[:1]
+
+    # === FIBO 評分 (35分) - 線性給分 ===
+    l236, l382, l500, l618 = (_col(df, c) for c in ['Fibo_l236', 'Fibo_l382', 'Fibo_l500', 'Fibo_l618'])
+    max_price = _col(df, 'Fibo_MaxPrice')
+    base = _select(
+        [close > l236, close > l382, close > l500, close >= l618],
+        [
+            linear_map(close, l236, max_price, 5, 10),
+            linear_map(close, l382, l236, 20, 25),
+            linear_map(close, l500, l382, 15, 20),
+            linear_map(close, l618, l500, 10, 15),
+        ],
+        default=0.0,
+    )
+    body_len = np.abs(close - openp)
+    lower_shadow = np.minimum(close, openp) - low
+    volume = _col(df, 'Volume')
+    vol_ma5 = _col(df, 'VolMA5')
+    atr = _col(df, 'ATR')
+    modifier = (
+        np.where((close > openp) & (close > prev_close), 10, 0)
+        + np.where((lower_shadow > body_len) & (low <= l382), 8, 0)
+        + np.where(volume < vol_ma5 * 0.7, 5, 0)
+        - np.where((close < openp) & (body_len > atr * 1.5), 10, 0)
+    )
+    modifier = np.where(np.isnan(openp), 0, modifier)
+    fibo_ok = _flag(df, 'Fibo_Valid') & ~np.isnan(l236)
+    b_fibo = np.where(fibo_ok, np.minimum(35, np.maximum(0, base + modifier)), 0.0)
+
+    # === 動態斜率 (20分) - 線性給分 ===
+    s_perc = _col(df, 'Slope_PR')
+    slope = _col(df, 'Slope_60')
+    rank = _select(
+        [s_perc < 10, s_perc < 25, s_perc < 40],
+        [linear_map(s_perc, 0, 10, 15, 10), linear_map(s_perc, 10, 25, 10, 5), linear_map(s_perc, 25, 40, 5, 0)],
+        default=0.0,
+    )
+    momentum = np.where(slope > _shift(slope), 5, 0)
+    b_hist = np.where(rank > 0, rank + momentum, 0.0)
+
+    # === MA 季線 (7分) ===
+    ma_slope = _col(df, 'MA60_Slope')
+    bias = _col(df, 'Bias_60')
+    broken = _below_ma_3days(close, _col(df, 'MA60'))
+    b_ma = (
+        np.where(ma_slope > 0, 3, 0)
+        + _select([(bias > 0) & (bias <= 5), (bias > 5) & (bias <= 10), (bias < 0) & (ma_slope > 0)], [4, 2, 1], 0)
+    )
+    b_ma = np.minimum(7, np.where(broken, 0, b_ma))
+
+    # === KD (10分) ===
+    k = _col(df, 'K')
+    d = _col(df, 'D')
+    prev_k, prev_d = _shift(k), _shift(d)
+    flags = divergence_flags(df)
+    kd_pos = _select([k < 20, k < 40], [4, 2], 0)
+    golden = (prev_k < prev_d) & (k > d)
+    kd_sig = _select([golden & (k < 20), golden & (k < 50)], [6, 3], 0)
+    kd_pos = np.where(_flag(flags, 'Bull_Div_K'), 10, kd_pos)  # 背離直接滿分
+    b_kd = np.minimum(10, kd_pos + kd_sig)
+
+    # === RSI (10分) ===
+    rsi = _col(df, 'RSI')
+    b_rsi = (
+        _select([rsi < 30, rsi < 50, rsi < 60], [7, 5, 2], 0)
+        + np.where((_shift(rsi) <= 50) & (rsi > 50), 2, 0)
+        + np.where(_flag(flags, 'Bull_Div_RSI'), 3, 0)
+    )
+    b_rsi = np.minimum(10, b_rsi)
+
+    # === MACD (7分) ===
+    osc = _col(df, 'MACD_OSC')
+    prev_osc = _shift(osc)
+    b_macd = (
+        np.where((prev_osc < 0) & (osc > prev_osc), 3, 0)
+        + np.where((prev_osc < 0) & (osc > 0), 2, 0)
+        + np.where(~np.isnan(prev_osc) & _flag(flags, 'Bull_Div_MACD_OSC') & (osc < 0), 2, 0)
+    )
+    b_macd = np.minimum(7, b_macd)
+
+    # === DMI (6分) ===
+    pdi, mdi, adx = _col(df, 'PDI'), _col(df, 'MDI'), _col(df, 'ADX')
+    prev_adx = _shift(adx)
+    adx_rising = adx > prev_adx
+    b_dmi = (
+        2
+        + np.where((_shift(pdi) <= _shift(mdi)), 1, 0)
+        + _select([(adx > 25) & adx_rising, (adx < 25) & adx_rising], [3, 1], 0)
+        - np.where(adx > 50, 1, 0)
+    )
+    b_dmi = np.where(pdi > mdi, np.maximum(0, np.minimum(6, b_dmi)), 0)
+
+    # === BB (5分) ===
+    pct_b = _col(df, 'BB_pctB')
+    mid = _col(df, 'BB_Mid')
+    mid_slope = mid - _shift(mid)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        dist_to_mid = np.abs((close - mid) / mid)
+    b_bb = _select([pct_b < 0, pct_b < 0.1], [3, 2], 0)
+    b_bb = np.where((mid != 0) & (mid_slope > 0) & (dist_to_mid < 0.01), 2, b_bb)
+    b_bb = np.where(np.isnan(pct_b), 0, np.minimum(5, b_bb))
+
+    parts = [b_fibo, b_hist, b_ma, b_kd, b_rsi, b_macd, b_dmi, b_bb]
+    total = np.minimum(100, _sum_in_order(parts))
+    return parts, total
+
+
+def _sell_6669(df):
+    """6669 長線版賣出評分（總分 100）：回傳 (各分項陣列, 總分陣列)"""
+    close = _col(df, 'Close')
+    high = _col(df, 'High')
+
+    # === FIBO 評分 (35分) ===
+    ext1618, ext1272, l618 = (_col(df, c) for c in ['Fibo_ext1618', 'Fibo_ext1272', 'Fibo_l618'])
+    s_fibo = _select(
+        [high >= ext1618, high >= ext1272, close > _col(df, 'Fibo_MaxPrice')],
+        [35, 28, 15],  # 獲利滿足 / 第一壓力 / 解套賣壓
+        0,
+    )
+    s_fibo = np.where(close < l618, 35, s_fibo)  # 停損
+    fibo_ok = _flag(df, 'Fibo_Valid') & ~np.isnan(ext1618)
+    s_fibo = np.where(fibo_ok, s_fibo, 0)
+
+    # === 動態斜率 (20分) - 線性給分 ===
+    s_perc = _col(df, 'Slope_PR')
+    slope = _col(df, 'Slope_60')
+    rank = _select(
+        [s_perc > 90, s_perc > 75, s_perc > 60],
+        [linear_map(s_perc, 90, 100, 10, 15), linear_map(s_perc, 75, 90, 5, 10), linear_map(s_perc, 60, 75, 0, 5)],
+        default=0.0,
+    )
+    momentum = np.where(slope < _shift(slope), 5, 0)
+    s_hist = np.where(rank > 0, rank + momentum, 0.0)
+
+    # === MA 季線 (7分) ===
+    bias = _col(df, 'Bias_60')
+    s_ma = np.where(_col(df, 'MA60_Slope') < 0, 3, 0) + _select([bias > 25, bias > 15], [4, 2], 0)
+    s_ma = np.where(_below_ma_3days(close, _col(df, 'MA60')), np.maximum(s_ma, 3), s_ma)
+    s_ma = np.minimum(7, s_ma)
+
+    # === KD (10分) ===
+    k = _col(df, 'K')
+    d = _col(df, 'D')
+    kd_pos = _select([k > 80, k > 70], [3, 1], 0)
+    death = (_shift(k) > _shift(d)) & (k < d)
+    kd_sig = _select([death & (k > 80), death & (k > 50)], [7, 4], 0)
+    s_kd = np.minimum(10, kd_pos + kd_sig)
+    # 鈍化保護：最近 3 天 K > 80 且 K > D（NaN 不列入判斷），不給分
+    strong = np.isnan(k) | (k > 80)
+    rising = np.isnan(k) | np.isnan(d) | (k > d)
+    blunt = np.zeros(len(k), dtype=bool)
+    blunt[2:] = strong[2:] & strong[1:-1] & strong[:-2] & rising[2:] & rising[1:-1] & rising[:-2]
+    s_kd = np.where(blunt & (k > 80), 0, s_kd)
+
+    # === RSI (10分) ===
+    rsi = _col(df, 'RSI')
+    s_rsi = _select([rsi > 80, rsi > 70, rsi > 60], [7, 5, 2], 0) + np.where((_shift(rsi) >= 50) & (rsi < 50), 2, 0)
+    s_rsi = np.minimum(10, s_rsi)
+
+    # === MACD (7分) ===
+    osc = _col(df, 'MACD_OSC')
+    prev_osc = _shift(osc)
+    s_macd = np.where((prev_osc > 0) & (osc < prev_osc), 3, 0) + np.where((prev_osc > 0) & (osc < 0), 2, 0)
+    s_macd = np.minimum(7, s_macd)
+
+    # === DMI (6分) ===
+    pdi, mdi, adx = _col(df, 'PDI'), _col(df, 'MDI'), _col(df, 'ADX')
+    s_dmi = 2 + np.where((adx > 25) & (adx > _shift(adx)), 3, 0)
+    s_dmi = np.where(mdi > pdi, np.minimum(6, s_dmi), 0)
+
+    # === BB (5分) ===
+    pct_b = _col(df, 'BB_pctB')
+    upper = _col(df, 'BB_Upper')
+    bandwidth = _col(df, 'BB_BandWidth')
+    vol_ma5 = _col(df, 'VolMA5')
+    s_bb = _select([pct_b > 1.1, pct_b > 1.0], [3, 1], 0)
+    s_bb = np.where((high > upper) & (close < upper), 2, s_bb)  # 假突破
+    # 開口爆量保護
+    bw_open = bandwidth > _shift(bandwidth)
+    vol_exp = _col(df, 'Volume') > vol_ma5 * 1.5
+    s_bb = np.where(bw_open & vol_exp & (s_bb > 0), 0, s_bb)
+    s_bb = np.where(np.isnan(pct_b), 0, np.minimum(5, s_bb))
+
+    parts = [s_fibo, s_hist, s_ma, s_kd, s_rsi, s_macd, s_dmi, s_bb]
+    total = np.maximum(0, np.minimum(100, _sum_in_order(parts)))
+    return parts, total
+
+
+def _buy_3231(df):
+    """3231 緯創：短線波段版買入評分（總分 100）：回傳 (各分項陣列, 總分陣列)"""
+    close = _col(df, 'Close')
+    zero = np.zeros(len(close))
+
+    # === FIBO 評分 (5分) - 階梯式給分 ===
+    l500 = _col(df, 'Fibo_l500')
+    b_fibo = _select([close > l500, close > _col(df, 'Fibo_l786')], [0, 3], 5)
+    b_fibo = np.where(_flag(df, 'Fibo_Valid') & ~np.isnan(l500), b_fibo, 0)
+
+    # === MA 月線 (10分) - MA20 ===
+    bias = _col(df, 'Bias_20')
+    b_ma = _select([bias < -6, bias < -3, bias <= 0], [10, 6, 3], 0)
+    b_ma = np.where(np.isnan(_col(df, 'MA20')), 0, np.minimum(10, b_ma))
+
+    # === KD (25分) ===
+    k = _col(df, 'K')
+    d = _col(df, 'D')
+    flags = divergence_flags(df)
+    kd_pos = _select([k < 20, k < 30], [15, 5], 0)
+    kd_sig = np.where((_shift(k) < _shift(d)) & (k > d) & (k < 50), 10, 0)  # 低檔金叉確認
+    b_kd = np.where(_flag(flags, 'Bull_Div_K'), 25, np.minimum(25, kd_pos + kd_sig))  # 背離直接滿分
+    b_kd = np.where(np.isnan(k), 0, b_kd)
+
+    # === RSI (25分) ===
+    rsi = _col(df, 'RSI')
+    rsi_pos = _select([rsi < 30, rsi < 45], [15, 5], 0)
+    b_rsi = np.minimum(25, np.where(_flag(flags, 'Bull_Div_RSI'), 25, rsi_pos))
+
+    # === MACD (5分) ===
+    osc = _col(df, 'MACD_OSC')
+    prev_osc = _shift(osc)
+    gold_cross = np.where((prev_osc < 0) & (osc > 0), 5, 0)
+    red_converge = np.where((osc < 0) & (osc > prev_osc), 3, 0)
+    b_macd = np.minimum(5, np.maximum(gold_cross, red_converge))
+
+    # === BB (30分) - 線性給分 ===
+    pct_b = _col(df, 'BB_pctB')
+    b_bb = _select(
+        [pct_b < 0, pct_b < 0.1, pct_b < 0.3],
+        [30, linear_map(pct_b, 0, 0.1, 30, 25), linear_map(pct_b, 0.1, 0.3, 25, 10)],
+        default=0.0,
+    )
+    b_bb = np.minimum(30, np.maximum(0, b_bb))
+
+    # 動態斜率與 DMI 不列入 3231 評分
+    parts = [b_fibo, zero, b_ma, b_kd, b_rsi, b_macd, zero, b_bb]
+    total = np.minimum(100, _sum_in_order(parts))
+    return parts, total
+
+
+def _sell_3231(df):
+    """3231 緯創：短線波段版賣出評分（總分 100）：回傳 (各分項陣列, 總分陣列)"""
+    close = _col(df, 'Close')
+    high = _col(df, 'High')
+    zero = np.zeros(len(close))
+
+    # === FIBO 評分 (5分) - 階梯式給分 ===
+    ext1272 = _col(df, 'Fibo_ext1272')
+    s_fibo = _select([high >= ext1272, high >= _col(df, 'Fibo_MaxPrice')], [5, 3], 0)
+    s_fibo = np.where(_flag(df, 'Fibo_Valid') & ~np.isnan(ext1272), s_fibo, 0)
+
+    # === MA 月線 (10分) - MA20 ===
+    ma20 = _col(df, 'MA20')
+    bias = _col(df, 'Bias_20')
+    bias_score = _select([bias > 8, bias > 4], [10, 6], 0)
+    broken_score = np.where(close < ma20, 3, 0)  # 跌破月線（停利/停損）
+    s_ma = np.maximum(bias_score, broken_score)
+    s_ma = np.where(np.isnan(ma20) | np.isnan(bias), 0, np.minimum(10, s_ma))
+
+    # === KD (25分) - 不等待死叉，也不設鈍化保護 ===
+    k = _col(df, 'K')
+    s_kd = np.minimum(25, _select([k > 80, k > 70], [25, 15], 0))
+
+    # === RSI (25分) ===
+    rsi = _col(df, 'RSI')
+    rsi_pos = _select([rsi > 75, rsi > 60], [25, 10], 0)
+    s_rsi = np.minimum(25, np.where(_flag(divergence_flags(df), 'Bear_Div_RSI'), 25, rsi_pos))  # 頂背離
+
+    # === MACD (5分) ===
+    osc = _col(df, 'MACD_OSC')
+    prev_osc = _shift(osc)
+    death_cross = np.where((prev_osc > 0) & (osc < 0), 5, 0)
+    green_converge = np.where((osc > 0) & (osc < prev_osc), 3, 0)
+    s_macd = np.minimum(5, np.maximum(death_cross, green_converge))
+
+    # === BB (30分) - 線性給分 ===
+    pct_b = _col(df, 'BB_pctB')
+    upper = _col(df, 'BB_Upper')
+    s_bb = _select([pct_b > 1.0, pct_b > 0.9], [30, linear_map(pct_b, 0.9, 1.0, 25, 30)], default=0.0)
+    s_bb = np.where((high > upper) & (close < upper), np.maximum(s_bb, 20), s_bb)  # 假突破至少 20 分
+    s_bb = np.where(np.isnan(pct_b), 0, np.minimum(30, np.maximum(0, s_bb)))
+
+    # 動態斜率與 DMI 不列入 3231 評分
+    parts = [s_fibo, zero, s_ma, s_kd, s_rsi, s_macd, zero, s_bb]
+    total = np.maximum(0, np.minimum(100, _sum_in_order(parts)))
+    return parts, total
+
+
+def buy_score_6669(df):
+    """6669 長線版買入評分：回傳各分項 (Buy_FIBO ...) 與 Buy_Score 的 DataFrame"""
+    return _frame(df, BUY_COMPONENTS, *_buy_6669(df), 'Buy_Score')
+
+
+def sell_score_6669(df):
+    """6669 長線版賣出評分：回傳各分項 (Sell_FIBO ...) 與 Sell_Score 的 DataFrame"""
+    return _frame(df, SELL_COMPONENTS, *_sell_6669(df), 'Sell_Score')
+
+
+def buy_score_3231(df):
+    """3231 短線波段版買入評分：回傳各分項與 Buy_Score 的 DataFrame"""
+    return _frame(df, BUY_COMPONENTS, *_buy_3231(df), 'Buy_Score')
+
+
+def sell_score_3231(df):
+    """3231 短線波段版賣出評分：回傳各分項與 Sell_Score 的 DataFrame"""
+    return _frame(df, SELL_COMPONENTS, *_sell_3231(df), 'Sell_Score')
+
+
+# 評分函數 -> 讀取的欄位（背離旗標另見 divergence.divergence_flag_names）
+SCORE_INPUTS = {
+    buy_score_6669: ('Open', 'Low', 'Close', 'Volume', 'Fibo_l236', 'Fibo_l382', 'Fibo_l500', 'Fibo_l618',
+                     'Fibo_MaxPrice', 'Fibo_Valid', 'VolMA5', 'ATR', 'Slope_60', 'Slope_PR', 'MA60', 'MA60_Slope',
+                     'Bias_60', 'K', 'D', 'RSI', 'MACD_OSC', 'PDI', 'MDI', 'ADX', 'BB_Mid', 'BB_pctB'),
+    sell_score_6669: ('High', 'Close', 'Volume', 'Fibo_l618', 'Fibo_ext1272', 'Fibo_ext1618', 'Fibo_MaxPrice',
+                      'Fibo_Valid', 'VolMA5', 'Slope_60', 'Slope_PR', 'MA60', 'MA60_Slope', 'Bias_60', 'K', 'D',
+                      'RSI', 'MACD_OSC', 'PDI', 'MDI', 'ADX', 'BB_Upper', 'BB_pctB', 'BB_BandWidth'),
+    buy_score_3231: ('Close', 'Fibo_l500', 'Fibo_l786', 'Fibo_Valid', 'MA20', 'Bias_20', 'K', 'D', 'RSI',
+                     'MACD_OSC', 'BB_pctB'),
+    sell_score_3231: ('High', 'Close', 'Fibo_ext1272', 'Fibo_MaxPrice', 'Fibo_Valid', 'MA20', 'Bias_20', 'K', 'RSI',
+                      'MACD_OSC', 'BB_Upper', 'BB_pctB'),
+}
+
+# 評分函數 -> 只回傳陣列的核心計算（不建 DataFrame），供逐筆更新等低延遲場合使用
+SCORE_KERNELS = {
+    buy_score_6669: _buy_6669,
+    sell_score_6669: _sell_6669,
+    buy_score_3231: _buy_3231,
+    sell_score_3231: _sell_3231,
+}
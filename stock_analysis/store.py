@@ -0,0 +1,329 @@
+"""評分存放區：依代號 / 年份分區儲存評分，並預先建立門檻穿越事件索引
+
+目錄結構：
+    <root>/manifest.json                  各檔的策略、根數、起訖日、年份與最新評分；全體交易日曆與每日檔數
+    <root>/scores/<代號>/<年>.parquet      Date、Close、Buy_Score、Sell_Score 與各分項分數
+    <root>/events.parquet                 全部股票的門檻穿越事件
+
+事件在寫入時計算：門檻為該檔策略的 buy_tiers / sell_tiers 加上 EVENT_THRESHOLDS，
+分數由「<= 門檻」變成「> 門檻」為向上穿越 (Direction=1)，反之為向下穿越 (-1)。
+建議級別以 action_levels 判斷（與買賣建議相同），級別改變的那一根在新級別的邊界門檻
+（向上為該級門檻，向下為上一級門檻）那筆事件記下 Tier，因此從高一級跌入的較低級別與
+預設級別（觀望 / 續抱）也算進入；其餘事件的 Tier 為空字串。查詢只讀事件索引（第一次
+查詢後留在記憶體）並以陣列遮罩篩選，不重算評分也不讀分區檔：
+
+    store = ScoreStore('scores')
+    store.put('6669.TW', run_profile(df, profile), profile)
+    store.crossed('buy', 60, days=5)                    # 最近 5 個交易日買入評分突破 60 的股票
+    store.tier_entries('6669.TW', 'sell', '清倉賣出')     # 6669 每次進入清倉賣出的日期
+
+    python -m stock_analysis events --store scores --side buy --threshold 60 --days 5
+    python -m stock_analysis events 6669.TW --side sell --tier 清倉賣出   # 指定 --tier 時預設列出兩個方向
+
+同一個目錄一次只應由一個進程寫入（run_universe 的結果請在主進程依序 put）。
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from .backtest import action_levels
+from .profiles import BUY_DEFAULT_TIER, SELL_DEFAULT_TIER
+from .scoring import BUY_COMPONENTS, SELL_COMPONENTS
+
+STORE_VERSION = 2
+MANIFEST_NAME = 'manifest.json'
+EVENTS_NAME = 'events.parquet'
+
+# 策略門檻之外，每檔都額外記錄的穿越門檻
+EVENT_THRESHOLDS = {'buy': (50, 60), 'sell': (55, 60)}
+SIDE_COLUMNS = {'buy': 'Buy_Score', 'sell': 'Sell_Score'}
+DEFAULT_TIERS = {'buy': BUY_DEFAULT_TIER, 'sell': SELL_DEFAULT_TIER}
+STORE_COLUMNS = ['Close', 'Buy_Score', 'Sell_Score'] + BUY_COMPONENTS + SELL_COMPONENTS
+EVENT_COLUMNS = ['Ticker', 'Date', 'Side', 'Threshold', 'Direction', 'Tier', 'Score']
+# 以類別 (dictionary) 編碼儲存與查詢的事件欄位
+EVENT_CATEGORIES = ('Ticker', 'Side', 'Tier')
+
+
+def event_thresholds(profile, extra=EVENT_THRESHOLDS):
+    """{'buy' / 'sell': [(門檻, 級別名稱)]}：策略的買賣建議門檻加上 extra（名稱為空字串）"""
+    out = {}
+    for side, tiers in (('buy', profile.buy_tiers), ('sell', profile.sell_tiers)):
+        names = {float(threshold): name for threshold, name in tiers}
+        for threshold in extra.get(side, ()):
+            names.setdefault(float(threshold), '')
+        out[side] = sorted(names.items())
+    return out
+
+
+def crossing_events(ticker, scores, thresholds, prev=None):
+    """門檻穿越事件（DataFrame，欄位見 EVENT_COLUMNS）
+
+    scores 為含 Buy_Score / Sell_Score、以日期為 index 的 DataFrame；prev 為前一根的
+    {'buy': 分數, 'sell': 分數}（接續既有資料時使用，None 表示序列從頭開始）。NaN 視為未超過。
+    thresholds 中名稱不為空的門檻是建議級別，Tier 記在級別改變時新級別的邊界門檻那筆事件。
+    """
+    parts = []
+    for side, levels in thresholds.items():
+        values = scores[SIDE_COLUMNS[side]].to_numpy(dtype=float)
+        before = np.nan if prev is None else prev.get(side, np.nan)
+        shifted = np.concatenate([[before], values[:-1]])
+        # 建議級別：action_levels 的門檻由高到低，等級 k 的名稱為 names[k]、門檻為 edges[k]
+        tiers = [(threshold, name) for threshold, name in reversed(levels) if name]
+        names = np.array([DEFAULT_TIERS[side]] + [name for _, name in reversed(tiers)], dtype=object)
+        edges = np.array([np.nan] + [threshold for threshold, _ in reversed(tiers)] + [np.nan])
+        level = action_levels(values, tiers)
+        was_level = action_levels(shifted, tiers)
+        boundary = np.where(level > was_level, edges[level], edges[np.minimum(level + 1, len(edges) - 1)])
+        for threshold, _ in levels:
+            above = values > threshold
+            was_above = shifted > threshold
+            at = np.flatnonzero(above != was_above)
+            if not len(at):
+                continue
+            entered = (level[at] != was_level[at]) & (boundary[at] == threshold)
+            parts.append(pd.DataFrame({
+                'Date': scores.index[at],
+                'Side': side,
+                'Threshold': threshold,
+                'Direction': np.where(above[at], 1, -1).astype(np.int8),
+                'Tier': np.where(entered, names[level[at]], ''),
+                'Score': values[at],
+            }))
+    if not parts:
+        return pd.DataFrame({c: pd.Series(dtype=t) for c, t in zip(
+            EVENT_COLUMNS, (object, 'datetime64[ns]', object, float, np.int8, object, float))})
+    events = pd.concat(parts, ignore_index=True)
+    events.insert(0, 'Ticker', ticker)
+    return events.sort_values(['Date', 'Side', 'Threshold'], kind='stable', ignore_index=True)
+
+
+def _write_parquet(df, path):
+    """先寫暫存檔再取代（同 OHLCVStore.write）"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def _day_numbers(index):
+    return (pd.DatetimeIndex(index).values.astype('datetime64[D]').astype(np.int64)).tolist()
+
+
+class ScoreStore:
+    """依代號 / 年份分區的評分存放區與事件索引（格式見模組說明）"""
+
+    def __init__(self, root, thresholds=EVENT_THRESHOLDS):
+        self.root = root
+        self.thresholds = thresholds
+        self._manifest = None
+        self._events = None
+
+    # --- 分區與清單 ---
+
+    def partition_path(self, ticker, year):
+        return os.path.join(self.root, 'scores', ticker.upper().replace('/', '_'), f'{year}.parquet')
+
+    @property
+    def manifest(self):
+        if self._manifest is None:
+            path = os.path.join(self.root, MANIFEST_NAME)
+            if os.path.exists(path):
+                with open(path, encoding='utf-8') as f:
+                    self._manifest = json.load(f)
+                if self._manifest.get('version') != STORE_VERSION:
+                    raise ValueError(f"評分存放區版本 {self._manifest.get('version')} 與程式 ({STORE_VERSION}) 不符")
+            else:
+                self._manifest = {'version': STORE_VERSION, 'tickers': {}, 'calendar': [], 'calendar_counts': []}
+        return self._manifest
+
+    def _write_manifest(self):
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, MANIFEST_NAME)
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def tickers(self):
+        return sorted(self.manifest['tickers'])
+
+    def calendar(self):
+        """目前存放的所有股票的交易日聯集 (DatetimeIndex)"""
+        days = np.asarray(self.manifest['calendar'], dtype='datetime64[D]')
+        return pd.DatetimeIndex(days.astype('datetime64[ns]'), name='Date')
+
+    def latest(self):
+        """每檔最新一根的日期與買賣評分（只讀 manifest）"""
+        rows = {t: {'Profile': m['profile'], 'Date': pd.Timestamp(m['last']), 'Buy_Score': m['last_buy'],
+                    'Sell_Score': m['last_sell']} for t, m in self.manifest['tickers'].items()}
+        latest = pd.DataFrame.from_dict(rows, orient='index')
+        latest.index.name = 'Ticker'
+        return latest
+
+    def read(self, ticker, start=None, end=None, columns=None):
+        """讀取 [start, end) 的評分，只開啟涵蓋該區間的年份分區"""
+        meta = self.manifest['tickers'].get(ticker)
+        if meta is None:
+            raise KeyError(f"評分存放區沒有 {ticker}")
+        years = [y for y in meta['years']
+                 if (start is None or y >= pd.Timestamp(start).year) and (end is None or y <= pd.Timestamp(end).year)]
+        read_columns = None if columns is None else ['Date'] + [c for c in columns if c != 'Date']
+        frames = [pd.read_parquet(self.partition_path(ticker, y), columns=read_columns) for y in years]
+        if not frames:
+            return pd.DataFrame(columns=columns or STORE_COLUMNS, index=pd.DatetimeIndex([], name='Date'))
+        df = pd.concat(frames, ignore_index=True).set_index('Date')
+        mask = np.ones(len(df), dtype=bool)
+        if start is not None:
+            mask &= df.index >= pd.Timestamp(start)
+        if end is not None:
+            mask &= df.index < pd.Timestamp(end)
+        return df[mask]
+
+    # --- 寫入 ---
+
+    def put(self, ticker, scored, profile):
+        """寫入 run_profile 的結果：取代 scored 第一天以後的既有資料，之前的保留
+
+        只重寫受影響的年份分區，並重建該檔在事件索引中從第一天起的事件
+        （第一天是否穿越以既有的前一根為準）。
+        """
+        self.put_many([(ticker, scored, profile)])
+
+    def put_many(self, items):
+        """依序寫入多檔 (代號, run_profile 結果, 策略)；事件索引與 manifest 最後只寫一次"""
+        updates = [update for ticker, scored, profile in items
+                   if (update := self._put_partitions(ticker, scored, profile)) is not None]
+        if not updates:
+            return
+        events = self.load_events()
+        keep = np.ones(len(events), dtype=bool)
+        for ticker, first, _ in updates:
+            keep &= ~((events['Ticker'] == ticker).to_numpy() & (events['Date'] >= first).to_numpy())
+        parts = [events[keep]] + [fresh for _, _, fresh in updates if len(fresh)]
+        events = pd.concat(parts, ignore_index=True).astype({c: object for c in EVENT_CATEGORIES})
+        events = events.sort_values(['Date', 'Ticker'], kind='stable', ignore_index=True)
+        events = events.astype({c: 'category' for c in EVENT_CATEGORIES})
+        _write_parquet(events, os.path.join(self.root, EVENTS_NAME))
+        self._write_manifest()
+        self._set_events(events)
+
+    def _put_partitions(self, ticker, scored, profile):
+        """寫入單檔的年份分區並更新 manifest（尚未寫檔），回傳 (代號, 第一天, 新事件)"""
+        scored = scored[[c for c in STORE_COLUMNS if c in scored.columns]]
+        if scored.empty:
+            return None
+        meta = self.manifest['tickers'].get(ticker)
+        first = scored.index[0]
+        kept, prev, replaced = pd.DataFrame(), None, pd.DatetimeIndex([])
+        if meta is not None:
+            replaced = self.read(ticker, start=first, columns=['Buy_Score']).index
+            kept = self.read(ticker, start=pd.Timestamp(first.year, 1, 1), end=first)
+            before = kept if len(kept) else self._last_year_before(ticker, meta, first.year)
+            if len(before):
+                prev = {side: before[col].iloc[-1] for side, col in SIDE_COLUMNS.items()}
+
+        merged = pd.concat([kept, scored]) if len(kept) else scored
+        merged.index.name = 'Date'
+        new_years = sorted(set(merged.index.year))
+        for year, part in merged.groupby(merged.index.year):
+            _write_parquet(part.reset_index(), self.partition_path(ticker, year))
+        old_years = [] if meta is None else meta['years']
+        for year in old_years:
+            if year > first.year and year not in new_years:
+                os.remove(self.partition_path(ticker, year))
+
+        self.manifest['tickers'][ticker] = {
+            'profile': profile.name,
+            'rows': (0 if meta is None else meta['rows'] - len(replaced)) + len(scored),
+            'first': min(first, pd.Timestamp(meta['first'])).strftime('%Y-%m-%d') if meta else f'{first:%Y-%m-%d}',
+            'last': f'{scored.index[-1]:%Y-%m-%d}',
+            'years': sorted({y for y in old_years if y < first.year} | set(new_years)),
+            'last_buy': float(scored['Buy_Score'].iloc[-1]),
+            'last_sell': float(scored['Sell_Score'].iloc[-1]),
+        }
+        self._recount_calendar(_day_numbers(replaced), _day_numbers(scored.index))
+        return ticker, first, crossing_events(ticker, scored, event_thresholds(profile, self.thresholds), prev)
+
+    def _recount_calendar(self, removed, added):
+        """日曆記錄每天有幾檔資料：扣掉被取代的日期、加上新日期，沒有任何一檔的日期移出日曆"""
+        days = np.asarray(self.manifest['calendar'], dtype=np.int64)
+        merged = np.union1d(days, np.asarray(added, dtype=np.int64))
+        counts = np.zeros(len(merged), dtype=np.int64)
+        counts[np.searchsorted(merged, days)] = self.manifest['calendar_counts']
+        np.add.at(counts, np.searchsorted(merged, added), 1)
+        np.subtract.at(counts, np.searchsorted(merged, removed), 1)
+        keep = counts > 0
+        self.manifest['calendar'] = merged[keep].tolist()
+        self.manifest['calendar_counts'] = counts[keep].tolist()
+
+    def _last_year_before(self, ticker, meta, year):
+        """year 之前最後一個年份分區（沒有時為空 DataFrame）"""
+        years = [y for y in meta['years'] if y < year]
+        if not years:
+            return pd.DataFrame()
+        return pd.read_parquet(self.partition_path(ticker, max(years)), columns=list(SIDE_COLUMNS.values()))
+
+    # --- 事件查詢 ---
+
+    def load_events(self):
+        """事件索引 (DataFrame)，依日期排序；第一次呼叫時讀檔，之後留在記憶體"""
+        if self._events is None:
+            path = os.path.join(self.root, EVENTS_NAME)
+            if os.path.exists(path):
+                events = pd.read_parquet(path)
+            else:
+                events = crossing_events('', pd.DataFrame({'Buy_Score': [], 'Sell_Score': []},
+                                                          index=pd.DatetimeIndex([])), {})
+            self._set_events(events.astype({c: 'category' for c in EVENT_CATEGORIES}))
+        return self._events
+
+    def _set_events(self, events):
+        """查詢用的陣列：日期（已排序，以二分搜尋切出區間）、數值欄位與類別欄位的整數代碼"""
+        self._events = events
+        self._arrays = {
+            'Date': events['Date'].to_numpy(dtype='datetime64[ns]'),
+            'Threshold': events['Threshold'].to_numpy(dtype=float),
+            'Direction': events['Direction'].to_numpy(),
+        }
+        self._codes = {c: (events[c].cat.categories, events[c].cat.codes.to_numpy()) for c in EVENT_CATEGORIES}
+
+    def _match(self, column, values, lo, hi):
+        categories, codes = self._codes[column]
+        wanted = categories.get_indexer([values] if isinstance(values, str) else list(values))
+        wanted = wanted[wanted >= 0]
+        if len(wanted) == 1:
+            return codes[lo:hi] == wanted[0]
+        return np.isin(codes[lo:hi], wanted)
+
+    def events(self, side=None, threshold=None, direction=1, tickers=None, start=None, end=None, tier=None):
+        """篩選事件：side 'buy' / 'sell'；direction 1 向上、-1 向下、None 兩者；[start, end) 為日期區間"""
+        events = self.load_events()
+        a = self._arrays
+        lo = 0 if start is None else np.searchsorted(a['Date'], np.datetime64(pd.Timestamp(start), 'ns'), 'left')
+        hi = len(events) if end is None else np.searchsorted(a['Date'], np.datetime64(pd.Timestamp(end), 'ns'), 'left')
+        mask = np.ones(hi - lo, dtype=bool)
+        if side is not None:
+            mask &= self._match('Side', side, lo, hi)
+        if threshold is not None:
+            mask &= a['Threshold'][lo:hi] == float(threshold)
+        if direction is not None:
+            mask &= a['Direction'][lo:hi] == direction
+        if tier is not None:
+            mask &= self._match('Tier', tier, lo, hi)
+        if tickers is not None:
+            mask &= self._match('Ticker', tickers, lo, hi)
+        return events.iloc[lo + np.flatnonzero(mask)].reset_index(drop=True)
+
+    def crossed(self, side, threshold=None, days=5, direction=1, tickers=None, tier=None):
+        """最近 days 個交易日（全體日曆）內穿越門檻的事件"""
+        calendar = self.manifest['calendar']
+        if not calendar:
+            return self.load_events().iloc[:0]
+        start = pd.Timestamp(np.datetime64(calendar[-min(days, len(calendar))], 'D'))
+        return self.events(side, threshold, direction, tickers, start=start, tier=tier)
+
+    def tier_entries(self, ticker, side, tier):
+        """ticker 每次進入某一級建議（例如 'sell', '清倉賣出'）的日期，含從較高級別跌入"""
+        return pd.DatetimeIndex(self.events(side, direction=None, tickers=ticker, tier=tier)['Date'], name='Date')
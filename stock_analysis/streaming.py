@@ -0,0 +1,577 @@
+"""逐筆串流評分：每收到一根新 K 棒只更新各指標的狀態，不重算整段歷史
+
+每個指標階段對應一個狀態物件，保留該指標所需的最短歷史（固定長度視窗）
+或遞迴狀態（EWM / Wilder 平滑）。評分只需最近 3 根 K 棒的指標值，
+直接呼叫 scoring.SCORE_KERNELS 的陣列核心計算，不建立 DataFrame。
+
+每一欄都與批次路徑 (pipeline.run_profile) 逐位元相同：滾動平均 / 標準差以
+rolling.RollingMeanState / RollingVarState 重現 pandas 的逐筆運算（每筆 O(1)），斜率與
+rolling.rolling_linregress_arrays 使用相同的區塊累積和，排名的同值處理也與批次相同。
+可用 `python -m stock_analysis.bench --streaming` 逐欄比對並量測每筆更新的時間。
+"""
+import bisect
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from .divergence import DIVERGENCE_LAG, DIVERGENCE_LENGTH, DIVERGENCE_OSCILLATORS, divergence_flag_names
+from .data import OHLCV_COLUMNS
+from .pipeline import resolve_stages
+from .rolling import ROLLING_BLOCK, RollingMeanState, RollingVarState
+from .scoring import BUY_COMPONENTS, SCORE_INPUTS, SCORE_KERNELS, SELL_COMPONENTS, component_scales, weighted_total
+
+# 評分核心用到的最長回溯（_shift 與「連續 3 天」判斷）
+SCORE_LOOKBACK = 3
+
+
+class RingBuffer:
+    """固定長度的滑動視窗，view() 回傳最近 size 筆的連續陣列（不複製）
+
+    底層配置 2 倍長度，寫滿時才把最後 size-1 筆搬回開頭，攤提後每筆 O(1)。
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.data = np.full(2 * size, np.nan)
+        self.end = 0
+        self.count = 0
+
+    def append(self, value):
+        if self.end == len(self.data):
+            keep = self.size - 1
+            self.data[:keep] = self.data[self.end - keep:self.end]
+            self.end = keep
+        self.data[self.end] = value
+        self.end += 1
+        self.count += 1
+
+    @property
+    def full(self):
+        return self.count >= self.size
+
+    def view(self, last=None):
+        """最近 last 筆（預設 size 筆；資料不足時回傳全部）"""
+        n = min(self.size if last is None else last, self.count, self.end)
+        return self.data[self.end - n:self.end]
+
+
+class RollingExtreme:
+    """滾動最小 / 最大值（忽略 NaN）：單調佇列，每筆攤提 O(1)；視窗內沒有有效值時為 NaN"""
+
+    def __init__(self, window, how):
+        self.window = window
+        self.is_min = how == 'min'
+        self.queue = deque()
+        self.count = 0
+
+    def update(self, value):
+        queue = self.queue
+        if value == value:
+            if self.is_min:
+                while queue and value <= queue[-1][1]:
+                    queue.pop()
+            else:
+                while queue and value >= queue[-1][1]:
+                    queue.pop()
+            queue.append((self.count, value))
+        self.count += 1
+        while queue and queue[0][0] <= self.count - 1 - self.window:
+            queue.popleft()
+        return queue[0][1] if queue else np.nan
+
+
+def _ewm_step(prev, value, alpha):
+    """EWM(adjust=False) 的單步遞迴，運算順序與 pandas 相同"""
+    if prev != prev:
+        return value
+    if value != value or prev == value:
+        return prev
+    return ((1 - alpha) * prev + alpha * value) / ((1 - alpha) + alpha)
+
+
+# --- 各指標階段的串流狀態：update(row) 讀取 row 已有的欄位並寫入新欄位 ---
+
+class _StreamSlope:
+    """A. 動態斜率 (60日)：與 rolling.rolling_linregress_arrays 相同的區塊累積和，逐位元相同
+
+    視窗起點所在區塊 (rolling.ROLLING_BLOCK) 以首值 ref 中心化，Σd、Σjd 取區塊內累積和之差；
+    每個仍可能被視窗起點用到的區塊各自累加，最多 ceil((window - 1) / block) + 1 個。
+    """
+
+    def __init__(self, window=60, block=ROLLING_BLOCK):
+        self.window = window
+        self.block = block
+        self.center = (block + window - 2) / 2  # 區塊內位置 j 的中心 (span - 1) / 2
+        self.sxx = window * (window * window - 1) / 12.0
+        self.blocks = {}
+        self.count = 0
+
+    def update(self, row):
+        value = row['Close']
+        t = self.count
+        self.count += 1
+        valid = value == value
+        if t % self.block == 0:
+            self.blocks[t] = (value if valid else 0.0, [0.0], [0.0], [0])
+        for base, (ref, csum, cjd, cvalid) in self.blocks.items():
+            d = value - ref if valid else 0.0
+            csum.append(csum[-1] + d)
+            cjd.append(cjd[-1] + ((t - base) - self.center) * d)
+            cvalid.append(cvalid[-1] + valid)
+
+        slope = np.nan
+        start = t - self.window + 1
+        if start >= 0:
+            base = start - start % self.block
+            for key in [k for k in self.blocks if k < base]:
+                del self.blocks[key]
+            ref, csum, cjd, cvalid = self.blocks[base]
+            lo = start - base
+            # 累積和前面補了一個 0：區塊內第 k 根的累積和在 [k + 1]
+            sy, sjd = csum[-1], cjd[-1]
+            if lo:
+                sy -= csum[lo]
+                sjd -= cjd[lo]
+            if cvalid[-1] - cvalid[lo] == self.window:
+                j_mid = (lo - self.center) + (self.window - 1) / 2
+                slope = (sjd - j_mid * sy) / self.sxx
+        row['Slope_60'] = slope
+
+
+class _StreamSlopePR:
+    """A. 斜率 PR 值：維持視窗內的排序清單，二分搜尋取得平均排名"""
+
+    def __init__(self, window=252):
+        self.window = window
+        self.values = deque()
+        self.ordered = []
+        self.nan_count = 0
+
+    def update(self, row):
+        value = row['Slope_60']
+        self.values.append(value)
+        if np.isnan(value):
+            self.nan_count += 1
+        else:
+            bisect.insort(self.ordered, value)
+        if len(self.values) > self.window:
+            old = self.values.popleft()
+            if np.isnan(old):
+                self.nan_count -= 1
+            else:
+                del self.ordered[bisect.bisect_left(self.ordered, old)]
+
+        pr = np.nan
+        if len(self.values) == self.window and self.nan_count == 0:
+            lo = bisect.bisect_left(self.ordered, value)
+            hi = bisect.bisect_right(self.ordered, value)
+            pr = (lo + (hi - lo + 1) / 2) / self.window * 100
+        row['Slope_PR'] = pr
+
+
+class _StreamSlopePRExpanding:
+    """A. 斜率 PR 值（擴張視窗，同 src/App.jsx）：第 start 根起的排序清單，嚴格小於當日的比例
+
+    同值不計入（bisect_left），與 rolling.expanding_percentile_rank_arrays 相同；斜率與批次
+    逐位元相同，同值的判斷因此也一致。
+    """
+
+    def __init__(self, start=60):
+        self.start = start
+        self.seen = 0
+        self.ordered = []
+
+    def update(self, row):
+        value = row['Slope_60']
+        self.seen += 1
+        pr = np.nan
+        if self.seen > self.start and not np.isnan(value):
+            bisect.insort(self.ordered, value)
+            pr = bisect.bisect_left(self.ordered, value) / len(self.ordered) * 100
+        row['Slope_PR'] = pr
+
+
+class _StreamMA:
+    """B. 均線、均線斜率與乖離率"""
+
+    def __init__(self, window):
+        self.window = window
+        self.mean = RollingMeanState(window)
+        self.prev = np.nan
+
+    def update(self, row):
+        ma = self.mean.update(row['Close'])
+        row[f'MA{self.window}'] = ma
+        row[f'MA{self.window}_Slope'] = ma - self.prev
+        row[f'Bias_{self.window}'] = (row['Close'] - ma) / ma * 100
+        self.prev = ma
+
+
+class _StreamRSI:
+    """D. RSI (14)：漲跌幅的 EWM (alpha=1/14)，與 ta.RSIIndicator 相同"""
+
+    def __init__(self, window=14):
+        self.window = window
+        self.alpha = 1 / window
+        self.prev_close = np.nan
+        self.up = self.down = np.nan
+        self.count = 0
+
+    def update(self, row):
+        diff = row['Close'] - self.prev_close
+        self.up = _ewm_step(self.up, diff if diff > 0 else 0.0, self.alpha)
+        self.down = _ewm_step(self.down, -diff if diff < 0 else 0.0, self.alpha)
+        self.prev_close = row['Close']
+        self.count += 1
+
+        rsi = np.nan
+        if self.count >= self.window:
+            rsi = 100.0 if self.down == 0 else 100 - 100 / (1 + self.up / self.down)
+        row['RSI'] = rsi
+
+
+class _StreamKD:
+    """D. KD (9, 3)：與 ta.StochasticOscillator 相同"""
+
+    def __init__(self, window=9, smooth_window=3):
+        self.window = window
+        self.highest = RollingExtreme(window, 'max')
+        self.lowest = RollingExtreme(window, 'min')
+        self.d = RollingMeanState(smooth_window)
+
+    def update(self, row):
+        high = self.highest.update(row['High'])
+        low = self.lowest.update(row['Low'])
+        k = np.nan
+        if self.highest.count >= self.window:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                k = float(100 * np.float64(row['Close'] - low) / (high - low))
+        row['K'] = k
+        row['D'] = self.d.update(k)
+
+
+class _StreamMACD:
+    """E. MACD (12, 26, 9)：EWM(adjust=False) 的遞迴狀態"""
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.alphas = (2 / (fast + 1), 2 / (slow + 1), 2 / (signal + 1))
+        self.ema12 = self.ema26 = self.dem = np.nan
+
+    def update(self, row):
+        a12, a26, a9 = self.alphas
+        self.ema12 = _ewm_step(self.ema12, row['Close'], a12)
+        self.ema26 = _ewm_step(self.ema26, row['Close'], a26)
+        dif = self.ema12 - self.ema26
+        self.dem = _ewm_step(self.dem, dif, a9)
+        row.update(EMA12=self.ema12, EMA26=self.ema26, MACD_DIF=dif, MACD_DEM=self.dem, MACD_OSC=dif - self.dem)
+
+
+class _StreamDMI:
+    """F. DMI (14日)：平滑遞迴的運算順序與 indicators.smooth_dmi 相同"""
+
+    def __init__(self, period=14):
+        self.period = period
+        self.prev = None
+        self.smooth = {}
+
+    def _smooth(self, key, value):
+        prev = self.smooth.get(key)
+        self.smooth[key] = value if prev is None else (prev * (self.period - 1) + value) / self.period
+        return self.smooth[key]
+
+    def update(self, row):
+        high, low = row['High'], row['Low']
+        if self.prev is None:
+            tr = pdm = mdm = 0.0
+        else:
+            prev_high, prev_low, prev_close = self.prev
+            tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
+            move_up = high - prev_high
+            move_down = prev_low - low
+            pdm = move_up if move_up > move_down and move_up > 0 else 0.0
+            mdm = move_down if move_down > move_up and move_down > 0 else 0.0
+        self.prev = (high, low, row['Close'])
+
+        str_smooth = self._smooth('tr', tr)
+        denom = str_smooth if str_smooth != 0 else 1
+        pdi = 100 * self._smooth('pdm', pdm) / denom
+        mdi = 100 * self._smooth('mdm', mdm) / denom
+        di_sum = pdi + mdi
+        dx = 100 * abs(pdi - mdi) / (di_sum if di_sum != 0 else 1)
+        row.update(PDI=pdi, MDI=mdi, ADX=self._smooth('dx', dx))
+
+
+class _StreamBB:
+    """G. Bollinger Bands (20日, 2倍標準差)"""
+
+    def __init__(self, window=20):
+        self.mean = RollingMeanState(window)
+        self.std = RollingVarState(window, std=True)
+
+    def update(self, row):
+        mid = self.mean.update(row['Close'])
+        std = self.std.update(row['Close'])
+        upper = mid + 2 * std
+        lower = mid - 2 * std
+        row.update(
+            BB_Mid=mid,
+            BB_Std=std,
+            BB_Upper=upper,
+            BB_Lower=lower,
+            BB_pctB=(row['Close'] - lower) / (upper - lower + 1e-10),
+            BB_BandWidth=(upper - lower) / (mid + 1e-10),
+        )
+
+
+class _StreamVolume:
+    """H. Volume MA"""
+
+    def __init__(self):
+        self.ma5 = RollingMeanState(5)
+        self.ma20 = RollingMeanState(20)
+
+    def update(self, row):
+        row['VolMA5'] = self.ma5.update(row['Volume'])
+        row['VolMA20'] = self.ma20.update(row['Volume'])
+
+
+class _StreamATR:
+    """I. ATR (14日) 相容模式：最近 period-1 個 TR 的加權和，權重同 indicators.atr"""
+
+    def __init__(self, period=14):
+        self.period = period
+        taps = period - 1
+        alpha = 1 / period
+        weights = alpha * (1 - alpha) ** np.arange(taps - 1, -1, -1)
+        weights[0] = (1 - alpha) ** (taps - 1)
+        self.weights = weights.tolist()
+        self.trs = RingBuffer(taps)
+        self.prev_close = None
+        self.count = 0
+
+    def update(self, row):
+        if self.prev_close is not None:
+            self.trs.append(max(row['High'] - row['Low'], abs(row['High'] - self.prev_close),
+                                abs(row['Low'] - self.prev_close)))
+        self.prev_close = row['Close']
+        self.count += 1
+        atr = np.nan
+        if self.count > self.period:
+            # 依序累加（與批次路徑對跨步視窗做矩陣乘法的累加順序相同）
+            atr = 0.0
+            for tr, weight in zip(self.trs.view().tolist(), self.weights):
+                atr += tr * weight
+        row['ATR'] = atr
+
+
+class _StreamDivergence:
+    """J. 背離特徵：回溯視窗 [t-length-lag, t-lag) 的極值與背離旗標
+
+    每個序列的值延遲 lag+1 根才送進滾動極值，視窗恰好落在回溯區間。
+    """
+
+    def __init__(self, length=DIVERGENCE_LENGTH, lag=DIVERGENCE_LAG, oscillators=DIVERGENCE_OSCILLATORS):
+        self.length = length
+        self.lag = lag
+        self.oscillators = oscillators
+        names = ('Close',) + tuple(oscillators)
+        self.delayed = {name: deque() for name in names}
+        self.extremes = {name: (RollingExtreme(length, 'min'), RollingExtreme(length, 'max')) for name in names}
+        self.count = 0
+
+    def _lookback(self, name, value):
+        delayed = self.delayed[name]
+        lowest, highest = self.extremes[name]
+        if len(delayed) == self.lag + 1:
+            old = delayed.popleft()
+            low, high = lowest.update(old), highest.update(old)
+        else:
+            low = high = np.nan
+        delayed.append(value)
+        if self.count < self.length + self.lag:
+            return np.nan, np.nan
+        return low, high
+
+    def update(self, row):
+        close = row['Close']
+        close_min, close_max = self._lookback('Close', close)
+        row['Close_LbMin'], row['Close_LbMax'] = close_min, close_max
+        for osc in self.oscillators:
+            osc_min, osc_max = self._lookback(osc, row[osc])
+            row[f'{osc}_LbMin'], row[f'{osc}_LbMax'] = osc_min, osc_max
+            row[f'Bull_Div_{osc}'] = bool(close < close_min and row[osc] > osc_min)
+            row[f'Bear_Div_{osc}'] = bool(close > close_max and row[osc] < osc_max)
+        self.count += 1
+
+
+class _StreamFibo:
+    """C. FIBO 波段位階：與 fibo.fibo_levels 相同規則，只看最新一個視窗"""
+
+    def __init__(self, window, levels, swing, valid_threshold, min_lead=5, fallback_lookback=200):
+        self.window = window
+        self.levels = levels
+        self.swing = swing
+        self.valid_threshold = valid_threshold
+        self.min_lead = min_lead
+        self.fallback_lookback = fallback_lookback
+        self.closes = RingBuffer(max(window, fallback_lookback if swing else 0))
+
+    def update(self, row):
+        self.closes.append(row['Close'])
+        for name in self.levels:
+            row[name] = np.nan
+        row['Fibo_MaxPrice'] = row['Fibo_MinPrice'] = np.nan
+        if self.window >= 5 and self.closes.count >= self.window:
+            values = self.closes.view(self.window)
+            max_pos = int(np.argmax(values))
+            max_price = float(values[max_pos])
+            window_min = float(values.min())
+            if not self.swing:
+                min_price = window_min
+            elif max_pos >= self.min_lead:
+                min_price = float(values[:max_pos + 1].min())
+            elif self.window > self.fallback_lookback:
+                min_price = float(self.closes.view(self.fallback_lookback).min())
+            else:
+                min_price = window_min
+
+            range_val = max_price - min_price
+            for name, coef in self.levels.items():
+                row[name] = max_price + range_val * coef if range_val > 0 else np.nan
+            row['Fibo_MaxPrice'] = max_price
+            row['Fibo_MinPrice'] = window_min
+        row['Fibo_Range'] = row['Fibo_MaxPrice'] - row['Fibo_MinPrice']
+        row['Fibo_Valid'] = bool(row['Fibo_Range'] / row['Fibo_MinPrice'] >= self.valid_threshold)
+
+
+# 階段名稱 -> 串流狀態類別（對應 pipeline.INDICATOR_STAGES）
+STREAM_STAGES = {
+    'slope': _StreamSlope,
+    'slope_pr': _StreamSlopePR,
+    'ma60': lambda: _StreamMA(60),
+    'ma20': lambda: _StreamMA(20),
+    'rsi': _StreamRSI,
+    'kd': _StreamKD,
+    'macd': _StreamMACD,
+    'dmi': _StreamDMI,
+    'bb': _StreamBB,
+    'volume': _StreamVolume,
+    'atr': _StreamATR,
+    'divergence': _StreamDivergence,
+}
+
+
+class StreamingScorer:
+    """單一策略的逐筆評分器
+
+    用法：
+        scorer = StreamingScorer(get_profile('6669'), history=df)  # 以歷史資料暖機
+        row = scorer.update(new_bar, date)                          # 每根新 K 棒只更新狀態
+
+    update 回傳該根 K 棒的 {欄位名稱: 值}，欄位與 run_profile 的輸出相同
+    （OHLCV、指標、FIBO、各分項分數與 Buy_Score / Sell_Score）。
+    多檔股票同時更新時請用 update_universe，評分會合併成一次陣列運算。
+    """
+
+    def __init__(self, profile, history=None):
+        self.profile = profile
+        names = resolve_stages(profile.stages)
+        if profile.slope_rank_key() is not None and 'slope' in names:
+            # 擴張視窗排名取代滾動排名（同 pipeline.profile_frame 的疊加）
+            names = [name for name in names if name != 'slope_pr']
+            self.stages = [STREAM_STAGES[name]() for name in names]
+            self.stages.append(_StreamSlopePRExpanding(profile.slope_rank_start))
+        else:
+            self.stages = [STREAM_STAGES[name]() for name in names]
+        self.fibo = _StreamFibo(profile.fibo_window, profile.fibo_levels, profile.fibo_swing,
+                                profile.fibo_valid_threshold)
+        self.recent = deque(maxlen=SCORE_LOOKBACK)
+        self.score_names = None
+        self.last_date = None
+        if history is not None:
+            self.feed(history)
+
+    def advance(self, bar, date=None):
+        """只更新指標狀態（不評分），回傳該根 K 棒的指標 dict"""
+        row = {name: float(bar[name]) for name in OHLCV_COLUMNS if name in bar}
+        for stage in self.stages:
+            stage.update(row)
+        self.fibo.update(row)
+        self.recent.append(row)
+        self.last_date = date
+        if self.score_names is None:
+            self.score_names = score_columns(self.profile, row)
+        return row
+
+    def update(self, bar, date=None):
+        """加入一根 K 棒（含 Open / High / Low / Close / Volume 的 mapping），回傳該根的指標與評分"""
+        row = self.advance(bar, date)
+        _score_blocks(self.profile, [list(self.recent)], names=self.score_names)
+        return row
+
+    def feed(self, df):
+        """依序餵入整段 OHLCV（暖機或回放），回傳逐筆結果的 DataFrame；評分在最後一次算完"""
+        rows = [self.advance(bar, date) for date, bar in zip(df.index, df.to_dict('records'))]
+        if rows:
+            _score_blocks(self.profile, [rows], every_row=True, names=self.score_names)
+        return pd.DataFrame(rows, index=df.index[:len(rows)])
+
+
+def score_columns(profile, row):
+    """評分核心讀取的欄位（scoring.SCORE_INPUTS 加上背離旗標），只有這些欄位需要串接成陣列
+
+    評分函數未登記於 SCORE_INPUTS，或 row 缺少背離旗標（評分時需現算）時回傳 row 的全部欄位。
+    """
+    inputs = [SCORE_INPUTS.get(profile.buy_scorer), SCORE_INPUTS.get(profile.sell_scorer)]
+    flags = divergence_flag_names()
+    if None in inputs or not all(name in row for name in flags):
+        return list(row)
+    return sorted(set().union(*inputs, flags))
+
+
+def _score_blocks(profile, blocks, every_row=False, names=None):
+    """把多段連續的指標列串接成欄位陣列，以 SCORE_KERNELS 一次評分並寫回各列
+
+    評分最多回看 SCORE_LOOKBACK 根，每段的最後一列只會讀到同一段的資料
+    （段長 >= SCORE_LOOKBACK，或只有一段時）。every_row=True 時寫回所有列，
+    否則只寫回每段的最後一列。names 為要串接的欄位（預設 score_columns）。
+    """
+    rows = [row for block in blocks for row in block]
+    if names is None:
+        names = score_columns(profile, rows[-1])
+    columns = {name: np.array([row[name] for row in rows]) for name in names}
+    if every_row:
+        picks = np.arange(len(rows))
+    else:
+        picks = np.cumsum([len(block) for block in blocks]) - 1
+    targets = [rows[i] for i in picks]
+    for components, scorer, total_name in ((BUY_COMPONENTS, profile.buy_scorer, 'Buy_Score'),
+                                           (SELL_COMPONENTS, profile.sell_scorer, 'Sell_Score')):
+        parts, total = SCORE_KERNELS[scorer](columns)
+        if profile.weights:
+            total = weighted_total(parts, component_scales(components, profile.weights))
+        for name, part in zip(components + [total_name], parts + [total]):
+            values = part[picks].tolist() if np.ndim(part) else [np.asarray(part).tolist()] * len(picks)
+            for row, value in zip(targets, values):
+                row[name] = value
+
+
+def update_universe(scorers, bars, date=None):
+    """多檔股票同時加入一根新 K 棒，回傳 {代號: 該根的指標與評分}
+
+    scorers 為 {代號: StreamingScorer}，bars 為 {代號: OHLCV mapping}。
+    各檔先更新指標狀態，再依策略分組，把每檔最近 SCORE_LOOKBACK 根串接後
+    一次評分，單檔的評分成本由整批攤提。
+    """
+    rows = {ticker: scorers[ticker].advance(bar, date) for ticker, bar in bars.items()}
+    groups = {}
+    for ticker in rows:
+        scorer = scorers[ticker]
+        if len(scorer.recent) < SCORE_LOOKBACK:
+            _score_blocks(scorer.profile, [list(scorer.recent)], names=scorer.score_names)  # 暖機不足 3 根時單獨評分
+        else:
+            groups.setdefault(scorer.profile.name, []).append(scorer)
+    for group in groups.values():
+        _score_blocks(group[0].profile, [list(scorer.recent) for scorer in group], names=group[0].score_names)
+    return rows
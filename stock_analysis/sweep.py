@@ -0,0 +1,167 @@
+"""參數掃描：平行評估大量買賣門檻與分項權重組合的回測績效
+
+指標與各分項分數只計算一次。分項矩陣 (Close、成交價、各買賣分項) 放進
+共用記憶體 (multiprocessing.shared_memory)，worker 直接以 numpy 讀取，
+不必為每個組合傳遞 DataFrame。權重以「相對於原始配分的倍數」表示，
+例如 {'Buy_FIBO': (0.8, 1.0, 1.2)}；未掃描的分項沿用策略的 weights（預設 1），
+倍數與策略相同時總分與 Buy_Score / Sell_Score 相同。
+"""
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from .backtest import DEFAULT_FEE, DEFAULT_TAX, TRADING_DAYS, _fill_prices, backtest_arrays
+from .scoring import BUY_COMPONENTS, SELL_COMPONENTS, component_scales, weighted_total
+
+COMPONENTS = BUY_COMPONENTS + SELL_COMPONENTS
+
+# worker 端附加的共用記憶體與回測設定
+_WORKER = {}
+
+
+def parameter_grid(profile, buy_thresholds=None, sell_thresholds=None, weights=None):
+    """展開所有組合，回傳 [(買進門檻, 賣出門檻, {分項: 倍數}), ...]
+
+    buy_thresholds / sell_thresholds 為門檻組 (由高到低) 的清單，未指定時使用策略原值；
+    門檻數量須與 buy_actions / sell_actions 相同，未嚴格遞減的組合會被略過。
+    weights 為 {分項欄位: 倍數清單}。
+    """
+    buy_thresholds = buy_thresholds or [tuple(t for t, _ in profile.buy_actions)]
+    sell_thresholds = sell_thresholds or [tuple(t for t, _ in profile.sell_actions)]
+    weights = weights or {}
+    unknown = [name for name in weights if name not in COMPONENTS]
+    if unknown:
+        raise KeyError(f"未知的評分分項: {', '.join(unknown)}")
+
+    names = list(weights)
+    grid = []
+    for buy, sell, scales in itertools.product(buy_thresholds, sell_thresholds,
+                                               itertools.product(*weights.values())):
+        buy, sell = tuple(buy), tuple(sell)
+        if len(buy) != len(profile.buy_actions) or len(sell) != len(profile.sell_actions):
+            raise ValueError(f"門檻數量須為 {len(profile.buy_actions)} / {len(profile.sell_actions)}: {buy} {sell}")
+        if any(a <= b for a, b in zip(buy, buy[1:])) or any(a <= b for a, b in zip(sell, sell[1:])):
+            continue
+        grid.append((buy, sell, dict(zip(names, scales))))
+    return grid
+
+
+def _encode(grid, base_weights):
+    """組合 -> 數值矩陣：[買進門檻..., 賣出門檻..., 各分項倍數 (依 COMPONENTS 順序，未掃描者取 base_weights)]"""
+    rows = []
+    for buy, sell, scales in grid:
+        rows.append(list(buy) + list(sell) + component_scales(COMPONENTS, {**base_weights, **scales}))
+    return np.asarray(rows, dtype=float).reshape(len(grid), -1)
+
+
+def _attach(name, shape, settings):
+    """worker 初始化：以名稱附加父進程建立的共用記憶體（釋放由父進程負責）"""
+    shm = shared_memory.SharedMemory(name=name)
+    _WORKER['shm'] = shm
+    _WORKER['data'] = np.ndarray(shape, dtype=float, buffer=shm.buf)
+    _WORKER.update(settings)
+
+
+def _evaluate(params):
+    """評估一批組合，回傳績效摘要清單"""
+    data = _WORKER['data']
+    buy_fracs, sell_fracs = _WORKER['buy_fracs'], _WORKER['sell_fracs']
+    nb, ns = len(buy_fracs), len(sell_fracs)
+    nbc = len(BUY_COMPONENTS)
+    close, price = data[:, 0], data[:, 1]
+    buy_parts, sell_parts = data[:, 2:2 + nbc], data[:, 2 + nbc:]
+    out = []
+    for row in params:
+        buy_th, sell_th, scales = row[:nb], row[nb:nb + ns], row[nb + ns:]
+        out.append(backtest_arrays(
+            close, price,
+            weighted_total(buy_parts.T, scales[:nbc]),
+            weighted_total(sell_parts.T, scales[nbc:]),
+            tuple(zip(buy_th.tolist(), buy_fracs)),
+            tuple(zip(sell_th.tolist(), sell_fracs)),
+            _WORKER['delay'], _WORKER['initial_cash'], _WORKER['fee'], _WORKER['tax'], _WORKER['periods_per_year'],
+        ))
+    return out
+
+
+def grid_search(df, profile, buy_thresholds=None, sell_thresholds=None, weights=None, rank_by='total_return',
+                ascending=False, workers=None, chunksize=None, fill='open', initial_cash=1_000_000.0,
+                fee=DEFAULT_FEE, tax=DEFAULT_TAX, periods_per_year=TRADING_DAYS):
+    """對門檻與權重組合做回測掃描，回傳依 rank_by 排序的結果表
+
+    df 為 run_profile 的輸出（需含各分項分數欄位）。結果表每列為一個組合：
+    buy_thresholds、sell_thresholds、w_<分項>（僅列出有掃描的分項）與回測績效欄位，
+    並附 rank（1 為最佳）。workers=1 時在目前進程內執行。
+    """
+    grid = parameter_grid(profile, buy_thresholds, sell_thresholds, weights)
+    if not grid:
+        return pd.DataFrame()
+    price, delay = _fill_prices(df, fill)
+    matrix = np.column_stack([df['Close'].to_numpy(dtype=float), price]
+                             + [df[name].to_numpy(dtype=float) for name in COMPONENTS])
+    settings = {
+        'buy_fracs': tuple(f for _, f in profile.buy_actions),
+        'sell_fracs': tuple(f for _, f in profile.sell_actions),
+        'delay': delay,
+        'initial_cash': initial_cash,
+        'fee': fee,
+        'tax': tax,
+        'periods_per_year': periods_per_year,
+    }
+    params = _encode(grid, profile.weights)
+    workers = workers or os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, len(params) // (workers * 4))
+    chunks = [params[i:i + chunksize] for i in range(0, len(params), chunksize)]
+
+    if workers == 1:
+        _WORKER.update(settings, data=matrix)
+        try:
+            results = [stats for chunk in chunks for stats in _evaluate(chunk)]
+        finally:
+            _WORKER.clear()
+    else:
+        shm = shared_memory.SharedMemory(create=True, size=matrix.nbytes)
+        try:
+            np.ndarray(matrix.shape, dtype=float, buffer=shm.buf)[:] = matrix
+            with ProcessPoolExecutor(max_workers=workers, initializer=_attach,
+                                     initargs=(shm.name, matrix.shape, settings)) as pool:
+                results = [stats for batch in pool.map(_evaluate, chunks) for stats in batch]
+        finally:
+            shm.close()
+            shm.unlink()
+
+    table = pd.DataFrame(results)
+    table.insert(0, 'buy_thresholds', [buy for buy, _, _ in grid])
+    table.insert(1, 'sell_thresholds', [sell for _, sell, _ in grid])
+    for i, name in enumerate(weights or {}):
+        table.insert(2 + i, f'w_{name}', [scales[name] for _, _, scales in grid])
+    table = table.sort_values(rank_by, ascending=ascending, kind='stable').reset_index(drop=True)
+    table.insert(0, 'rank', np.arange(1, len(table) + 1))
+    return table
+
+
+def tuned_profile(profile, buy_thresholds, sell_thresholds, weights=None, name=None):
+    """以掃描結果的門檻與分項倍數建立新策略（買賣比例與建議名稱沿用原策略）
+
+    weights 為 {分項: 倍數}（grid_search 結果表的 w_<分項> 欄），與原策略的 weights 合併；
+    name 預設為 '<原名稱>-tuned'。
+    """
+    buy_map = dict(zip((t for t, _ in profile.buy_actions), buy_thresholds))
+    sell_map = dict(zip((t for t, _ in profile.sell_actions), sell_thresholds))
+    weights = {**profile.weights, **{k: float(v) for k, v in (weights or {}).items()}}
+    component_scales(COMPONENTS, weights)  # 檢查分項名稱
+    return replace(
+        profile,
+        name=name or f'{profile.name}-tuned',
+        weights=weights,
+        buy_actions=tuple((buy_map[t], f) for t, f in profile.buy_actions),
+        sell_actions=tuple((sell_map[t], f) for t, f in profile.sell_actions),
+        buy_tiers=tuple((buy_map.get(t, t), label) for t, label in profile.buy_tiers),
+        sell_tiers=tuple((sell_map.get(t, t), label) for t, label in profile.sell_tiers),
+    )
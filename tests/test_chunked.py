@@ -0,0 +1,60 @@
+"""分段評分 (chunked.run_profile_chunked) 與整段計算 (run_profile) 逐位元相同"""
+import dataclasses
+
+import numpy as np
+import pytest
+
+from stock_analysis import get_profile, run_profile
+from stock_analysis.bench import synthetic_ohlcv
+from stock_analysis.chunked import ChunkedScorer, run_profile_chunked
+
+N = 5000
+CHUNK = 700  # 不是 ROLLING_BLOCK 的倍數，由 rechunk 重切
+
+
+def tick_ohlcv(n=N, seed=0):
+    """0.5 元跳動單位：斜率與均線出現同值，排名的並列規則也須與整段相同"""
+    df = synthetic_ohlcv(n, seed=seed)
+    prices = ['Open', 'High', 'Low', 'Close']
+    df[prices] = (df[prices] * 2).round() / 2
+    return df
+
+
+def assert_identical(expected, actual):
+    assert list(actual.columns) == list(expected.columns)
+    assert list(actual.index) == list(expected.index)
+    for col in expected.columns:
+        np.testing.assert_array_equal(actual[col].to_numpy(float), expected[col].to_numpy(float), err_msg=col)
+
+
+@pytest.mark.parametrize('rank', ['rolling', 'expanding'])
+@pytest.mark.parametrize('name', ['6669', '3231'])
+def test_matches_run_profile(name, rank):
+    profile = dataclasses.replace(get_profile(name), slope_rank=rank)
+    df = tick_ohlcv()
+    assert_identical(run_profile(df, profile), run_profile_chunked(df, profile, chunk_size=CHUNK))
+
+
+@pytest.mark.parametrize('name', ['6669', '3231'])
+def test_uneven_source_blocks(name):
+    profile = get_profile(name)
+    df = tick_ohlcv(seed=1)
+    blocks = [df.iloc[i:i + CHUNK] for i in range(0, len(df), CHUNK)]
+    assert_identical(run_profile(df, profile), run_profile_chunked(blocks, profile, chunk_size=CHUNK))
+
+
+def test_compact_matches_run_profile():
+    profile = dataclasses.replace(get_profile('6669'), slope_rank='expanding')
+    df = tick_ohlcv(seed=2)
+    expected = run_profile(df, profile, compact=True)
+    actual = run_profile_chunked(df, profile, chunk_size=CHUNK, compact=True)
+    assert (actual.dtypes == expected.dtypes).all()
+    assert_identical(expected, actual)
+
+
+def test_block_after_partial_block_is_rejected():
+    scorer = ChunkedScorer(get_profile('3231'))
+    df = tick_ohlcv(1000)
+    scorer.process(df.iloc[:CHUNK])
+    with pytest.raises(ValueError, match='不是 64 的倍數'):
+        scorer.process(df.iloc[CHUNK:])
@@ -0,0 +1,22 @@
+"""命令列：輸出管線提早關閉（例如接到 head）時安靜結束，不印 traceback"""
+import os
+import subprocess
+import sys
+
+from stock_analysis.bench import synthetic_ohlcv
+from stock_analysis.data import OHLCVStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_closed_stdout_exits_quietly(tmp_path):
+    OHLCVStore(str(tmp_path)).write('6669.TW', synthetic_ohlcv(400, start='2020-01-01'))
+    env = dict(os.environ, STOCK_ANALYSIS_CACHE=str(tmp_path), STOCK_ANALYSIS_OFFLINE='1', PYTHONPATH=ROOT)
+    command = [sys.executable, '-m', 'stock_analysis', 'score', '6669.TW', '--last', '400', '--format', 'csv',
+               '--start', '2020-01-01']
+    proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env, cwd=str(tmp_path))
+    proc.stdout.close()  # 讀取端先關閉，子進程寫出時必定收到 EPIPE
+    stderr = proc.stderr.read().decode()
+    proc.stderr.close()
+    assert proc.wait() == 1
+    assert 'Traceback' not in stderr
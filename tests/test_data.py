@@ -0,0 +1,41 @@
+"""OHLCVStore 增量更新：查詢區間已在快取內時不連網，超出快取時才重抓最近幾根比對修正"""
+import pandas as pd
+import pytest
+
+from stock_analysis.bench import synthetic_ohlcv
+from stock_analysis.data import OHLCVStore, slice_dates
+
+
+@pytest.fixture
+def store(tmp_path):
+    source = synthetic_ohlcv(300)
+    calls = []
+
+    def downloader(ticker, start=None, end=None):
+        calls.append((start, end))
+        return slice_dates(source, start, end)
+
+    store = OHLCVStore(str(tmp_path), offline=False, downloader=downloader)
+    store.source, store.calls = source, calls
+    store.write('TEST', source.iloc[:200])
+    return store
+
+
+def test_closed_range_inside_cache_skips_download(store):
+    last = store.source.index[199]
+    for end in (store.source.index[100], last, last + pd.Timedelta(days=1)):
+        df = store.get('TEST', store.source.index[50], end)
+        pd.testing.assert_frame_equal(df, slice_dates(store.source.iloc[:200], store.source.index[50], end),
+                                      check_freq=False)
+    assert store.calls == []
+    assert store.last_update['fetched'] == 0
+
+
+@pytest.mark.parametrize('end', [None, 'past_cache'])
+def test_open_or_recent_range_checks_revisions(store, end):
+    if end == 'past_cache':
+        end = store.source.index[250]
+    df = store.get('TEST', None, end)
+    assert len(store.calls) == 1
+    assert store.calls[0][0] == store.source.index[200 - store.revision_bars]
+    pd.testing.assert_frame_equal(df, slice_dates(store.source, None, end), check_freq=False)
@@ -0,0 +1,164 @@
+"""AsyncFetcher 對本機 aiohttp 測試伺服器：endpoint 依序備援、429 + Retry-After、allorigins 包裝與 null K 棒"""
+import asyncio
+import json
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock_analysis.fetcher import AsyncFetcher, Endpoint, FetchError, SymbolNotFound
+
+web = pytest.importorskip('aiohttp.web')
+
+DATES = pd.date_range('2024-01-02', periods=5, freq='B')
+GMT_OFFSET = 28800
+
+
+def chart(close, adjclose=None):
+    """v8 chart JSON：close 中的 None 即 Yahoo 未成交的 null K 棒"""
+    stamps = [int(d.timestamp()) - GMT_OFFSET + 9 * 3600 for d in DATES]
+    quote = {
+        'open': close, 'high': [c and c + 1 for c in close], 'low': [c and c - 1 for c in close], 'close': close,
+        'volume': [c and 1000 for c in close],
+    }
+    indicators = {'quote': [quote]}
+    if adjclose is not None:
+        indicators['adjclose'] = [{'adjclose': adjclose}]
+    return {'chart': {'result': [{'meta': {'gmtoffset': GMT_OFFSET}, 'timestamp': stamps,
+                                  'indicators': indicators}], 'error': None}}
+
+
+CLOSE = [10.0, 11.0, 12.0, 13.0, 14.0]
+NOT_FOUND = {'chart': {'result': None, 'error': {'code': 'Not Found', 'description': 'No data found'}}}
+
+
+def run_with_server(routes, scenario):
+    """啟動測試伺服器（routes: {路徑: handler}），執行 scenario(base_url, hits)；hits 記錄每個路徑的請求數"""
+    hits = {}
+
+    def counted(path, handler):
+        async def wrapper(request):
+            hits[path] = hits.get(path, 0) + 1
+            return await handler(request)
+        return wrapper
+
+    async def main():
+        app = web.Application()
+        for path, handler in routes.items():
+            app.router.add_get(path, counted(path, handler))
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        host, port = runner.addresses[0][:2]
+        try:
+            return await scenario(f'http://{host}:{port}', hits)
+        finally:
+            await runner.cleanup()
+
+    return asyncio.run(main())
+
+
+async def fetch(endpoints, ticker='TEST.TW', **kwargs):
+    kwargs = {'rate': 0, 'retries': 1, 'backoff': 0.01, **kwargs}
+    async with AsyncFetcher(endpoints, **kwargs) as fetcher:
+        return await fetcher.fetch(ticker)
+
+
+def json_handler(payload, status=200, headers=None):
+    async def handler(request):
+        return web.json_response(payload, status=status, headers=headers)
+    return handler
+
+
+def test_falls_back_to_next_endpoint():
+    routes = {'/down/{ticker}': json_handler({}, status=503), '/ok/{ticker}': json_handler(chart(CLOSE))}
+
+    async def scenario(base, hits):
+        df = await fetch([Endpoint('down', base + '/down/{ticker}'), Endpoint('ok', base + '/ok/{ticker}')])
+        return df, hits
+
+    df, hits = run_with_server(routes, scenario)
+    assert hits == {'/down/{ticker}': 1, '/ok/{ticker}': 1}
+    assert list(df.index) == list(DATES)
+    np.testing.assert_array_equal(df['Close'], CLOSE)
+
+
+def test_all_endpoints_failing_raises_after_every_round():
+    routes = {'/down/{ticker}': json_handler({}, status=500), '/bad/{ticker}': json_handler({'chart': {}})}
+
+    async def scenario(base, hits):
+        endpoints = [Endpoint('down', base + '/down/{ticker}'), Endpoint('bad', base + '/bad/{ticker}')]
+        with pytest.raises(FetchError, match='2 個來源 x 2 輪皆失敗.*沒有 result'):
+            await fetch(endpoints, retries=2)
+        return hits
+
+    assert run_with_server(routes, scenario) == {'/down/{ticker}': 2, '/bad/{ticker}': 2}
+
+
+def test_symbol_not_found_is_not_retried():
+    routes = {'/missing/{ticker}': json_handler(NOT_FOUND, status=404), '/ok/{ticker}': json_handler(chart(CLOSE))}
+
+    async def scenario(base, hits):
+        endpoints = [Endpoint('missing', base + '/missing/{ticker}'), Endpoint('ok', base + '/ok/{ticker}')]
+        with pytest.raises(SymbolNotFound):
+            await fetch(endpoints, retries=3)
+        return hits
+
+    assert run_with_server(routes, scenario) == {'/missing/{ticker}': 1}
+
+
+def test_429_pauses_host_for_retry_after():
+    responses = [web.json_response({}, status=429, headers={'Retry-After': '1'})]
+
+    async def limited(request):
+        return responses.pop() if responses else web.json_response(chart(CLOSE))
+
+    async def scenario(base, hits):
+        started = time.monotonic()
+        df = await fetch([Endpoint('limited', base + '/limited/{ticker}')], retries=2)
+        return df, time.monotonic() - started, hits
+
+    df, elapsed, hits = run_with_server({'/limited/{ticker}': limited}, scenario)
+    assert hits == {'/limited/{ticker}': 2}
+    assert elapsed >= 0.9  # 第二輪等到 Retry-After 到期，而非 backoff 的 0.01 秒
+    assert len(df) == len(DATES)
+
+
+def test_allorigins_wrapped_response():
+    seen = []
+
+    async def allorigins(request):
+        seen.append(request.query['url'])
+        return web.json_response({'contents': json.dumps(chart(CLOSE))})
+
+    async def scenario(base, hits):
+        return await fetch([Endpoint('wrapped', base + '/get?url={url}', wrapped=True)], ticker='6669.TW')
+
+    df = run_with_server({'/get': allorigins}, scenario)
+    np.testing.assert_array_equal(df['Close'], CLOSE)
+    url = urlsplit(seen[0])
+    assert url.path.endswith('/v8/finance/chart/6669.TW')
+    assert parse_qs(url.query)['interval'] == ['1d']
+
+
+def test_null_bars_are_dropped_and_adjclose_applied():
+    close = [10.0, None, 12.0, None, 14.0]
+    adjclose = [5.0, None, 6.0, None, 7.0]
+
+    async def scenario(base, hits):
+        return await fetch([Endpoint('ok', base + '/ok/{ticker}')])
+
+    df = run_with_server({'/ok/{ticker}': json_handler(chart(close, adjclose))}, scenario)
+    assert list(df.index) == [DATES[0], DATES[2], DATES[4]]
+    assert not df.isna().any().any()
+    np.testing.assert_allclose(df['Close'], [5.0, 6.0, 7.0])
+    np.testing.assert_allclose(df['High'], [5.5, 6.5, 7.5])
+    np.testing.assert_array_equal(df['Volume'], [1000, 1000, 1000])
+
+
+def test_retries_must_be_positive():
+    with pytest.raises(ValueError, match='retries'):
+        AsyncFetcher(retries=0)
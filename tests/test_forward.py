@@ -0,0 +1,120 @@
+"""前瞻報酬統計與 pandas groupby 的逐組結果相同；多檔資料的前瞻視窗不跨越代號"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock_analysis import forward_analysis, get_profile, group_stats
+from stock_analysis.forward import ALL_LABEL
+from stock_analysis.profiles import BUY_DEFAULT_TIER, SELL_DEFAULT_TIER
+
+HORIZONS = (5, 20, 60)
+CHECKED = ['count', 'hit_rate', 'mean', 'median', 'p05', 'std']
+
+
+def reference_stats(returns, labels, sign):
+    """pandas groupby 的各組統計（quantile 為線性內插、std 為 ddof=1，同 group_stats）"""
+    frame = pd.DataFrame({'ret': returns, 'label': labels}).dropna()
+    grouped = frame.groupby('label')['ret']
+    return pd.DataFrame({
+        'count': grouped.count(),
+        'hit_rate': grouped.apply(lambda s: (sign * s > 0).mean()),
+        'mean': grouped.mean(),
+        'median': grouped.median(),
+        'p05': grouped.quantile(0.05),
+        'std': grouped.std(),
+    })
+
+
+def assert_stats(actual, expected):
+    assert list(actual.index) == list(expected.index)
+    np.testing.assert_array_equal(actual['count'].to_numpy(), expected['count'].to_numpy())
+    for col in CHECKED[1:]:
+        np.testing.assert_allclose(actual[col].to_numpy(float), expected[col].to_numpy(float), rtol=1e-12,
+                                   atol=1e-15, err_msg=col)
+
+
+def scored_frame(n, seed):
+    """含整數評分（會剛好落在門檻上）與少量 NaN 評分的單檔資料"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    df = pd.DataFrame({
+        'Open': close * (1 + rng.normal(0, 0.005, n)),
+        'Close': close,
+        'Buy_Score': rng.integers(0, 80, n).astype(float),
+        'Sell_Score': rng.integers(0, 80, n).astype(float),
+    }, index=pd.date_range('2020-01-01', periods=n, freq='B', name='Date'))
+    df.iloc[:30, df.columns.get_indexer(['Buy_Score', 'Sell_Score'])] = np.nan  # 暖機期
+    return df
+
+
+def naive_tier(score, tiers, default):
+    if np.isnan(score):
+        return None
+    for threshold, name in tiers:
+        if score > threshold:
+            return name
+    return default
+
+
+def naive_returns(df, h, fill):
+    """逐檔以 shift 計算前瞻報酬（groupby Ticker，視窗不跨代號）"""
+    price = df[fill.capitalize()]
+    delay = 1 if fill == 'open' else 0
+    keys = df.index.get_level_values('Ticker') if isinstance(df.index, pd.MultiIndex) else np.zeros(len(df))
+    grouped = price.groupby(keys)
+    return (grouped.shift(-delay - h) / grouped.shift(-delay) - 1).to_numpy()
+
+
+def test_group_stats_matches_pandas():
+    rng = np.random.default_rng(0)
+    values = rng.normal(0, 0.05, 5000)
+    values[rng.random(5000) < 0.05] = np.nan
+    codes = rng.integers(-1, 7, 5000)
+    codes[codes == 5] = 4  # 第 5 組為空
+    codes[np.flatnonzero(codes == 6)[1:]] = 3  # 第 6 組只有一筆
+    for sign in (1, -1):
+        stats = pd.DataFrame(group_stats(values, codes, 7, sign))
+        expected = reference_stats(values, np.where(codes >= 0, codes, np.nan), sign)
+        assert stats.loc[5, 'count'] == 0 and np.isnan(stats.loc[5, ['mean', 'median', 'p05']].astype(float)).all()
+        assert np.isnan(stats.loc[6, 'std'])
+        assert_stats(stats.loc[stats['count'] > 0], expected)
+
+
+@pytest.mark.parametrize('fill', ['close', 'open'])
+@pytest.mark.parametrize('name', ['6669', '3231'])
+def test_tiers_match_pandas_groupby(name, fill):
+    profile = get_profile(name)
+    df = scored_frame(2000, seed=1)
+    result = forward_analysis(df, profile, HORIZONS, fill=fill)
+    for side, column, tiers, default, sign in (('buy', 'Buy_Score', profile.buy_tiers, BUY_DEFAULT_TIER, 1),
+                                               ('sell', 'Sell_Score', profile.sell_tiers, SELL_DEFAULT_TIER, -1)):
+        labels = [naive_tier(s, tiers, default) for s in df[column]]
+        order = [name for _, name in tiers] + [default]
+        for h in HORIZONS:
+            returns = naive_returns(df, h, fill)
+            expected = reference_stats(returns, labels, sign).reindex(order).dropna(subset=['count'])
+            expected.loc[ALL_LABEL] = reference_stats(returns, ['all'] * len(df), sign).iloc[0]
+            actual = result.tiers.xs((side, h), level=('Side', 'Horizon'))
+            assert_stats(actual, expected)
+
+
+def test_multiindex_windows_do_not_cross_tickers():
+    profile = get_profile('6669')
+    frames = {'A.TW': scored_frame(100, seed=2), 'B.TW': scored_frame(80, seed=3)}
+    multi = pd.concat(frames, names=['Ticker', 'Date'])
+    result = forward_analysis(multi, profile, HORIZONS)
+
+    # A 的最後 h 根若跨進 B 會得到有限值；正確結果為 NaN，且與逐檔計算相同
+    for ticker, df in frames.items():
+        single = forward_analysis(df, profile, HORIZONS).returns
+        np.testing.assert_array_equal(result.returns.loc[ticker].to_numpy(), single.to_numpy())
+    for h in HORIZONS:
+        assert result.returns.loc['A.TW', f'Fwd_{h}'].iloc[-h:].isna().all()
+
+    labels = [naive_tier(s, profile.buy_tiers, BUY_DEFAULT_TIER) for s in multi['Buy_Score']]
+    for h in HORIZONS:
+        returns = naive_returns(multi, h, 'close')
+        expected = reference_stats(returns, labels, 1)
+        expected = expected.reindex([n for _, n in profile.buy_tiers] + [BUY_DEFAULT_TIER]).dropna(subset=['count'])
+        actual = result.tiers.xs(('buy', h), level=('Side', 'Horizon')).drop(ALL_LABEL)
+        assert_stats(actual, expected)
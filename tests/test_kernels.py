@@ -0,0 +1,86 @@
+"""計算核心：numpy / numba 兩個後端輸出逐位元相同，Wilder 平滑與 test.py 的 smooth_dmi 逐位元相同
+
+兩個後端的迴圈浮點運算順序相同，容許誤差為 0（assert_array_equal，NaN 位置也須一致）。
+numpy 後端的長序列 lfilter 路徑：EMA / KD 運算順序同迴圈而逐位元相同，Wilder 平滑為近似。
+"""
+import sys
+
+import numpy as np
+import pytest
+
+from stock_analysis import kernels
+
+N = 3000
+# EMA 的平滑係數：MACD 的 12 / 26 / 9 日與 RSI 的 Wilder (1/14)
+EMA_ALPHAS = [2 / 13, 2 / 27, 2 / 10, 1 / 14]
+
+
+@pytest.fixture(scope='module')
+def prices():
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, N)))
+    close[N // 3:N // 3 + 15] = close[N // 3]  # 平盤：同值取最前面、區間為 0
+    close[N // 5:N // 5 + 4] = close[:N // 5].max() + 1  # 視窗最高點並列
+    high = close * (1 + np.abs(rng.normal(0, 0.01, N)))
+    low = close * (1 - np.abs(rng.normal(0, 0.01, N)))
+    low[N // 2:N // 2 + 12] = high[N // 2:N // 2 + 12] = close[N // 2]  # RSV 分母為 0
+    return high, low, close
+
+
+CASES = {
+    'wilder_smooth': lambda h, l, c, b: [kernels.wilder_smooth(h - l, 14, backend=b)],
+    **{f'ema({alpha:.4f})': (lambda alpha: lambda h, l, c, b: [kernels.ema(c, alpha, backend=b)])(alpha)
+       for alpha in EMA_ALPHAS},
+    'kd': lambda h, l, c, b: list(kernels.kd(h, l, c, backend=b)),
+    'fibo_scan(swing)': lambda h, l, c, b: list(kernels.fibo_scan(c, 120, True, backend=b)),
+    'fibo_scan(box)': lambda h, l, c, b: list(kernels.fibo_scan(c, 20, False, backend=b)),
+    'fibo_scan(long)': lambda h, l, c, b: list(kernels.fibo_scan(c, 250, True, backend=b)),
+}
+
+
+@pytest.mark.parametrize('case', list(CASES))
+def test_numba_matches_numpy(case, prices):
+    pytest.importorskip('numba')
+    for expected, actual in zip(CASES[case](*prices, 'numpy'), CASES[case](*prices, 'numba')):
+        np.testing.assert_array_equal(actual, expected)
+
+
+def legacy_smooth_dmi(arr):
+    """test.py 的 smooth_dmi 原樣保留"""
+    res = [arr[0]]
+    for i in range(1, len(arr)):
+        res.append((res[i-1] * 13 + arr[i]) / 14)
+    return res
+
+
+@pytest.mark.parametrize('backend', kernels.BACKENDS)
+def test_wilder_smooth_matches_legacy(backend, prices):
+    if backend not in kernels.available_backends():
+        pytest.skip(f'{backend} 未安裝')
+    high, low, _ = prices
+    x = high - low
+    np.testing.assert_array_equal(kernels.wilder_smooth(x, 14, backend=backend), legacy_smooth_dmi(x.tolist()))
+
+
+@pytest.mark.parametrize('case', ['wilder_smooth', 'kd'] + [c for c in CASES if c.startswith('ema')])
+def test_loop_matches_lfilter(case, prices, monkeypatch):
+    pytest.importorskip('scipy.signal')
+    monkeypatch.setattr(kernels, 'LFILTER_MIN_LENGTH', N + 1)
+    loop = CASES[case](*prices, 'numpy')
+    monkeypatch.setattr(kernels, 'LFILTER_MIN_LENGTH', 0)
+    for expected, actual in zip(loop, CASES[case](*prices, 'numpy')):
+        if case == 'wilder_smooth':
+            np.testing.assert_allclose(actual, expected, rtol=1e-12, atol=0)
+        else:
+            np.testing.assert_array_equal(actual, expected)
+
+
+def test_short_series_do_not_load_scipy_signal(prices, monkeypatch):
+    monkeypatch.delitem(sys.modules, 'scipy.signal', raising=False)
+    kernels.wilder_smooth(prices[2], 14, backend='numpy')
+    assert 'scipy.signal' not in sys.modules
+
+
+def test_parity_report_is_exact():
+    pytest.importorskip('numba')
+    assert all(diff == 0 for diff in kernels.parity_report(n=2000).values())
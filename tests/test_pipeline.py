@@ -0,0 +1,76 @@
+"""run_profile 與凍結的舊版腳本 (tests/legacy.py) 逐欄比對
+
+合成資料為連續價格（沒有斜率並列，見 tests/test_rolling.py）。除了以累積和計算的 Slope_60
+與以固定權重加總的 ATR 只差浮點捨入，其餘欄位（Slope_PR、FIBO、DMI、各分項與總分等）
+都必須逐位元相同。精簡模式與完整結果的差異不超過 COMPACT_RTOL，int8 / bool 欄位相同。
+"""
+import numpy as np
+import pytest
+
+from stock_analysis import compact_columns, compute_indicators, get_profile, run_profile
+from stock_analysis.bench import synthetic_ohlcv
+from stock_analysis.divergence import divergence_flag_names
+from stock_analysis.pipeline import COMPACT_FLOAT32, COMPACT_RTOL
+
+pytest.importorskip('scipy')
+pytest.importorskip('ta')
+
+from legacy import BUY_COMPONENTS, LEGACY, SELL_COMPONENTS  # noqa: E402
+
+N = 900
+# 欄位 -> 相對誤差上限；未列出的欄位須逐位元相同
+RTOL = {'Slope_60': 1e-12, 'ATR': 1e-12}
+REQUIRED = {
+    '6669': ['Slope_60', 'Slope_PR', 'Fibo_l236', 'Fibo_l382', 'Fibo_l500', 'Fibo_l618', 'Fibo_l786',
+             'Fibo_ext1272', 'Fibo_ext1618', 'Fibo_MaxPrice', 'Fibo_MinPrice', 'Fibo_Valid',
+             'PDI', 'MDI', 'ADX', 'ATR'],
+    '3231': ['Fibo_l500', 'Fibo_l786', 'Fibo_ext1272', 'Fibo_MaxPrice', 'Fibo_MinPrice', 'Fibo_Valid'],
+}
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('name', ['6669', '3231'])
+def test_run_profile_matches_legacy(name, seed):
+    df = synthetic_ohlcv(N, seed=seed)
+    expected = LEGACY[name](df)
+    actual = run_profile(df, get_profile(name))
+    columns = REQUIRED[name] + BUY_COMPONENTS + SELL_COMPONENTS + ['Buy_Score', 'Sell_Score']
+    assert set(columns) <= set(actual.columns)
+    for col in [c for c in expected.columns if c in actual.columns]:
+        want = expected[col].to_numpy(dtype=float)
+        got = actual[col].to_numpy(dtype=float)
+        if col in RTOL:
+            np.testing.assert_allclose(got, want, rtol=RTOL[col], atol=0, err_msg=col)
+        else:
+            np.testing.assert_array_equal(got, want, err_msg=col)
+
+
+@pytest.mark.parametrize('name', ['6669', '3231'])
+def test_compact_matches_full(name):
+    profile = get_profile(name)
+    df = synthetic_ohlcv(3000, seed=0)
+    full = run_profile(df, profile)
+    compact = run_profile(df, profile, compact=True)
+    assert list(compact.columns) == [c for c in full.columns if c in compact_columns(profile)]
+    for col in compact.columns:
+        got = compact[col].to_numpy()
+        want = full[col].to_numpy()
+        if col in COMPACT_FLOAT32:
+            assert got.dtype == np.float32, col
+            np.testing.assert_allclose(got.astype(float), want, rtol=COMPACT_RTOL, atol=0, err_msg=col)
+        elif col in BUY_COMPONENTS or col in SELL_COMPONENTS:
+            assert got.dtype == np.int8, col
+            np.testing.assert_array_equal(got, want, err_msg=col)
+        elif col in divergence_flag_names() or col == 'Fibo_Valid':
+            assert got.dtype == bool, col
+            np.testing.assert_array_equal(got, want.astype(bool), err_msg=col)
+        else:
+            np.testing.assert_array_equal(got, want, err_msg=col)
+
+
+def test_compact_never_writes_intermediates():
+    profile = get_profile('6669')
+    base = compute_indicators(synthetic_ohlcv(1000, seed=0), profile.stages, compact_columns(profile))
+    for col in ['EMA12', 'EMA26', 'MACD_DIF', 'MACD_DEM', 'BB_Std', 'BB_Lower', 'Close_LbMin', 'K_LbMax']:
+        assert col not in base.columns
+    assert {'Slope_60', 'K', 'RSI', 'MACD_OSC', 'Bull_Div_K'} <= set(base.columns)
@@ -0,0 +1,29 @@
+"""出圖：font.sans-serif 接上中文字型；未安裝中文字型時只警告一次，不逐字發出缺字警告"""
+import warnings
+
+import pytest
+
+pytest.importorskip('matplotlib')
+
+from stock_analysis import get_profile, run_profile  # noqa: E402
+from stock_analysis import plotting  # noqa: E402
+from stock_analysis.bench import synthetic_ohlcv  # noqa: E402
+
+
+def test_plot_scores_uses_cjk_fallback_without_glyph_warnings(tmp_path, monkeypatch):
+    from matplotlib import rcParams
+    monkeypatch.setattr(plotting, '_cjk_available', None)
+    monkeypatch.setitem(rcParams, 'font.sans-serif', list(rcParams['font.sans-serif']))
+    profile = get_profile('6669')
+    df = run_profile(synthetic_ohlcv(300, seed=0), profile)
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        for i in range(2):
+            plotting.plot_scores(df, profile, path=str(tmp_path / f'{i}.png'))
+    messages = [str(w.message) for w in caught]
+
+    assert not [m for m in messages if 'missing from' in m]
+    assert len([m for m in messages if '中文字型' in m]) == (0 if plotting._cjk_available else 1)
+    assert set(plotting.CJK_FONTS) <= set(rcParams['font.sans-serif'])
+    assert (tmp_path / '1.png').exists()
@@ -0,0 +1,61 @@
+"""Slope_60 / Slope_PR 與 test.py 舊版 (scipy linregress + pandas rolling rank) 的差異
+
+斜率以累積和計算，與 linregress 只差浮點捨入。價格有跳動單位時，不同視窗可能有數學上
+相同的斜率：舊版依捨入雜訊 (~1e-17) 排出先後，新版可能並列或順序相反，該根 Slope_PR
+最多差「並列筆數 / 252」；連續價格沒有這種並列，兩者相同。
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock_analysis.bench import synthetic_ohlcv
+from stock_analysis.rolling import rolling_linregress, rolling_percentile_rank
+
+SLOPE_WINDOW = 60
+RANK_WINDOW = 252
+
+
+def legacy_slope_pr(close):
+    """test.py 舊版：rolling(60).apply(linregress) 與 rolling(252).rank(pct=True)"""
+    from scipy.stats import linregress
+
+    x = np.arange(SLOPE_WINDOW)
+    slope = close.rolling(window=SLOPE_WINDOW).apply(lambda y: linregress(x, y)[0], raw=True)
+    return slope, slope.rolling(window=RANK_WINDOW).rank(pct=True) * 100
+
+
+def slope_pr(close):
+    slope = rolling_linregress(close, SLOPE_WINDOW)['slope']
+    return slope, rolling_percentile_rank(slope, RANK_WINDOW) * 100
+
+
+def tick_close(seed):
+    """0.5 元跳動單位的收盤價，會出現數學上相同的斜率"""
+    return (synthetic_ohlcv(1500, seed=seed)['Close'] * 2).round() / 2
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_matches_legacy_on_continuous_prices(seed):
+    pytest.importorskip('scipy')
+    close = synthetic_ohlcv(1500, seed=seed)['Close']
+    legacy_slope, legacy_pr = legacy_slope_pr(close)
+    slope, pr = slope_pr(close)
+    np.testing.assert_allclose(slope, legacy_slope, rtol=1e-9, atol=0)
+    np.testing.assert_allclose(pr, legacy_pr, rtol=0, atol=1e-9)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2, 3])
+def test_tick_prices_differ_only_at_ties(seed):
+    pytest.importorskip('scipy')
+    legacy_slope, legacy_pr = legacy_slope_pr(tick_close(seed))
+    _, pr = slope_pr(tick_close(seed))
+    values = legacy_slope.to_numpy()
+    diff = np.abs(pr.to_numpy() - legacy_pr.to_numpy())
+    ties = np.zeros(len(values), dtype=int)
+    for i in range(SLOPE_WINDOW + RANK_WINDOW - 2, len(values)):
+        window = values[i - RANK_WINDOW + 1:i + 1]
+        ties[i] = np.count_nonzero(np.abs(window - values[i]) <= 1e-12 * np.abs(values[i])) - 1
+    assert ties.any()
+    changed = np.flatnonzero(diff > 1e-9)
+    assert (ties[changed] > 0).all()
+    assert (diff[changed] <= ties[changed] * 100 / RANK_WINDOW + 1e-9).all()
@@ -0,0 +1,72 @@
+"""評分存放區：級別進入事件與 action_levels 一致，重寫後的日曆不留被取代的日期"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock_analysis import get_profile
+from stock_analysis.backtest import action_levels
+from stock_analysis.store import DEFAULT_TIERS, ScoreStore, crossing_events, event_thresholds
+
+
+def scored_frame(buy, sell, start='2023-12-20'):
+    index = pd.bdate_range(start, periods=len(buy), name='Date')
+    return pd.DataFrame({'Close': 100.0, 'Buy_Score': buy, 'Sell_Score': sell}, index=index)
+
+
+def assert_days(actual, expected):
+    assert list(pd.DatetimeIndex(actual)) == list(pd.DatetimeIndex(expected))
+
+
+def expected_entries(scores, tiers, default):
+    """action_levels 每次改變的日期，依新級別名稱分組"""
+    level = action_levels(scores, tiers)
+    names = [default] + [name for _, name in reversed(tiers)]
+    changed = np.flatnonzero(level != np.concatenate([[0], level[:-1]]))
+    out = {}
+    for i in changed:
+        out.setdefault(names[level[i]], []).append(i)
+    return out
+
+
+def test_tier_events_follow_action_levels():
+    profile = get_profile('6669')
+    rng = np.random.default_rng(0)
+    buy = np.round(rng.uniform(0, 80, 400))
+    sell = np.round(rng.uniform(0, 80, 400))
+    buy[[10, 11]] = [70, 45]   # 強力買進直接跌到分批佈局
+    scored = scored_frame(buy, sell)
+    events = crossing_events('T', scored, event_thresholds(profile))
+    for side, tiers, scores in (('buy', profile.buy_tiers, buy), ('sell', profile.sell_tiers, sell)):
+        for tier, rows in expected_entries(scores, tiers, DEFAULT_TIERS[side]).items():
+            got = events[(events['Side'] == side) & (events['Tier'] == tier)]['Date']
+            assert_days(got, scored.index[rows])
+    assert scored.index[11] in events[(events['Side'] == 'buy') & (events['Tier'] == '分批佈局')]['Date'].tolist()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ScoreStore(str(tmp_path))
+
+
+def test_tier_entries_include_entries_from_above(store):
+    profile = get_profile('6669')
+    store.put('T', scored_frame([10, 30, 45, 60, 45, 30, 10], [0] * 7), profile)
+    days = store.read('T').index
+    assert_days(store.tier_entries('T', 'buy', '分批佈局'), days[[2, 4]])
+    assert_days(store.tier_entries('T', 'buy', '中性觀察'), days[[1, 5]])
+    assert_days(store.tier_entries('T', 'buy', DEFAULT_TIERS['buy']), days[[6]])
+
+
+def test_put_drops_replaced_days_from_calendar(store):
+    profile = get_profile('6669')
+    store.put('A', scored_frame([10] * 14, [10] * 14), profile)
+    store.put('B', scored_frame([10] * 5, [10] * 5), profile)
+    # A 從 2024-01-01 起重寫為較短的資料，之後的日期不再屬於任何一檔
+    store.put('A', scored_frame([70] * 2, [10] * 2, start='2024-01-01'), profile)
+    a = store.read('A').index
+    assert_days(store.calendar(), a)
+    assert len(store.crossed('buy', 60, days=1)) == 0
+    assert store.crossed('buy', 60, days=2)['Ticker'].tolist() == ['A']
+
+    reopened = ScoreStore(store.root)
+    assert_days(reopened.calendar(), a)
@@ -0,0 +1,62 @@
+"""逐筆串流 (streaming.StreamingScorer) 與整段計算 (run_profile) 逐位元相同"""
+import dataclasses
+
+import numpy as np
+import pytest
+
+from stock_analysis import get_profile, run_profile
+from stock_analysis.bench import synthetic_ohlcv
+from stock_analysis.streaming import StreamingScorer, update_universe
+
+
+def tick_ohlcv(n=1500, seed=0):
+    """價格取 0.5 元跳動單位並插入平盤段落，讓斜率、均線與排名出現同值"""
+    df = synthetic_ohlcv(n, seed=seed)
+    prices = ['Open', 'High', 'Low', 'Close']
+    df[prices] = (df[prices] * 2).round() / 2
+    for start in (300, 900):
+        df.iloc[start:start + 80, df.columns.get_indexer(prices)] = df['Close'].iloc[start]
+    return df
+
+
+def assert_identical(expected, actual):
+    for col in expected.columns:
+        np.testing.assert_array_equal(actual[col].to_numpy(float), expected[col].to_numpy(float), err_msg=col)
+
+
+@pytest.mark.parametrize('rank', ['rolling', 'expanding'])
+@pytest.mark.parametrize('name', ['6669', '3231'])
+def test_feed_matches_run_profile(name, rank):
+    profile = dataclasses.replace(get_profile(name), slope_rank=rank)
+    df = tick_ohlcv()
+    assert_identical(run_profile(df, profile), StreamingScorer(profile).feed(df))
+
+
+@pytest.mark.parametrize('rank', ['rolling', 'expanding'])
+def test_update_matches_run_profile_bar_by_bar(rank):
+    profile = dataclasses.replace(get_profile('6669'), slope_rank=rank)
+    df = tick_ohlcv(seed=1)
+    expected = run_profile(df, profile)
+    scorer = StreamingScorer(profile, history=df.iloc[:1000])
+    for date, bar in zip(df.index[1000:], df.iloc[1000:].to_dict('records')):
+        row = scorer.update(bar, date)
+        for col in expected.columns:
+            np.testing.assert_array_equal(float(row[col]), float(expected.at[date, col]), err_msg=f'{date} {col}')
+
+
+def test_update_universe_matches_single_update():
+    profile = get_profile('3231')
+    df = tick_ohlcv(seed=2)
+    expected = run_profile(df, profile)
+    scorers = {ticker: StreamingScorer(profile, history=df.iloc[:1200]) for ticker in ('A', 'B')}
+    for date, bar in zip(df.index[1200:1260], df.iloc[1200:1260].to_dict('records')):
+        rows = update_universe(scorers, {'A': bar, 'B': bar}, date)
+        for row in rows.values():
+            assert row['Buy_Score'] == expected.at[date, 'Buy_Score']
+            assert row['Sell_Score'] == expected.at[date, 'Sell_Score']
+
+
+def test_feed_applies_profile_weights():
+    profile = dataclasses.replace(get_profile('6669'), weights={'Buy_BB': 0.5, 'Sell_KD': 2.0})
+    df = tick_ohlcv(seed=3)
+    assert_identical(run_profile(df, profile), StreamingScorer(profile).feed(df))
@@ -0,0 +1,40 @@
+"""參數掃描：tuned_profile 帶入最佳門檻與分項倍數後，重新評分回測的績效與掃描結果相同"""
+import numpy as np
+import pytest
+
+from stock_analysis import backtest, get_profile, grid_search, run_profile, tuned_profile
+from stock_analysis.bench import synthetic_ohlcv
+from stock_analysis.scoring import BUY_COMPONENTS
+
+
+@pytest.fixture(scope='module')
+def scored():
+    return run_profile(synthetic_ohlcv(2000, seed=0), get_profile('6669'))
+
+
+def test_tuned_profile_reproduces_best_row(scored):
+    profile = get_profile('6669')
+    weights = {'Buy_BB': (0.5, 1.5), 'Sell_KD': (1.0, 2.0)}
+    table = grid_search(scored, profile, buy_thresholds=[(50, 40), (45, 35)], weights=weights, workers=1)
+    best = table.iloc[0]
+    tuned = tuned_profile(profile, best['buy_thresholds'], best['sell_thresholds'],
+                          {name: best[f'w_{name}'] for name in weights})
+    assert tuned.name == '6669-tuned'
+    assert tuned.weights == {'Buy_BB': best['w_Buy_BB'], 'Sell_KD': best['w_Sell_KD']}
+    rescored = run_profile(scored[['Open', 'High', 'Low', 'Close', 'Volume']], tuned)
+    for col in BUY_COMPONENTS:
+        np.testing.assert_array_equal(rescored[col], scored[col])  # 分項維持原始配分
+    assert backtest(rescored, tuned).stats['total_return'] == best['total_return']
+
+
+def test_unswept_components_keep_profile_weights(scored):
+    profile = tuned_profile(get_profile('6669'), (50, 40), (55, 40), {'Buy_FIBO': 0.5})
+    rescored = run_profile(scored[['Open', 'High', 'Low', 'Close', 'Volume']], profile)
+    table = grid_search(rescored, profile, weights={'Buy_BB': (1.0,)}, workers=1)
+    assert table.iloc[0]['total_return'] == backtest(rescored, profile).stats['total_return']
+    assert tuned_profile(profile, (50, 40), (55, 40), name='x').weights == {'Buy_FIBO': 0.5}
+
+
+def test_unknown_component_weight_raises():
+    with pytest.raises(KeyError, match='Buy_Foo'):
+        tuned_profile(get_profile('6669'), (50, 40), (55, 40), {'Buy_Foo': 2.0})